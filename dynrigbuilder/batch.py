@@ -0,0 +1,296 @@
+__author__ = 'wuxiaoyu'
+
+# Build many rigs from a layout file in one maya session, eg. with mayapy:
+#   mayapy batch.py layouts.json --output asset_rig.ma --report build_report.json
+#
+# Layout file:
+# {"rigs": [
+#     {"prefix": "hairA",
+#      "type": "spline",
+#      "locators": {"start": [0, 15, 0], "end": [0, 0, 0]},
+#      "metaPivot": [0, 15, 0],
+#      "rigAttrs": {"jointNum": 20, "fkCtrlNum": 5},
+#      "hairSystem": "hairA_hairSystem",
+#      "hairPool": "scalpBack"},
+#     ...
+# ]}
+# locators are kept in file order, the chain goes from the first to the last one through the others.
+# "locators" can also be a list of positions, the locators are then named start, 01, 02, ..., end.
+# rigs with the same hairSystem name share one hair system, a missing one is created.
+# hairSystem null gives the rig its own hair system, unless its hairPoolSize rig attr
+# is above 0: rigs with the same hairPool then share at most hairPoolSize hair systems,
+# all pools share one nucleus.
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import OrderedDict
+
+_moduleDir = os.path.dirname(os.path.abspath(__file__))
+if _moduleDir not in sys.path:
+    sys.path.append(_moduleDir)
+
+import pymel.core as pm
+import mayautils
+import profiler
+import scaffold
+import splinerig
+
+map(reload, [mayautils, profiler, scaffold, splinerig])
+
+RIG_TYPES = {
+    splinerig.SplineRig.scaffoldType: splinerig.SplineRig,
+}
+
+
+def readLayout(filePath):
+    """
+    Read a layout file.
+    :param filePath: `string` json layout file path
+    :return: `list` rig layout dictionaries, locators kept in file order
+    """
+    with open(filePath) as f:
+        data = json.load(f, object_pairs_hook=OrderedDict)
+    layouts = data["rigs"] if isinstance(data, dict) else data
+    for layout in layouts:
+        if "prefix" not in layout or len(layout.get("locators", [])) < 2:
+            raise ValueError("Layout needs a prefix and at least 2 locators: {0}".format(dict(layout)))
+        layout.setdefault("type", splinerig.SplineRig.scaffoldType)
+        if layout["type"] not in RIG_TYPES:
+            raise ValueError("Unknown rig type {0} in layout {1}".format(layout["type"], layout["prefix"]))
+        if not isinstance(layout["locators"], dict):
+            # [[name, position], ...] or [position, ...]
+            layout["locators"] = OrderedDict(scaffold.getChainItems(layout["locators"]))
+    return layouts
+
+
+def writeLayout(filePath, layouts):
+    """
+    Write rig layouts to a layout file.
+    :param filePath: `string` json layout file path
+    :param layouts: `list` rig layout dictionaries
+    :return:
+    """
+    with open(filePath, "w") as f:
+        json.dump({"rigs": layouts}, f, indent=2)
+
+
+def layoutFromScaffold(scaffoldTop):
+    """
+    Read the layout of a scaffold in the scene.
+    :param scaffoldTop: `PyNode` scaffold top node
+    :return: `dict` rig layout
+    """
+    prefix = pm.getAttr("{0}.{1}".format(scaffoldTop.name(), scaffold.SCAFFOLD_TOP_TAG))
+    rig = RIG_TYPES[scaffold.getScaffoldType(scaffoldTop)]
+    locators = OrderedDict()
+    for loc in scaffold.getScaffoldLocs(scaffoldTop):
+        locName = loc.name().replace(prefix+"_", "", 1).replace("_scaffold_loc", "")
+        locators[locName] = list(scaffold.getLocPosition(loc))
+    rigAttrs = OrderedDict()
+    for attr in rig.rigAttrs:
+        if pm.attributeQuery(attr["ln"], node=scaffoldTop, exists=1):
+            rigAttrs[attr["ln"]] = pm.getAttr("{0}.{1}".format(scaffoldTop.name(), attr["ln"]))
+    hairPool = None
+    if pm.attributeQuery(rig.HAIR_POOL_ATTR["ln"], node=scaffoldTop, exists=1):
+        hairPool = pm.getAttr("{0}.{1}".format(scaffoldTop.name(), rig.HAIR_POOL_ATTR["ln"]))
+    return OrderedDict([
+        ("prefix", prefix),
+        ("type", rig.scaffoldType),
+        ("locators", locators),
+        ("metaPivot", list(scaffold.getMetaPivotPosition(scaffoldTop))),
+        ("rigAttrs", rigAttrs),
+        ("hairSystem", None),
+        ("hairPool", hairPool or None),
+    ])
+
+
+def exportLayout(filePath, scaffoldTops=None):
+    """
+    Export the scaffolds in the scene to a layout file.
+    :param filePath: `string` json layout file path
+    :param scaffoldTops: `list` scaffold top nodes, all scaffolds in the scene if None
+    :return: `list` exported rig layouts
+    """
+    if scaffoldTops is None:
+        scaffoldTops = scaffold.listScaffoldTops()
+    layouts = [layoutFromScaffold(x) for x in scaffoldTops]
+    writeLayout(filePath, layouts)
+    return layouts
+
+
+def buildScaffold(layout):
+    """
+    Build an editable scaffold from a rig layout.
+    :param layout: `dict` rig layout
+    :return: `PyNode` scaffold top node
+    """
+    rig = RIG_TYPES[layout["type"]]
+    scaffoldTop = scaffold.buildScaffoldChain(layout["prefix"], layout["locators"])
+    scaffold.setScaffoldType(scaffoldTop, rig.scaffoldType)
+    mayautils.addAttributes(scaffoldTop, rig.rigAttrs + [rig.HAIR_POOL_ATTR])
+    for attrName, value in layout.get("rigAttrs", {}).items():
+        pm.setAttr("{0}.{1}".format(scaffoldTop.name(), attrName), value)
+    if layout.get("hairPool"):
+        pm.setAttr("{0}.{1}".format(scaffoldTop.name(), rig.HAIR_POOL_ATTR["ln"]), layout["hairPool"])
+    if layout.get("metaPivot"):
+        piv = pm.listConnections("{0}.{1}".format(scaffoldTop.name(), scaffold.SCAFFOLD_META_PIV_TAG))
+        pm.xform(piv, t=layout["metaPivot"], ws=1)
+    return scaffoldTop
+
+
+def importLayout(filePath):
+    """
+    Build the scaffolds of a layout file, to edit them in the builder UI.
+    :param filePath: `string` json layout file path
+    :return: `list` scaffold top nodes
+    """
+    return [buildScaffold(x) for x in readLayout(filePath)]
+
+
+def _getHairSystem(name, hairSystems):
+    """
+    Get the hair system shape shared under the given name, create it if it doesn't exist.
+    """
+    if not name:
+        return None
+    if name not in hairSystems:
+        if pm.objExists(name):
+            hairSys = pm.PyNode(name)
+            hairSystems[name] = hairSys if hairSys.nodeType() == "hairSystem" else hairSys.getShape()
+        else:
+            hairSys = pm.createNode("hairSystem")
+            pm.select(hairSys, r=1)
+            pm.mel.assignNSolver("")
+            hairSys.getParent().rename(name)
+            hairSystems[name] = hairSys
+    return hairSystems[name]
+
+
+def buildFromLayout(layout, hairSystems=None, useScaffold=False, backend="pymel"):
+    """
+    Build one rig from its layout.
+    :param layout: `dict` rig layout
+    :param hairSystems: `dict` hair system name: hair system shape, shared across the batch
+    :param useScaffold: `bool` build the rig through a scaffold and keep it, otherwise
+                        the rig is built straight from the layout values
+    :param backend: `string` SplineRig.buildRig backend
+    :return: `SplineRig` built rig
+    """
+    hairSystems = {} if hairSystems is None else hairSystems
+    hairSystem = _getHairSystem(layout.get("hairSystem"), hairSystems)
+    rig = RIG_TYPES[layout["type"]](layout["prefix"])
+    if useScaffold:
+        rig.buildRig(buildScaffold(layout), hairSystem, backend, hairPool=layout.get("hairPool"))
+        return rig
+
+    rigAttrNames = [x["ln"] for x in rig.rigAttrs]
+    for attrName, value in layout.get("rigAttrs", {}).items():
+        if attrName not in rigAttrNames:
+            raise ValueError("Unknown rig attribute {0} in layout {1}".format(attrName, layout["prefix"]))
+        setattr(rig, attrName, value)
+    positions = [x[1] for x in scaffold.getChainItems(layout["locators"])]
+    rig.startPos = positions[0]
+    rig.endPos = positions[-1]
+    rig.midPositions = positions[1:-1]
+    rig.metaPos = layout.get("metaPivot") or positions[0]
+    rig.buildRig(None, hairSystem, backend, hairPool=layout.get("hairPool"))
+    return rig
+
+
+def buildBatch(layouts, useScaffold=False, backend="pymel", replace=False, stopOnError=False, profileDir=None):
+    """
+    Build all rigs of the layouts in one undo-disabled, refresh-suspended context.
+    :param layouts: `list` rig layouts, see readLayout()
+    :param useScaffold: `bool` build the rigs through scaffolds and keep them
+    :param backend: `string` SplineRig.buildRig backend
+    :param replace: `bool` delete rigs with the same prefix first, otherwise they are skipped
+    :param stopOnError: `bool` stop the batch at the first failed rig
+    :param profileDir: `string` write a build profile per rig to this folder, see profiler.BuildProfiler
+    :return: `list` per rig report {"prefix", "status", "seconds", "error", "profile"}
+    """
+    report = []
+    hairSystems = {}
+    with mayautils.batchBuildContext():
+        for i, layout in enumerate(layouts):
+            prefix = layout["prefix"]
+            oldRig = RIG_TYPES[layout["type"]].rigExists(prefix)
+            if oldRig and not replace:
+                report.append({"prefix": prefix, "status": "skipped", "seconds": 0.0, "error": "rig exists",
+                               "profile": None})
+                continue
+            if oldRig:
+                RIG_TYPES[layout["type"]].deleteRig(oldRig)
+
+            buildProfiler = profiler.BuildProfiler(prefix) if profileDir else None
+            if buildProfiler:
+                buildProfiler.start()
+            startTime = time.time()
+            try:
+                buildFromLayout(layout, hairSystems, useScaffold, backend)
+                status, error = "built", None
+            except Exception:
+                status, error = "failed", traceback.format_exc()
+            seconds = time.time() - startTime
+            profilePath = None
+            if buildProfiler:
+                buildProfiler.stop()
+                profilePath = os.path.join(profileDir, "{0}_profile.json".format(prefix))
+                buildProfiler.writeReport(profilePath)
+            report.append({"prefix": prefix, "status": status, "seconds": seconds, "error": error,
+                           "profile": profilePath})
+            print("[{0}/{1}] {2} {3} in {4:.3f}s".format(i+1, len(layouts), prefix, status, seconds))
+            if error:
+                print(error)
+                if stopOnError:
+                    break
+    return report
+
+
+def formatReport(report):
+    """
+    Text summary of a batch build report.
+    :param report: `list` buildBatch() result
+    :return: `string`
+    """
+    lines = ["{0:<32} {1:<8} {2:>9}".format("prefix", "status", "seconds")]
+    for entry in report:
+        lines.append("{0:<32} {1:<8} {2:>9.3f}".format(entry["prefix"], entry["status"], entry["seconds"]))
+    built = [x["seconds"] for x in report if x["status"] == "built"]
+    lines.append("built {0}/{1} rigs in {2:.3f}s".format(len(built), len(report), sum(built)))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build DynRigBuilder rigs from a layout file.")
+    parser.add_argument("layout", help="json layout file")
+    parser.add_argument("--scene", help="open this scene before building")
+    parser.add_argument("--output", help="save the scene to this file after building")
+    parser.add_argument("--report", help="write the per rig build report to this json file")
+    parser.add_argument("--backend", default="pymel", choices=["pymel", "modifier"])
+    parser.add_argument("--scaffold", action="store_true", help="build and keep the scaffolds")
+    parser.add_argument("--replace", action="store_true", help="rebuild rigs that already exist")
+    parser.add_argument("--stopOnError", action="store_true")
+    parser.add_argument("--profileDir", help="write a per phase build profile of every rig to this folder")
+    args = parser.parse_args(argv)
+
+    if args.scene:
+        pm.openFile(args.scene, force=True)
+    if args.profileDir and not os.path.isdir(args.profileDir):
+        os.makedirs(args.profileDir)
+    report = buildBatch(readLayout(args.layout), args.scaffold, args.backend, args.replace, args.stopOnError,
+                        args.profileDir)
+    print(formatReport(report))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.output:
+        pm.saveAs(args.output, force=True)
+    return 0 if all(x["status"] != "failed" for x in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
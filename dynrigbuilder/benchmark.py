@@ -0,0 +1,447 @@
+__author__ = 'wuxiaoyu'
+
+# Sweep the SplineRig build parameters and record how the build scales, eg.
+#   mayapy benchmark.py --output results_1.2.json
+#   mayapy benchmark.py --sweep jointNum=20,40,80 --sweep fkCtrlNum=5 --frames 48
+#   python benchmark.py --compare results_1.1.json results_1.2.json
+#   mayapy benchmark.py --scaffold --sweep locatorNum=100 --sweep upAxisSolver=0,1
+#
+# For every configuration the build time, created node count, saved file size (fileSize) and
+# per-frame evaluation time (evalSeconds) are recorded. Without maya the rigs are recorded with
+# dryrun.recordBuild instead: the build time is the time to record the plan, the node count
+# comes from the plan, planBytes is the size of the plan json and modelEvalSeconds is the
+# per-frame time of the NumPy models of the rig (nurbs.IKSplineChain, fksolver.solveVariableFK
+# and strandsim.StrandBatch). They are stored under their own keys, dry run results are only
+# compared with dry run results. The solver attrs (fkSolver, lengthSolver, ikSolver, blendSolver)
+# only change the Maya evaluation, their dry runs leave modelEvalSeconds empty and
+# tests/test_solvers_maya.py times them against the networks.
+# With --scaffold the scaffold chain build is measured instead of the rig build, sweeping
+# the locator number and the scaffold.buildScaffoldChain arguments.
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from timeit import default_timer
+
+_moduleDir = os.path.dirname(os.path.abspath(__file__))
+if _moduleDir not in sys.path:
+    sys.path.append(_moduleDir)
+
+try:
+    import pymel.core as pm
+except ImportError:
+    pm = None
+
+import numpy as np
+
+import dryrun
+import fksolver
+import nurbs
+import strandsim
+
+if pm:
+    import mayautils
+    import rigutils
+    import scaffold
+    import splinerig
+    map(reload, [mayautils, rigutils, scaffold, splinerig])
+
+# swept SplineRig attributes and their values
+DEFAULT_SWEEP = OrderedDict([
+    ("jointNum", [10, 20, 40, 80]),
+    ("fkCtrlNum", [3, 5, 10]),
+    ("masterCtrlNum", [3, 5, 9]),
+    ("ibtSubCtrlNum", [0, 1, 3]),
+])
+# named sweeps, eg. --preset lengthSolver compares the length preservation network to the dynCurveLength node
+SWEEP_PRESETS = {
+    "default": DEFAULT_SWEEP,
+    "lengthSolver": OrderedDict([
+        ("lengthSolver", [0, 1]),
+        ("jointNum", [20, 40, 80]),
+        ("masterCtrlNum", [5, 9]),
+    ]),
+    "ikSolver": OrderedDict([
+        ("ikSolver", [0, 1]),
+        ("jointNum", [20, 50, 100]),
+    ]),
+    "blendSolver": OrderedDict([
+        ("blendSolver", [0, 1]),
+        ("jointNum", [20, 80]),
+    ]),
+}
+# swept scaffold chain locator number and buildScaffoldChain arguments, used with --scaffold
+SCAFFOLD_SWEEP = OrderedDict([
+    ("locatorNum", [10, 50, 100]),
+    ("upAxisSolver", [0, 1]),
+])
+# measured values of every mode, a dry run measures other things than maya and keeps them apart
+RESULT_KEYS = {
+    "maya": ["buildSeconds", "nodeCount", "fileSize", "evalSeconds"],
+    "dryrun": ["buildSeconds", "nodeCount", "planBytes", "modelEvalSeconds"],
+}
+# rig attrs that only change the maya evaluation, the NumPy models evaluate the same rig either way
+MAYA_SOLVER_ATTRS = ["fkSolver", "lengthSolver", "ikSolver", "blendSolver"]
+BENCH_PREFIX = "bench"
+
+
+def sweepConfigs(sweep=None, fixedAttrs=None):
+    """
+    All combinations of the swept rig attribute values.
+    :param sweep: `dict` rig attribute name: list of values, DEFAULT_SWEEP if None
+    :param fixedAttrs: `dict` rig attribute values shared by all configurations
+    :return: `list` rig attribute dictionaries, configurations with more fk ctrls than joints are skipped
+    """
+    sweep = DEFAULT_SWEEP if sweep is None else sweep
+    configs = []
+    for values in itertools.product(*sweep.values()):
+        config = OrderedDict(fixedAttrs or {})
+        config.update(zip(sweep.keys(), values))
+        if config.get("fkCtrlNum", 0) > config.get("jointNum", 2):
+            continue
+        configs.append(config)
+    return configs
+
+
+def _configKey(config):
+    return json.dumps(config, sort_keys=True)
+
+
+def _timeEvaluation(rig, frameNum):
+    """
+    Animate the meta ctrl and time the evaluation of the base joints frame after frame.
+    :return: `float` average seconds per frame
+    """
+    metaCtrl = rig.metaCtrl
+    pm.setKeyframe(metaCtrl, at="rotateZ", t=1, v=0)
+    pm.setKeyframe(metaCtrl, at="rotateZ", t=frameNum, v=45)
+    baseJntGrp = pm.PyNode("{0}_base_grp".format(rig.prefix))
+    baseJnts = rigutils.getJointsInChain(pm.listRelatives(baseJntGrp, c=1, typ="joint")[0])
+    pm.currentTime(1, update=True)
+    startTime = default_timer()
+    for frame in range(1, frameNum+1):
+        pm.currentTime(frame, update=True)
+        for jnt in baseJnts:
+            pm.getAttr(jnt.worldMatrix)
+    return (default_timer() - startTime)/frameNum
+
+
+def benchmarkMaya(config, frameNum=24, backend="pymel", workDir=None):
+    """
+    Build one configuration in a new scene and measure it.
+    :param config: `dict` rig attribute values
+    :param frameNum: `int` number of evaluated frames
+    :param backend: `string` SplineRig.buildRig backend
+    :param workDir: `string` folder for the saved scene
+    :return: `dict` {"buildSeconds", "nodeCount", "fileSize", "evalSeconds"}
+    """
+    pm.newFile(force=True)
+    rig = splinerig.SplineRig(BENCH_PREFIX)
+    for attrName, value in config.items():
+        setattr(rig, attrName, value)
+    nodeNum = len(pm.ls())
+    startTime = default_timer()
+    with mayautils.batchBuildContext():
+        rig.buildRig(None, backend=backend)
+    buildSeconds = default_timer() - startTime
+    nodeCount = len(pm.ls()) - nodeNum
+
+    scenePath = os.path.join(workDir, "{0}.mb".format(BENCH_PREFIX))
+    pm.saveAs(scenePath, force=True)
+    fileSize = os.path.getsize(scenePath)
+    return {
+        "buildSeconds": buildSeconds,
+        "nodeCount": nodeCount,
+        "fileSize": fileSize,
+        "evalSeconds": _timeEvaluation(rig, frameNum),
+    }
+
+
+def _timeModelEvaluation(config, frameNum):
+    """
+    Rotate the chain about its start like _timeEvaluation and time the NumPy models of the
+    ik, variable fk and dynamic systems frame after frame.
+    :param config: `dict` rig attribute values, SplineRig defaults for the others
+    :param frameNum: `int` number of evaluated frames
+    :return: `float` average seconds per frame
+    """
+    rigAttrs, scaffoldChain = dryrun.rigDefaults()
+    rigAttrs.update(config)
+    startPos = np.asarray(scaffoldChain[0], dtype=np.float64)
+    endPos = np.asarray(scaffoldChain[-1], dtype=np.float64)
+    jointNum = rigAttrs["jointNum"]
+    restJoints = startPos + np.linspace(0.0, 1.0, jointNum)[:, np.newaxis]*(endPos-startPos)
+
+    ikChain = None
+    if rigAttrs["hasIK"]:
+        ikChain = nurbs.IKSplineChain(startPos, endPos, rigAttrs["masterCtrlNum"], rigAttrs["ibtSubCtrlNum"], jointNum,
+                                      rigAttrs["preserveLength"], rigAttrs["lengthSolver"], rigAttrs["ikSolver"],
+                                      scaffoldChain)
+    fkLayout = None
+    if rigAttrs["hasFK"]:
+        fkLayout = fksolver.defaultLayout(jointNum, rigAttrs["fkCtrlNum"])
+        fkScales = np.ones((rigAttrs["fkCtrlNum"], 3))
+    strandBatch = strandsim.StrandBatch([restJoints]) if rigAttrs["hasDynamic"] else None
+
+    def rotateZ(positions, angle):
+        cos, sin = math.cos(angle), math.sin(angle)
+        matrix = np.array([[cos, sin, 0.0], [-sin, cos, 0.0], [0.0, 0.0, 1.0]])
+        return startPos + np.dot(positions - startPos, matrix)
+
+    startTime = default_timer()
+    for frame in range(frameNum):
+        angle = math.radians(45.0*frame/max(frameNum-1, 1))
+        if ikChain is not None:
+            joints = ikChain.aimPositions(rotateZ(ikChain.restMasterPositions, angle))
+        else:
+            joints = rotateZ(restJoints, angle)
+        if fkLayout is not None:
+            jointParams, ctrlPositions, fallOffs = fkLayout
+            ctrlRotates = np.zeros((len(ctrlPositions), 3))
+            ctrlRotates[:, 2] = math.degrees(angle)
+            fksolver.solveVariableFK(jointParams, ctrlPositions, fallOffs, fallOffs, ctrlRotates, fkScales)
+        if strandBatch is not None:
+            strandBatch.step(joints)
+    return (default_timer() - startTime)/max(frameNum, 1)
+
+
+def benchmarkDryRun(config, frameNum=24, *args, **kwargs):
+    """
+    Record one configuration with a dry run and measure the plan.
+    :param config: `dict` rig attribute values
+    :param frameNum: `int` number of frames the NumPy models of the rig are evaluated on
+    :return: `dict` {"buildSeconds", "nodeCount", "planBytes", "modelEvalSeconds"},
+             modelEvalSeconds is None when the config sets a solver attr, see MAYA_SOLVER_ATTRS
+    """
+    startTime = default_timer()
+    plan = dryrun.recordBuild(BENCH_PREFIX, config)
+    buildSeconds = default_timer() - startTime
+    solverConfig = any(x in config for x in MAYA_SOLVER_ATTRS)
+    return {
+        "buildSeconds": buildSeconds,
+        "nodeCount": plan.summary()["liveNodes"],
+        "planBytes": len(plan.toJson()),
+        "modelEvalSeconds": None if solverConfig else _timeModelEvaluation(config, frameNum),
+    }
+
+
+def scaffoldChainPositions(locatorNum):
+    """
+    Scaffold chain of locatorNum locators along a wave, 1 unit apart.
+    :param locatorNum: `int` number of locators
+    :return: `list` ordered chain locator world positions
+    """
+    return [[float(i), math.sin(i*0.5), 0.0] for i in range(locatorNum)]
+
+
+def benchmarkScaffoldMaya(config, frameNum=24, backend="pymel", workDir=None):
+    """
+    Build one scaffold chain configuration in a new scene and measure it.
+    :param config: `dict` {"locatorNum", ...}, the other items are buildScaffoldChain arguments
+    :param frameNum: `int` number of evaluated frames
+    :param backend: unused, SplineRig.buildRig backend of the rig benchmark
+    :param workDir: `string` folder for the saved scene
+    :return: `dict` {"buildSeconds", "nodeCount", "fileSize", "evalSeconds"}
+    """
+    pm.newFile(force=True)
+    kwargs = dict(config)
+    positions = scaffoldChainPositions(kwargs.pop("locatorNum"))
+    if kwargs.get("upAxisSolver"):
+        mayautils.loadNodePlugin()
+    nodeNum = len(pm.ls())
+    startTime = default_timer()
+    with mayautils.batchBuildContext():
+        scaffold.buildScaffoldChain(BENCH_PREFIX, positions, **kwargs)
+    buildSeconds = default_timer() - startTime
+    nodeCount = len(pm.ls()) - nodeNum
+
+    scenePath = os.path.join(workDir, "{0}.mb".format(BENCH_PREFIX))
+    pm.saveAs(scenePath, force=True)
+    fileSize = os.path.getsize(scenePath)
+
+    # flip the up axis of every locator frame after frame
+    locators = [pm.PyNode("{0}_{1}_scaffold_loc".format(BENCH_PREFIX, x))
+                for x in scaffold.scaffoldLocNames(len(positions))]
+    aimConstraints = pm.ls("{0}_*_follow_off_aim".format(BENCH_PREFIX), type="aimConstraint")
+    startTime = default_timer()
+    for frame in range(frameNum):
+        for loc in locators[:-1]:
+            loc.upAxis.set(frame % 4)
+        for aim in aimConstraints:
+            pm.getAttr(aim.constraintRotate)
+    return {
+        "buildSeconds": buildSeconds,
+        "nodeCount": nodeCount,
+        "fileSize": fileSize,
+        "evalSeconds": (default_timer() - startTime)/max(frameNum, 1),
+    }
+
+
+def benchmarkScaffoldDryRun(config, *args, **kwargs):
+    """
+    Record one scaffold chain configuration with a dry run and measure the plan.
+    :param config: `dict` {"locatorNum", ...}, the other items are buildScaffoldChain arguments
+    :return: `dict` {"buildSeconds", "nodeCount", "planBytes", "modelEvalSeconds"}
+    """
+    config = dict(config)
+    positions = scaffoldChainPositions(config.pop("locatorNum"))
+    startTime = default_timer()
+    plan = dryrun.recordScaffold(BENCH_PREFIX, positions, **config)
+    buildSeconds = default_timer() - startTime
+    return {
+        "buildSeconds": buildSeconds,
+        "nodeCount": plan.summary()["liveNodes"],
+        "planBytes": len(plan.toJson()),
+        "modelEvalSeconds": None,
+    }
+
+
+def runBenchmark(configs, frameNum=24, repeat=1, backend="pymel", useMaya=None, scaffoldChain=False):
+    """
+    Measure every configuration, the fastest of the repeated runs is kept.
+    :param configs: `list` rig attribute dictionaries, see sweepConfigs()
+    :param frameNum: `int` number of evaluated frames
+    :param repeat: `int` number of runs per configuration
+    :param backend: `string` SplineRig.buildRig backend, maya only
+    :param useMaya: `bool` build in maya or record dry runs, maya when available if None
+    :param scaffoldChain: `bool` measure scaffold chain builds, configs are scaffold configurations, see SCAFFOLD_SWEEP
+    :return: `dict` {"mode", "date", "python", "maya", "backend", "frameNum", "repeat", "results"}
+    """
+    useMaya = pm is not None if useMaya is None else useMaya
+    resultKeys = RESULT_KEYS["maya" if useMaya else "dryrun"]
+    if scaffoldChain:
+        benchFunc = benchmarkScaffoldMaya if useMaya else benchmarkScaffoldDryRun
+    else:
+        benchFunc = benchmarkMaya if useMaya else benchmarkDryRun
+    workDir = tempfile.mkdtemp(prefix="dynRigBench_")
+    results = []
+    try:
+        for i, config in enumerate(configs):
+            runs = [benchFunc(config, frameNum, backend, workDir) for _ in range(repeat)]
+            result = OrderedDict([("config", config)])
+            for key in resultKeys:
+                values = [x[key] for x in runs if x[key] is not None]
+                result[key] = min(values) if values else None
+            results.append(result)
+            print("[{0}/{1}] {2} {3:.3f}s {4} nodes".format(
+                i+1, len(configs), _configKey(config), result["buildSeconds"], result["nodeCount"]))
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+    return OrderedDict([
+        ("mode", "maya" if useMaya else "dryrun"),
+        ("target", "scaffold" if scaffoldChain else "rig"),
+        ("date", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ("python", platform.python_version()),
+        ("maya", pm.about(version=1) if useMaya else None),
+        ("backend", backend if useMaya else None),
+        ("frameNum", frameNum if useMaya or not scaffoldChain else None),
+        ("repeat", repeat),
+        ("results", results),
+    ])
+
+
+def compareResults(oldResults, newResults):
+    """
+    Ratio of the new over the old measurements of the configurations found in both results.
+    :param oldResults: `dict` runBenchmark() result
+    :param newResults: `dict` runBenchmark() result
+    :return: `list` [{"config", "buildSeconds", ...}, ...], the keys of RESULT_KEYS of the mode
+    """
+    if oldResults["mode"] != newResults["mode"]:
+        raise ValueError("Can not compare {0} results to {1} results, they measure different things.".format(
+            oldResults["mode"], newResults["mode"]))
+    oldByKey = dict((_configKey(x["config"]), x) for x in oldResults["results"])
+    ratios = []
+    for result in newResults["results"]:
+        old = oldByKey.get(_configKey(result["config"]))
+        if not old:
+            continue
+        ratio = OrderedDict([("config", result["config"])])
+        for key in RESULT_KEYS[newResults["mode"]]:
+            ratio[key] = result[key]/float(old[key]) if result[key] is not None and old[key] else None
+        ratios.append(ratio)
+    return ratios
+
+
+def formatResults(results, mode="maya"):
+    """
+    Text table of benchmark results or comparison ratios.
+    :param results: `list` runBenchmark()["results"] or compareResults() result
+    :param mode: `string` "maya" or "dryrun", runBenchmark()["mode"]
+    :return: `string`
+    """
+    attrNames = []
+    for result in results:
+        attrNames += [x for x in result["config"] if x not in attrNames]
+    fmtValue = lambda v: "-" if v is None else ("{0:.4g}".format(v) if isinstance(v, float) else str(v))
+    header = attrNames + RESULT_KEYS[mode]
+    rows = [[fmtValue(x["config"].get(k)) for k in attrNames] + [fmtValue(x[k]) for k in RESULT_KEYS[mode]]
+            for x in results]
+    widths = [max([len(header[i])] + [len(row[i]) for row in rows]) for i in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+    return "\n".join(lines)
+
+
+def _parseSweep(items):
+    sweep = OrderedDict()
+    for item in items:
+        attrName, values = item.split("=", 1)
+        sweep[attrName] = [dryrun._parseValue(x) for x in values.split(",")]
+    return sweep
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark DynRigBuilder rig builds.")
+    parser.add_argument("--sweep", action="append", default=[], metavar="ATTR=V1,V2",
+                        help="swept rig attribute values, eg. --sweep jointNum=20,40, replaces the default sweep")
+    parser.add_argument("--preset", default="default", choices=sorted(SWEEP_PRESETS),
+                        help="named sweep, ignored when --sweep is given")
+    parser.add_argument("--scaffold", action="store_true",
+                        help="measure scaffold chain builds, the default sweep is locatorNum and upAxisSolver")
+    parser.add_argument("--set", action="append", default=[], metavar="ATTR=VALUE",
+                        help="rig attribute value shared by all configurations, eg. --set hasDynamic=0")
+    parser.add_argument("--frames", type=int, default=24, help="number of evaluated frames")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per configuration, the fastest is kept")
+    parser.add_argument("--backend", default="pymel", choices=["pymel", "modifier"])
+    parser.add_argument("--dryRun", action="store_true", help="record dry runs even if maya is available")
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running the benchmark")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            oldResults = json.load(f, object_pairs_hook=OrderedDict)
+        with open(args.compare[1]) as f:
+            newResults = json.load(f, object_pairs_hook=OrderedDict)
+        print(formatResults(compareResults(oldResults, newResults), newResults["mode"]))
+        return 0
+
+    fixedAttrs = OrderedDict(x.split("=", 1) for x in args.set)
+    fixedAttrs = OrderedDict((k, dryrun._parseValue(v)) for k, v in fixedAttrs.items())
+    if args.sweep:
+        sweep = _parseSweep(args.sweep)
+    else:
+        sweep = SCAFFOLD_SWEEP if args.scaffold else SWEEP_PRESETS[args.preset]
+    configs = sweepConfigs(sweep, fixedAttrs)
+    results = runBenchmark(configs, args.frames, args.repeat, args.backend, False if args.dryRun else None,
+                           args.scaffold)
+    print(formatResults(results["results"], results["mode"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
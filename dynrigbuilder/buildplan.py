@@ -0,0 +1,406 @@
+__author__ = 'wuxiaoyu'
+
+import json
+import numbers
+
+try:
+    _stringTypes = (basestring,)
+except NameError:
+    _stringTypes = (str,)
+
+
+class PlanPlug(object):
+    """
+    Attribute of a recorded node, mimics the pymel Attribute calls used by the rig builders.
+    """
+    def __init__(self, node, path):
+        self.node = node
+        self.path = path
+
+    def __getitem__(self, index):
+        return self.__class__(self.node, "{0}[{1}]".format(self.path, index))
+
+    def __getattr__(self, child):
+        if child.startswith("_"):
+            raise AttributeError(child)
+        return self.__class__(self.node, "{0}.{1}".format(self.path, child))
+
+    def __str__(self):
+        return self.name()
+
+    def name(self):
+        return "{0}.{1}".format(self.node.name(), self.path)
+
+    def connect(self, destination, force=False, **kwargs):
+        self.node.plan.connectAttr(self, destination, force=bool(force or kwargs.get("f", False)),
+                                   nextAvailable=bool(kwargs.get("na", kwargs.get("nextAvailable", False))))
+
+    def set(self, *value):
+        self.node.plan.setAttr(self, value[0] if len(value) == 1 else list(value))
+
+
+class PlanNode(object):
+    """
+    Node recorded in a build plan. Becomes a real node once the plan is committed.
+    """
+    def __init__(self, plan, index, nodeType, name, parent=None):
+        self.plan = plan
+        self.index = index
+        self.type = nodeType
+        self._name = name
+        self.parent = parent
+        self.mobject = None
+
+    def __getattr__(self, attrName):
+        if attrName.startswith("_"):
+            raise AttributeError(attrName)
+        return self.plan.plugClass(self, attrName)
+
+    def __str__(self):
+        return self.name()
+
+    def attr(self, attrName):
+        return self.plan.plugClass(self, attrName)
+
+    def name(self):
+        if self.mobject is not None:
+            import maya.api.OpenMaya as om2
+            return om2.MFnDependencyNode(self.mobject).name()
+        return self._name
+
+    def nodeType(self):
+        return self.type
+
+    def rename(self, name):
+        self.plan.rename(self, name)
+        return self
+
+    def setParent(self, parent):
+        self.plan.setParent(self, parent)
+
+
+class BuildPlan(object):
+    """
+    Record a node graph (creates, renames, parents, connections, setAttr values)
+    and commit it with a few MDGModifier/MDagModifier.doIt() calls instead of
+    one pymel round trip per operation.
+
+    Operations are kept in recording order in self.ops. commit() only executes
+    the operations recorded since the last commit, so a plan can be flushed
+    whenever later build steps need to query the result.
+    Operations that are not plain graph edits (curve, skinCluster, constraints...)
+    are recorded as "command" ops and replayed through maya.cmds in between
+    the batched modifier steps.
+    Modifier operations are not registered with the undo queue.
+    """
+    nodeClass = PlanNode
+    plugClass = PlanPlug
+    _dagTypeCache = {}
+
+    def __init__(self):
+        self.nodes = []
+        self.ops = []
+        self.subsystem = None
+        self._committed = 0
+
+    # ---------------------------------------------------------------------
+    # recording
+    def _addOp(self, op):
+        op["subsystem"] = self.subsystem
+        self.ops.append(op)
+        return op
+
+    def _newNode(self, nodeType, name, parent=None):
+        node = self.nodeClass(self, len(self.nodes), nodeType, name, parent)
+        node.subsystem = self.subsystem
+        self.nodes.append(node)
+        return node
+
+    def createNode(self, nodeType, name, parent=None):
+        node = self._newNode(nodeType, name, parent)
+        self._addOp({"op": "createNode", "node": node})
+        return node
+
+    def rename(self, node, name):
+        if node.mobject is None:
+            node._name = name
+        self._addOp({"op": "rename", "node": node, "name": name})
+
+    def setParent(self, node, parent):
+        if node.mobject is None:
+            node.parent = parent
+        self._addOp({"op": "parent", "node": node, "parent": parent})
+
+    def connectAttr(self, source, destination, force=False, nextAvailable=False):
+        self._addOp({"op": "connect", "source": source, "destination": destination,
+                     "force": force, "nextAvailable": nextAvailable})
+
+    def setAttr(self, plug, value):
+        if isinstance(value, tuple):
+            value = list(value)
+        self._addOp({"op": "setAttr", "plug": plug, "value": value})
+
+    def command(self, command, args=None, kwargs=None, outputs=None, mel=False):
+        """
+        Record a command that can not be expressed as plain graph edits.
+        :param command: `string` maya.cmds command or mel procedure name
+        :param args: `list` positional arguments, nodes and plugs are resolved to names on commit
+        :param kwargs: `dict` command flags
+        :param outputs: `list` nodes the command creates, in the order the command returns them
+        :param mel: `bool` command is a mel procedure
+        :return: `dict` recorded op
+        """
+        return self._addOp({"op": "command", "command": command, "args": list(args or []),
+                            "kwargs": dict(kwargs or {}), "outputs": list(outputs or []), "mel": mel})
+
+    def pending(self):
+        return len(self.ops) - self._committed
+
+    def flush(self):
+        """
+        Called by mayautils.flushBuildPlan between build steps.
+        :return: `int` number of operations committed
+        """
+        return self.commit()
+
+    # ---------------------------------------------------------------------
+    # serialization
+    @staticmethod
+    def _refName(obj):
+        if obj is None:
+            return None
+        if isinstance(obj, (list, tuple)):
+            return [BuildPlan._refName(x) for x in obj]
+        if isinstance(obj, dict):
+            return dict((k, BuildPlan._refName(v)) for k, v in obj.items())
+        if isinstance(obj, (bool, numbers.Number)):
+            return obj
+        if hasattr(obj, "name") and callable(obj.name):
+            return obj.name()
+        return str(obj)
+
+    def toDict(self):
+        """
+        Plain data copy of the plan, nodes and plugs are referred to by name.
+        :return: `dict`
+        """
+        ops = []
+        for op in self.ops:
+            data = {}
+            for key, value in op.items():
+                if key in ("node", "parent", "source", "destination", "plug",
+                           "args", "kwargs", "value"):
+                    value = self._refName(value)
+                elif key == "outputs":
+                    value = [{"name": x.name(), "type": x.type} for x in value]
+                data[key] = value
+            if op["op"] == "createNode":
+                data["type"] = op["node"].type
+                data["parent"] = self._refName(op["node"].parent)
+            ops.append(data)
+        return {"nodeCount": len(self.nodes), "summary": self.summary(), "ops": ops}
+
+    def summary(self):
+        """
+        Count nodes by subsystem and type, and connections/setAttrs/commands by subsystem.
+        :return: `dict`
+        """
+        result = {"nodes": len(self.nodes), "connections": 0, "setAttrs": 0,
+                  "commands": 0, "subsystems": {}}
+        opKeys = {"connect": "connections", "setAttr": "setAttrs", "command": "commands"}
+
+        def subsystemData(name):
+            return result["subsystems"].setdefault(str(name), {"nodes": 0, "nodeTypes": {},
+                                                             "connections": 0, "setAttrs": 0,
+                                                             "commands": 0})
+        for node in self.nodes:
+            data = subsystemData(node.subsystem)
+            data["nodes"] += 1
+            data["nodeTypes"][node.type] = data["nodeTypes"].get(node.type, 0) + 1
+        for op in self.ops:
+            if op["op"] in opKeys:
+                key = opKeys[op["op"]]
+                result[key] += 1
+                subsystemData(op["subsystem"])[key] += 1
+        return result
+
+    def toJson(self, filePath=None, indent=1):
+        data = json.dumps(self.toDict(), indent=indent, sort_keys=True)
+        if filePath:
+            with open(filePath, "w") as f:
+                f.write(data)
+        return data
+
+    # ---------------------------------------------------------------------
+    # commit
+    @classmethod
+    def _isDagType(cls, nodeType):
+        if nodeType not in cls._dagTypeCache:
+            import maya.cmds as cmds
+            inherited = cmds.nodeType(nodeType, isTypeName=True, inherited=True) or []
+            cls._dagTypeCache[nodeType] = "dagNode" in inherited
+        return cls._dagTypeCache[nodeType]
+
+    @staticmethod
+    def _nodeObject(node):
+        import maya.api.OpenMaya as om2
+        if isinstance(node, PlanNode) and node.mobject is not None:
+            return node.mobject
+        selList = om2.MSelectionList()
+        selList.add(BuildPlan._refName(node))
+        return selList.getDependNode(0)
+
+    @staticmethod
+    def _plug(plug):
+        """
+        Resolve a PlanPlug, pymel Attribute or "node.attr[i].child" string to an MPlug.
+        """
+        import maya.api.OpenMaya as om2
+        if isinstance(plug, PlanPlug):
+            nodeObj = BuildPlan._nodeObject(plug.node)
+            path = plug.path
+        else:
+            nodeName, path = BuildPlan._refName(plug).split(".", 1)
+            selList = om2.MSelectionList()
+            selList.add(nodeName)
+            nodeObj = selList.getDependNode(0)
+
+        fnNode = om2.MFnDependencyNode(nodeObj)
+        mplug = None
+        for token in path.split("."):
+            attrName, _, index = token.partition("[")
+            attrObj = fnNode.attribute(attrName)
+            mplug = om2.MPlug(nodeObj, attrObj) if mplug is None else mplug.child(attrObj)
+            if index:
+                mplug = mplug.elementByLogicalIndex(int(index.rstrip("]")))
+        return mplug
+
+    @staticmethod
+    def _setPlugValue(modifier, plug, value):
+        """
+        Set a plug value like pm.setAttr, angles, distances and times are given in UI units.
+        """
+        import maya.api.OpenMaya as om2
+        if isinstance(value, list):
+            for i, childValue in enumerate(value):
+                BuildPlan._setPlugValue(modifier, plug.child(i), childValue)
+        elif isinstance(value, bool):
+            modifier.newPlugValueBool(plug, value)
+        elif isinstance(value, numbers.Real) and plug.attribute().hasFn(om2.MFn.kUnitAttribute):
+            unitType = om2.MFnUnitAttribute(plug.attribute()).unitType()
+            if unitType == om2.MFnUnitAttribute.kAngle:
+                modifier.newPlugValueMAngle(plug, om2.MAngle(value, om2.MAngle.uiUnit()))
+            elif unitType == om2.MFnUnitAttribute.kDistance:
+                modifier.newPlugValueMDistance(plug, om2.MDistance(value, om2.MDistance.uiUnit()))
+            elif unitType == om2.MFnUnitAttribute.kTime:
+                modifier.newPlugValueMTime(plug, om2.MTime(value, om2.MTime.uiUnit()))
+            else:
+                modifier.newPlugValueDouble(plug, value)
+        elif isinstance(value, numbers.Integral):
+            modifier.newPlugValueInt(plug, value)
+        elif isinstance(value, numbers.Real):
+            modifier.newPlugValueDouble(plug, value)
+        else:
+            modifier.newPlugValueString(plug, str(value))
+
+    def commit(self):
+        """
+        Commit the operations recorded since the last commit.
+        Plain graph edits are batched in between commands: create and name nodes,
+        then parent, connect and set them, one modifier doIt() per stage.
+        :return: `int` number of operations committed
+        """
+        ops = self.ops[self._committed:]
+        segment = []
+        for op in ops:
+            if op["op"] == "command":
+                self._commitGraphOps(segment)
+                segment = []
+                self._runCommand(op)
+            else:
+                segment.append(op)
+        self._commitGraphOps(segment)
+
+        self._committed = len(self.ops)
+        return len(ops)
+
+    def _runCommand(self, op):
+        import maya.api.OpenMaya as om2
+        import maya.cmds as cmds
+        import maya.mel as mel
+        args = self._refName(op["args"])
+        kwargs = self._refName(op["kwargs"])
+        if op["mel"]:
+            melArgs = []
+            for arg in args:
+                if isinstance(arg, list):
+                    arg = "{" + ",".join(str(x) for x in arg) + "}"
+                elif isinstance(arg, bool):
+                    arg = "true" if arg else "false"
+                elif not isinstance(arg, numbers.Number):
+                    arg = '"{0}"'.format(arg)
+                melArgs.append(str(arg))
+            result = mel.eval("{0}({1})".format(op["command"], ", ".join(melArgs)))
+        else:
+            result = getattr(cmds, op["command"])(*args, **kwargs)
+
+        # bind created nodes, by returned name first, then by recorded name
+        if not isinstance(result, (list, tuple)):
+            result = [result] if result else []
+        for i, node in enumerate(op["outputs"]):
+            name = result[i] if i < len(result) and isinstance(result[i], _stringTypes) else node._name
+            selList = om2.MSelectionList()
+            try:
+                selList.add(name)
+                node.mobject = selList.getDependNode(0)
+            except RuntimeError:
+                pass
+
+    def _commitGraphOps(self, ops):
+        import maya.api.OpenMaya as om2
+        if not ops:
+            return
+
+        # create and name nodes
+        dgMod = om2.MDGModifier()
+        dagMod = om2.MDagModifier()
+        for op in ops:
+            if op["op"] != "createNode":
+                continue
+            node = op["node"]
+            if self._isDagType(node.type):
+                parentObj = self._nodeObject(node.parent) if node.parent is not None else om2.MObject.kNullObj
+                node.mobject = dagMod.createNode(node.type, parentObj)
+                dagMod.renameNode(node.mobject, node._name)
+            else:
+                node.mobject = dgMod.createNode(node.type)
+                dgMod.renameNode(node.mobject, node._name)
+        dgMod.doIt()
+        dagMod.doIt()
+
+        # edit the graph in recording order
+        editMod = om2.MDagModifier()
+        # next free index of every array plug connected with na, the plugs only change at doIt()
+        nextIndices = {}
+        for op in ops:
+            if op["op"] == "rename" and op["node"].mobject is not None:
+                editMod.renameNode(op["node"].mobject, op["name"])
+            elif op["op"] == "parent":
+                editMod.reparentNode(self._nodeObject(op["node"]), self._nodeObject(op["parent"])
+                                     if op["parent"] is not None else om2.MObject.kNullObj)
+            elif op["op"] == "connect":
+                srcPlug = self._plug(op["source"])
+                dstPlug = self._plug(op["destination"])
+                if op.get("nextAvailable"):
+                    key = (om2.MObjectHandle(dstPlug.node()).hashCode(), dstPlug.name())
+                    if key not in nextIndices:
+                        indices = dstPlug.getExistingArrayAttributeIndices()
+                        nextIndices[key] = max(indices)+1 if indices else 0
+                    dstPlug = dstPlug.elementByLogicalIndex(nextIndices[key])
+                    nextIndices[key] += 1
+                if op["force"] and dstPlug.isDestination:
+                    editMod.disconnect(dstPlug.source(), dstPlug)
+                editMod.connect(srcPlug, dstPlug)
+            elif op["op"] == "setAttr":
+                self._setPlugValue(editMod, self._plug(op["plug"]), op["value"])
+        editMod.doIt()
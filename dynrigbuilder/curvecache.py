@@ -0,0 +1,145 @@
+__author__ = 'wuxiaoyu'
+
+# Binary cache of an animated nurbs curve, one block of float32 cv positions per frame,
+# read back through a memory map so any frame can be fetched without re-simulating.
+#
+# layout (little endian):
+#   header   magic "DRCC", version, startFrame, frameNum, cvNum, degree, form, knotNum
+#   knots    knotNum float64
+#   frames   frameNum * cvNum * 3 float32, frame after frame
+
+import mmap
+import os
+import struct
+
+CACHE_MAGIC = b"DRCC"
+CACHE_VERSION = 1
+HEADER = struct.Struct("<4sIiIIIII")
+
+
+class CurveCacheWriter(object):
+    """
+    Write curve frames to a cache file one frame at a time, the frames go to disk in chunks.
+    """
+    def __init__(self, filePath, startFrame, cvNum, degree, form, knots, chunkFrameNum=64):
+        """
+        :param filePath: `string` cache file path
+        :param startFrame: `int` frame of the first written frame
+        :param cvNum: `int` number of cvs of the curve
+        :param degree: `int` curve degree
+        :param form: `int` curve form, MFnNurbsCurve.kOpen/kClosed/kPeriodic
+        :param knots: `list` curve knot values
+        :param chunkFrameNum: `int` number of frames held before they are written to disk together
+        """
+        self.filePath = filePath
+        self.startFrame = int(startFrame)
+        self.cvNum = cvNum
+        self.degree = degree
+        self.form = form
+        self.knots = list(knots)
+        self.frameNum = 0
+        self.chunkFrameNum = max(int(chunkFrameNum), 1)
+        self._chunk = []
+        self._frameStruct = struct.Struct("<{0}f".format(cvNum*3))
+        self._file = open(filePath, "wb")
+        self._writeHeader()
+        self._file.write(struct.pack("<{0}d".format(len(self.knots)), *self.knots))
+
+    def _writeHeader(self):
+        self._file.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, self.startFrame, self.frameNum,
+                                     self.cvNum, self.degree, self.form, len(self.knots)))
+
+    def writeFrame(self, cvs):
+        """
+        Append the next frame.
+        :param cvs: `list` cvNum (x, y, z) positions
+        """
+        if len(cvs) != self.cvNum:
+            raise ValueError("Expected {0} cvs, got {1}.".format(self.cvNum, len(cvs)))
+        self._chunk.append(self._frameStruct.pack(*[v for cv in cvs for v in cv[:3]]))
+        self.frameNum += 1
+        if len(self._chunk) >= self.chunkFrameNum:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the held frames to disk.
+        """
+        if self._chunk:
+            self._file.write(b"".join(self._chunk))
+            self._chunk = []
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.seek(0)
+        self._writeHeader()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CurveCacheReader(object):
+    """
+    Random access to the frames of a cache file through a memory map.
+    """
+    def __init__(self, filePath):
+        """
+        :param filePath: `string` cache file path
+        """
+        self.filePath = filePath
+        self.mtime = os.path.getmtime(filePath)
+        self._file = open(filePath, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.startFrame, self.frameNum,
+         self.cvNum, self.degree, self.form, knotNum) = HEADER.unpack_from(self._map, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            self.close()
+            raise ValueError("{0} is not a curve cache file.".format(filePath))
+        self.knots = list(struct.unpack_from("<{0}d".format(knotNum), self._map, HEADER.size))
+        self._dataOffset = HEADER.size + 8*knotNum
+        self._frameStruct = struct.Struct("<{0}f".format(self.cvNum*3))
+
+    @property
+    def endFrame(self):
+        return self.startFrame + self.frameNum - 1
+
+    def readFrame(self, frame):
+        """
+        Cv positions of a cached frame, frames out of the cached range are clamped.
+        :param frame: `int` frame
+        :return: `list` cvNum (x, y, z) positions
+        """
+        index = min(max(int(frame) - self.startFrame, 0), self.frameNum - 1)
+        values = self._frameStruct.unpack_from(self._map, self._dataOffset + index*self._frameStruct.size)
+        return [values[i:i+3] for i in range(0, len(values), 3)]
+
+    def sample(self, time):
+        """
+        Cv positions at any time, linear between the two closest cached frames.
+        :param time: `float` frame
+        :return: `list` cvNum (x, y, z) positions
+        """
+        frame = int(time // 1)
+        weight = time - frame
+        cvs = self.readFrame(frame)
+        if not weight or frame >= self.endFrame or frame < self.startFrame:
+            return cvs
+        nextCvs = self.readFrame(frame+1)
+        return [tuple(a + (b-a)*weight for a, b in zip(cv, nextCv)) for cv, nextCv in zip(cvs, nextCvs)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,1009 @@
+__author__ = 'wuxiaoyu'
+
+# Record a whole rig build as a build plan under plain CPython.
+# pymel.core and maya.OpenMaya are replaced by stand-ins that record every call
+# into a DryRunPlan, so node/connection/setAttr counts can be read before the
+# rig is built in Maya. The plan can still be committed in Maya afterwards.
+
+import argparse
+import fnmatch
+import importlib
+import json
+import math
+import os
+import sys
+import types
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+_moduleDir = os.path.dirname(os.path.abspath(__file__))
+if _moduleDir not in sys.path:
+    sys.path.append(_moduleDir)
+
+import buildplan
+
+# node types created with a parent transform
+SHAPE_TYPES = ("nurbsCurve", "nurbsSurface", "follicle", "hairSystem", "locator", "mesh")
+
+# dag node types that can be created without a parent
+DAG_TYPES = ("transform", "joint", "ikHandle", "nucleus") + SHAPE_TYPES
+
+# modules re-imported against the stand-ins
+RIG_MODULES = ["mayautils", "registry", "rigutils", "scaffold", "splinerig"]
+
+SHORT_ATTR_NAMES = {
+    "t": "translate", "r": "rotate", "s": "scale", "v": "visibility",
+    "jo": "jointOrient", "dla": "displayLocalAxis",
+}
+for _ch in "xyz":
+    for _short, _long in [("t", "translate"), ("r", "rotate"), ("s", "scale")]:
+        SHORT_ATTR_NAMES[_short+_ch] = _long+_ch.upper()
+
+ATTR_DEFAULTS = {
+    "translate": [0.0, 0.0, 0.0], "rotate": [0.0, 0.0, 0.0],
+    "scale": [1.0, 1.0, 1.0], "jointOrient": [0.0, 0.0, 0.0],
+    "visibility": True,
+}
+
+
+class Vector(list):
+    """
+    Minimal stand-in for pymel's datatypes.Vector.
+    """
+    def __init__(self, *args):
+        if len(args) == 1:
+            args = args[0]
+        super(Vector, self).__init__([float(x) for x in args])
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+
+    def __add__(self, other):
+        return Vector([a+b for a, b in zip(self, other)])
+
+    def __sub__(self, other):
+        return Vector([a-b for a, b in zip(self, other)])
+
+    def __neg__(self):
+        return Vector([-a for a in self])
+
+    def __mul__(self, scalar):
+        return Vector([a*scalar for a in self])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        return Vector([a/scalar for a in self])
+
+    __div__ = __truediv__
+
+    def length(self):
+        return math.sqrt(sum(a*a for a in self))
+
+
+class _StandInOpenMaya(types.ModuleType):
+    """
+    The part of maya.OpenMaya used by the rig builders.
+    """
+    class MVector(object):
+        def __init__(self, x=0.0, y=0.0, z=0.0):
+            self.x, self.y, self.z = float(x), float(y), float(z)
+
+        def __getitem__(self, index):
+            return (self.x, self.y, self.z)[index]
+
+        def __iter__(self):
+            return iter((self.x, self.y, self.z))
+
+        def __add__(self, other):
+            return self.__class__(self.x+other[0], self.y+other[1], self.z+other[2])
+
+        def __sub__(self, other):
+            return self.__class__(self.x-other[0], self.y-other[1], self.z-other[2])
+
+        def __mul__(self, other):
+            if isinstance(other, _StandInOpenMaya.MVector):
+                return self.x*other.x + self.y*other.y + self.z*other.z
+            return self.__class__(self.x*other, self.y*other, self.z*other)
+
+        def __truediv__(self, scalar):
+            return self.__class__(self.x/scalar, self.y/scalar, self.z/scalar)
+
+        __div__ = __truediv__
+
+        def __xor__(self, other):
+            return self.__class__(self.y*other.z - self.z*other.y,
+                                  self.z*other.x - self.x*other.z,
+                                  self.x*other.y - self.y*other.x)
+
+        def length(self):
+            return math.sqrt(self.x*self.x + self.y*self.y + self.z*self.z)
+
+        def normal(self):
+            length = self.length()
+            return self/length if length else self.__class__()
+
+    class MPoint(MVector):
+        def distanceTo(self, other):
+            return (self-other).length()
+
+
+class _StandInOpenMaya2(types.ModuleType):
+    """
+    The part of maya.api.OpenMaya used by the rig builders. Matrices are plain 4x4 math,
+    rotations and scales are carried along but the plan only tracks translations.
+    """
+    class MMessage(object):
+        # nothing happens to the scene between the recorded commands, callbacks are never called
+        @staticmethod
+        def removeCallback(callbackId):
+            pass
+
+    class MSceneMessage(MMessage):
+        (kAfterNew, kAfterOpen, kAfterImport, kAfterCreateReference, kAfterRemoveReference,
+         kAfterLoadReference, kAfterUnloadReference) = range(7)
+
+        @staticmethod
+        def addCallback(message, function, clientData=None):
+            return 0
+
+    class MDGMessage(MMessage):
+        @staticmethod
+        def addNodeAddedCallback(function, nodeType="dependNode", clientData=None):
+            return 0
+
+        @staticmethod
+        def addNodeRemovedCallback(function, nodeType="dependNode", clientData=None):
+            return 0
+
+    class MSpace(object):
+        kTransform = 1
+        kWorld = 4
+
+    class MVector(_StandInOpenMaya.MVector):
+        def __init__(self, *args):
+            if len(args) == 1:
+                args = list(args[0])[:3]
+            super(_StandInOpenMaya2.MVector, self).__init__(*args)
+
+        def normalize(self):
+            length = self.length()
+            if length:
+                self.x, self.y, self.z = self.x/length, self.y/length, self.z/length
+            return self
+
+    class MMatrix(object):
+        def __init__(self, values=None):
+            values = list(values) if values is not None else [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1]
+            self.values = [float(x) for x in values]
+
+        def __iter__(self):
+            return iter(self.values)
+
+        def __len__(self):
+            return 16
+
+        def __getitem__(self, index):
+            return self.values[index]
+
+        def __mul__(self, other):
+            a, b = self.values, other.values
+            return self.__class__([sum(a[r*4+k]*b[k*4+c] for k in range(4)) for r in range(4) for c in range(4)])
+
+        def transpose(self):
+            return self.__class__([self.values[c*4+r] for r in range(4) for c in range(4)])
+
+    class MTransformationMatrix(object):
+        def __init__(self, matrix=None):
+            self._matrix = list(matrix) if matrix is not None else list(_StandInOpenMaya2.MMatrix())
+
+        def translation(self, space):
+            return _StandInOpenMaya2.MVector(self._matrix[12:15])
+
+        def setTranslation(self, vector, space):
+            self._matrix[12:15] = [vector[0], vector[1], vector[2]]
+
+        def rotation(self, asQuaternion=False):
+            return [self._matrix[r*4:r*4+3] for r in range(3)]
+
+        def setRotation(self, rotation):
+            for r in range(3):
+                self._matrix[r*4:r*4+3] = rotation[r]
+
+        def scale(self, space):
+            return [1.0, 1.0, 1.0]
+
+        def setScale(self, scale, space):
+            pass
+
+        def asMatrix(self):
+            return _StandInOpenMaya2.MMatrix(self._matrix)
+
+
+class DryRunPlug(buildplan.PlanPlug):
+    """
+    Plan plug that answers pymel queries from the recorded plan.
+    """
+    def get(self):
+        return self.node.plan.getAttr(self)
+
+    def connections(self):
+        return self.node.plan.connectedNodes(self)
+
+    def lock(self):
+        self.node.plan.command("setAttr", [self], {"lock": True})
+
+    def inputs(self, plugs=False):
+        plan = self.node.plan
+        sources = [src for src, dst in plan._links if plan._attrKey(dst) == plan._attrKey(self)]
+        return sources if plugs else [x.node for x in sources]
+
+
+class DryRunNode(buildplan.PlanNode):
+    """
+    Plan node that answers pymel queries from the recorded plan.
+    """
+    def getParent(self):
+        return self.parent
+
+    def getChildren(self, type=None):
+        return self.plan.children(self, type)
+
+    def getShape(self):
+        shapes = [x for x in self.plan.children(self) if x.type in SHAPE_TYPES]
+        return shapes[0] if shapes else None
+
+    def isDefaultNode(self):
+        return False
+
+    def exists(self):
+        return self.index not in self.plan.deleted
+
+    def getTranslation(self, space="object"):
+        if space == "world":
+            return self.plan.worldPosition(self)
+        return Vector(self.plan.getAttr(self.attr("translate")))
+
+    # curve shape queries, recorded curves are the polylines through their points
+    # with one parameter unit per segment
+    def _curvePoints(self):
+        index = self.index if self.index in self.plan._points else self.parent.index
+        return self.plan._points[index]
+
+    def length(self):
+        points = self._curvePoints()
+        return sum((points[i+1]-points[i]).length() for i in range(len(points)-1))
+
+    def findParamFromLength(self, length):
+        points = self._curvePoints()
+        for i in range(len(points)-1):
+            segLength = (points[i+1]-points[i]).length()
+            if length <= segLength or i == len(points)-2:
+                return i + (min(length/segLength, 1.0) if segLength else 0.0)
+            length -= segLength
+        return 0.0
+
+    def getKnotDomain(self):
+        return 0.0, float(len(self._curvePoints())-1)
+
+    def getPointAtParam(self, param, space="preTransform"):
+        points = self._curvePoints()
+        i = min(int(param), len(points)-2)
+        return points[i] + (points[i+1]-points[i])*(param-i)
+
+
+class DryRunPlan(buildplan.BuildPlan):
+    """
+    Build plan recorded without Maya. Keeps enough scene state (names, hierarchy,
+    values, connections) to answer the queries the rig builders make while building.
+    flush() does nothing, call commit() inside Maya to build the recorded rig.
+    """
+    nodeClass = DryRunNode
+    plugClass = DryRunPlug
+
+    def __init__(self):
+        super(DryRunPlan, self).__init__()
+        self.deleted = set()
+        self.selection = []
+        self._byName = {}
+        self._values = {}
+        self._attrs = {}
+        self._links = []
+        self._points = {}
+        self._constraintTargets = {}
+
+    # ---------------------------------------------------------------------
+    # naming and lookup
+    def _uniqueName(self, name, nodeType):
+        if not name:
+            name = nodeType
+            index = 1
+            while "{0}{1}".format(name, index) in self._byName:
+                index += 1
+            return "{0}{1}".format(name, index)
+        if name not in self._byName:
+            return name
+        base = name.rstrip("0123456789")
+        index = 1
+        while "{0}{1}".format(base, index) in self._byName:
+            index += 1
+        return "{0}{1}".format(base, index)
+
+    def _newNode(self, nodeType, name, parent=None):
+        node = super(DryRunPlan, self)._newNode(nodeType, self._uniqueName(name, nodeType), parent)
+        self._byName[node._name] = node
+        return node
+
+    def rename(self, node, name):
+        self._byName.pop(node._name, None)
+        name = self._uniqueName(name, node.type)
+        super(DryRunPlan, self).rename(node, name)
+        self._byName[name] = node
+
+    def setParent(self, node, parent):
+        # keep the world position like parent/setParent do, rotations are not tracked
+        worldPos = self.worldPosition(node)
+        node.parent = parent
+        parentPos = self.worldPosition(parent) if parent is not None else Vector(0, 0, 0)
+        self._values[(node.index, "translate")] = worldPos - parentPos
+        super(DryRunPlan, self).setParent(node, parent)
+
+    def resolveNode(self, obj):
+        if isinstance(obj, buildplan.PlanNode):
+            return obj
+        if isinstance(obj, buildplan.PlanPlug):
+            return obj.node
+        name = str(obj).split(".")[0].split("|")[-1]
+        if name not in self._byName:
+            raise ValueError("No object matches name: {0}".format(obj))
+        return self._byName[name]
+
+    def resolvePlug(self, obj):
+        if isinstance(obj, buildplan.PlanPlug):
+            return obj
+        nodeName, path = str(obj).split(".", 1)
+        return self.plugClass(self.resolveNode(nodeName), path)
+
+    @staticmethod
+    def _attrKey(plug):
+        tokens = plug.path.split(".")
+        tokens = [SHORT_ATTR_NAMES.get(token, token) for token in tokens]
+        return plug.node.index, ".".join(tokens)
+
+    def children(self, node, type=None):
+        return [x for x in self.nodes if x.parent is node and x.index not in self.deleted
+                and (not type or x.type == type)]
+
+    def worldPosition(self, node):
+        pos = Vector(0, 0, 0)
+        while node is not None:
+            pos = pos + Vector(self.getAttr(node.attr("translate")))
+            node = node.parent
+        return pos
+
+    # ---------------------------------------------------------------------
+    # recording
+    def addAttr(self, node, name, default):
+        self._attrs[(node.index, name)] = default
+
+    def hasAttr(self, node, name):
+        return (node.index, SHORT_ATTR_NAMES.get(name, name)) in self._attrs
+
+    def link(self, source, destination):
+        """
+        Record a connection made as a side effect of a command, without adding an op.
+        """
+        self._links.append((self.resolvePlug(source), self.resolvePlug(destination)))
+
+    def connectAttr(self, source, destination, force=False, nextAvailable=False):
+        source = self.resolvePlug(source)
+        destination = self.resolvePlug(destination)
+        if nextAvailable:
+            prefix = self._attrKey(destination)
+            count = len([x for x in self._links if self._attrKey(x[1])[0] == prefix[0]
+                         and self._attrKey(x[1])[1].startswith(prefix[1]+"[")])
+            destination = destination[count]
+        self._links.append((source, destination))
+        super(DryRunPlan, self).connectAttr(source, destination, force)
+
+    def setAttr(self, plug, value):
+        plug = self.resolvePlug(plug)
+        if isinstance(value, (list, tuple)):
+            value = [float(x) if not isinstance(x, bool) else x for x in value]
+        self._values[self._attrKey(plug)] = value
+        super(DryRunPlan, self).setAttr(plug, value)
+
+    def flush(self):
+        return 0
+
+    # ---------------------------------------------------------------------
+    # queries
+    def getAttr(self, plug):
+        plug = self.resolvePlug(plug)
+        key = self._attrKey(plug)
+        if key in self._values:
+            return self._values[key]
+
+        # multi message attributes return the connected nodes
+        sources = sorted([(self._attrKey(dst)[1], src.node) for src, dst in self._links
+                          if self._attrKey(dst)[0] == key[0] and self._attrKey(dst)[1].startswith(key[1]+"[")],
+                         key=lambda x: int(x[0][len(key[1])+1:].split("]")[0]))
+        if sources:
+            return [x[1] for x in sources]
+        if key[1:] and key in self._attrs:
+            return self._attrs[key]
+        return ATTR_DEFAULTS.get(key[1], 0.0)
+
+    def connectedNodes(self, plug):
+        key = self._attrKey(plug)
+        result = []
+        for src, dst in self._links:
+            if self._attrKey(src) == key:
+                result.append(dst.node)
+            elif self._attrKey(dst) == key:
+                result.append(src.node)
+        if not result and plug.node.type == "transform" and plug.node.getShape():
+            return self.connectedNodes(self.plugClass(plug.node.getShape(), plug.path))
+        # like listConnections, report shapes by their transform
+        return [x.parent if x.type in SHAPE_TYPES and x.parent is not None else x for x in result]
+
+    def summary(self):
+        result = super(DryRunPlan, self).summary()
+        result["deletedNodes"] = len(self.deleted)
+        result["liveNodes"] = len(self.nodes) - len(self.deleted)
+        return result
+
+
+class _StandInMel(object):
+    def __init__(self, pm):
+        self._pm = pm
+
+    def assignNSolver(self, solver):
+        plan = self._pm.plan
+        hairShape = plan.selection[0]
+        if solver and self._pm.objExists(solver):
+            # assign to the existing nucleus
+            nucleus = plan.resolveNode(solver)
+            plan.command("assignNSolver", [solver], mel=True)
+        else:
+            nucleus = plan._newNode("nucleus", solver or None)
+            plan.command("assignNSolver", [solver], outputs=[nucleus], mel=True)
+        index = len([x for x in plan._links if x[1].node is nucleus and x[1].path.startswith("inputActive[")])
+        plan.link(hairShape.currentState, nucleus.inputActive[index])
+        plan.link(hairShape.startState, nucleus.inputActiveStart[index])
+        plan.link(nucleus.outputObjects[index], hairShape.nextState)
+        plan.link(nucleus.startFrame, hairShape.startFrame)
+        return nucleus.name()
+
+    def createHairCurveNode(self, *args):
+        plan = self._pm.plan
+        hairShape = plan.resolveNode(args[0])
+        startCurve = plan.resolveNode(args[9])
+        folTransform, folShape = self._pm._shapeNode("follicle")
+        crvTransform, crvShape = self._pm._shapeNode("nurbsCurve", "curve")
+        plan.command("createHairCurveNode", list(args),
+                     outputs=[folTransform, folShape, crvTransform, crvShape], mel=True)
+        hairIndex = len([x for x in plan._links if x[1].node is hairShape and x[1].path.startswith("inputHair")])
+        plan.link(folShape.outHair, hairShape.inputHair[hairIndex])
+        plan.link(hairShape.outputHair[hairIndex], folShape.currentPosition)
+        plan.link(startCurve.local, folShape.startPosition)
+        plan.link(folShape.outCurve, crvShape.create)
+        startTransform = startCurve.parent if startCurve.parent is not None else startCurve
+        startTransform.parent = folTransform
+        return folTransform.name()
+
+    def __getattr__(self, procName):
+        if procName.startswith("_"):
+            raise AttributeError(procName)
+        return lambda *args: self._pm.plan.command(procName, list(args), mel=True)
+
+
+class _DagNodeType(type):
+    """
+    isinstance(node, pm.nt.DagNode) for plan nodes.
+    """
+    def __instancecheck__(cls, node):
+        return isinstance(node, DryRunNode) and (node.parent is not None or node.type in DAG_TYPES)
+
+
+class StandInPymel(types.ModuleType):
+    """
+    The part of pymel.core used by the rig builders, recording into a DryRunPlan.
+    """
+    def __init__(self, plan):
+        super(StandInPymel, self).__init__("pymel.core")
+        self.plan = plan
+        self.mel = _StandInMel(self)
+        self._enums = {}
+        self.nt = types.ModuleType("pymel.core.nodetypes")
+        self.nt.DagNode = _DagNodeType("DagNode", (object,), {})
+        for cstType in ["parentConstraint", "pointConstraint", "orientConstraint",
+                        "scaleConstraint", "aimConstraint", "tangentConstraint"]:
+            setattr(self, cstType, self._constraintCommand(cstType))
+
+    # ---------------------------------------------------------------------
+    # helpers
+    def _flatten(self, objs):
+        result = []
+        for obj in objs:
+            if isinstance(obj, (list, tuple)):
+                result.extend(self._flatten(obj))
+            elif obj is not None:
+                result.append(self.plan.resolveNode(obj))
+        return result
+
+    def _shapeNode(self, nodeType, name=None, parent=None):
+        transform = self.plan._newNode("transform", name or nodeType, parent)
+        shape = self.plan._newNode(nodeType, transform._name+"Shape", transform)
+        return transform, shape
+
+    def _constraintCommand(self, cstType):
+        def constraint(*args, **kwargs):
+            if kwargs.get("q") or kwargs.get("query"):
+                cst = self.plan.resolveNode(args[0])
+                targets = self.plan._constraintTargets.get(cst.index, [])
+                if kwargs.get("wal") or kwargs.get("weightAliasList"):
+                    return [cst.attr("{0}W{1}".format(x.name(), i)) for i, x in enumerate(targets)]
+                return targets
+            nodes = self._flatten(args)
+            targets, constrained = nodes[:-1], nodes[-1]
+            name = kwargs.get("n", kwargs.get("name")) or "{0}_{1}1".format(constrained.name(), cstType)
+            cst = self.plan._newNode(cstType, name, constrained)
+            self.plan._constraintTargets[cst.index] = targets
+            for i, target in enumerate(targets):
+                self.plan.addAttr(cst, "{0}W{1}".format(target.name(), i), 1.0)
+            self.plan.command(cstType, nodes, kwargs, outputs=[cst])
+            return cst
+        return constraint
+
+    # ---------------------------------------------------------------------
+    # node creation
+    def PyNode(self, name):
+        return self.plan.resolveNode(name)
+
+    def createNode(self, nodeType, n=None, name=None, p=None, parent=None, **kwargs):
+        name = n or name
+        parent = p or parent
+        parent = self.plan.resolveNode(parent) if parent else None
+        if nodeType in SHAPE_TYPES and parent is None:
+            transform, shape = self._shapeNode(nodeType)
+            if name:
+                shape.rename(name)
+            self.plan.command("createNode", [nodeType], {"n": shape.name()}, outputs=[shape, transform])
+            return shape
+        return self.plan.createNode(nodeType, name, parent)
+
+    def joint(self, *args, **kwargs):
+        if args or kwargs.get("e") or kwargs.get("edit"):
+            self.plan.command("joint", self._flatten(args), kwargs)
+            return None
+        parent = self.plan.selection[0] if self.plan.selection else None
+        if parent is not None and parent.type != "joint":
+            parent = None
+        jnt = self.plan.createNode("joint", kwargs.get("n", kwargs.get("name")), parent)
+        pos = kwargs.get("p", kwargs.get("position"))
+        if pos:
+            parentPos = self.plan.worldPosition(parent) if parent is not None else Vector(0, 0, 0)
+            jnt.translate.set(Vector(pos) - parentPos)
+        self.plan.selection = [jnt]
+        return jnt
+
+    def curve(self, **kwargs):
+        transform, shape = self._shapeNode("nurbsCurve", kwargs.get("n", kwargs.get("name")) or "curve")
+        self.plan._points[transform.index] = [Vector(x) for x in kwargs.get("p", [])]
+        self.plan.command("curve", [], kwargs, outputs=[transform, shape])
+        return transform
+
+    def sphere(self, **kwargs):
+        transform, shape = self._shapeNode("nurbsSurface", kwargs.get("n", kwargs.get("name")) or "nurbsSphere")
+        self.plan.command("sphere", [], kwargs, outputs=[transform, shape])
+        return [transform]
+
+    def loft(self, *args, **kwargs):
+        transform, shape = self._shapeNode("nurbsSurface", kwargs.get("n", kwargs.get("name")) or "loftedSurface")
+        self.plan.command("loft", self._flatten(args), kwargs, outputs=[transform, shape])
+        return [transform]
+
+    def group(self, *args, **kwargs):
+        grp = self.plan.createNode("transform", kwargs.get("n", kwargs.get("name")) or "group")
+        for node in self._flatten(args):
+            node.setParent(grp)
+        return grp
+
+    def duplicate(self, *args, **kwargs):
+        srcNodes = self._flatten(args)
+        if not kwargs.get("po") and not kwargs.get("parentOnly"):
+            # shapes come along with their transform
+            for node in list(srcNodes):
+                srcNodes.extend([x for x in self.plan.children(node) if x.type in SHAPE_TYPES])
+        copies = {}
+        result = []
+        for i, src in enumerate(srcNodes):
+            name = kwargs.get("n", kwargs.get("name")) if i == 0 else None
+            parent = copies.get(src.index, src.parent) if src.parent is None else copies.get(src.parent.index, src.parent)
+            copy = self.plan._newNode(src.type, name or src._name, parent)
+            copies[src.index] = copy
+            for key, value in list(self.plan._values.items()):
+                if key[0] == src.index:
+                    self.plan._values[(copy.index, key[1])] = value
+            if src.index in self.plan._points:
+                self.plan._points[copy.index] = list(self.plan._points[src.index])
+            result.append(copy)
+        self.plan.command("duplicate", [x for x in srcNodes], kwargs,
+                          outputs=[x for x in result if x.type not in SHAPE_TYPES or x.parent not in result])
+        return [x for x in result if x.type not in SHAPE_TYPES]
+
+    def rebuildCurve(self, curve, **kwargs):
+        curve = self.plan.resolveNode(curve)
+        outputs = [curve]
+        if not kwargs.get("rpo", kwargs.get("replaceOriginal", 1)):
+            outCurve, shape = self._shapeNode("nurbsCurve", "curve")
+            self.plan._points[outCurve.index] = list(self.plan._points.get(curve.index, []))
+            outputs = [outCurve]
+        if kwargs.get("ch", kwargs.get("constructionHistory", 1)):
+            outputs.append(self.plan._newNode("rebuildCurve", None))
+        self.plan.command("rebuildCurve", [curve], kwargs, outputs=outputs)
+        return outputs
+
+    def rebuildSurface(self, surface, **kwargs):
+        surface = self.plan.resolveNode(surface)
+        self.plan.command("rebuildSurface", [surface], kwargs, outputs=[surface])
+        return [surface]
+
+    def skinCluster(self, *args, **kwargs):
+        skc = self.plan._newNode("skinCluster", kwargs.get("n", kwargs.get("name")))
+        self.plan.command("skinCluster", self._flatten(args), kwargs, outputs=[skc])
+        return skc
+
+    def blendShape(self, *args, **kwargs):
+        bs = self.plan._newNode("blendShape", kwargs.get("n", kwargs.get("name")))
+        self.plan.command("blendShape", self._flatten(args), kwargs, outputs=[bs])
+        return [bs]
+
+    def ikHandle(self, **kwargs):
+        handle = self.plan._newNode("ikHandle", kwargs.get("n", kwargs.get("name")))
+        endJoint = self.plan.resolveNode(kwargs.get("ee", kwargs.get("endEffector")))
+        effector = self.plan._newNode("ikEffector", "effector", endJoint.parent)
+        self.plan.command("ikHandle", [], kwargs, outputs=[handle, effector])
+        return [handle, effector]
+
+    def dagPose(self, *args, **kwargs):
+        if kwargs.get("save") or kwargs.get("s"):
+            pose = self.plan._newNode("dagPose", kwargs.get("n", kwargs.get("name")))
+            self.plan.command("dagPose", self._flatten(args), kwargs, outputs=[pose])
+            return pose
+        self.plan.command("dagPose", self._flatten(args), kwargs)
+
+    def setDrivenKeyframe(self, plug, **kwargs):
+        plug = self.plan.resolvePlug(plug)
+        if not [x for x in self.plan._links if x[1].node is plug.node and x[1].path == plug.path]:
+            animCrv = self.plan._newNode("animCurveUU", "{0}_{1}".format(plug.node.name(), plug.path))
+            self.plan.link(animCrv.output, plug)
+            self.plan.command("setDrivenKeyframe", [plug], kwargs, outputs=[animCrv])
+        else:
+            self.plan.command("setDrivenKeyframe", [plug], kwargs)
+
+    # ---------------------------------------------------------------------
+    # editing
+    def parent(self, *args, **kwargs):
+        nodes = self._flatten(args)
+        if kwargs.get("w") or kwargs.get("world"):
+            parent = None
+        else:
+            nodes, parent = nodes[:-1], nodes[-1]
+        for node in nodes:
+            node.setParent(parent)
+        return nodes
+
+    def rename(self, node, name):
+        return self.plan.resolveNode(node).rename(name)
+
+    def delete(self, *args, **kwargs):
+        nodes = self._flatten(args)
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            self.plan.deleted.add(node.index)
+            if self.plan._byName.get(node._name) is node:
+                del self.plan._byName[node._name]
+            stack.extend(self.plan.children(node))
+        self.plan._links = [x for x in self.plan._links
+                            if x[0].node.index not in self.plan.deleted and x[1].node.index not in self.plan.deleted]
+        self.plan.command("delete", nodes, kwargs)
+
+    def select(self, *args, **kwargs):
+        if kwargs.get("d") or kwargs.get("cl") or kwargs.get("clear"):
+            self.plan.selection = []
+        else:
+            self.plan.selection = self._flatten(args)
+
+    def move(self, *args, **kwargs):
+        offset = Vector(args[:3])
+        nodes = self._flatten(args[3:])
+        for node in nodes:
+            pos = Vector(self.plan.getAttr(node.translate))
+            self.plan._values[self.plan._attrKey(node.translate)] = pos + offset
+        self.plan.command("move", list(args[:3]) + nodes, kwargs)
+
+    def xform(self, node, **kwargs):
+        node = self._flatten([node])[0]
+        worldSpace = kwargs.get("ws") or kwargs.get("worldSpace")
+        if kwargs.get("q") or kwargs.get("query"):
+            pos = self.plan.worldPosition(node) if worldSpace else Vector(self.plan.getAttr(node.translate))
+            if kwargs.get("m") or kwargs.get("matrix"):
+                return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0] + list(pos) + [1.0]
+            return pos
+        matrix = kwargs.get("m", kwargs.get("matrix"))
+        if matrix is not None:
+            # rotations are not tracked, record the call and keep the translation
+            self.plan.command("xform", [node], kwargs)
+            pos = Vector(list(matrix)[12:15])
+            if worldSpace and node.parent is not None:
+                pos = pos - self.plan.worldPosition(node.parent)
+            self.plan._values[(node.index, "translate")] = pos
+            return
+        pos = kwargs.get("t", kwargs.get("translation"))
+        if pos is not None:
+            if worldSpace and node.parent is not None:
+                pos = Vector(pos) - self.plan.worldPosition(node.parent)
+            node.translate.set(Vector(pos))
+
+    def makeIdentity(self, node, **kwargs):
+        node = self.plan.resolveNode(node)
+        for attr in ["translate", "rotate", "scale"]:
+            self.plan._values[(node.index, attr)] = ATTR_DEFAULTS[attr]
+        self.plan.command("makeIdentity", [node], kwargs)
+
+    def addAttr(self, node, **kwargs):
+        node = self.plan.resolveNode(node)
+        name = kwargs.get("ln", kwargs.get("longName"))
+        if kwargs.get("m") or kwargs.get("multi"):
+            default = []
+        elif kwargs.get("dt", kwargs.get("dataType")) == "string":
+            default = ""
+        else:
+            default = kwargs.get("dv", kwargs.get("defaultValue", 0.0))
+        if kwargs.get("en", kwargs.get("enumName")):
+            self._enums[(node.index, name)] = kwargs.get("en", kwargs.get("enumName"))
+        self.plan.addAttr(node, name, default)
+        self.plan.command("addAttr", [node], kwargs)
+
+    def setAttr(self, plug, *values, **kwargs):
+        plug = self.plan.resolvePlug(plug)
+        if values:
+            plug.set(*values)
+        if kwargs:
+            self.plan.command("setAttr", [plug], kwargs)
+
+    def getAttr(self, plug, **kwargs):
+        return self.plan.getAttr(plug)
+
+    def connectAttr(self, source, destination, **kwargs):
+        self.plan.connectAttr(source, destination, force=bool(kwargs.get("f", kwargs.get("force"))),
+                              nextAvailable=bool(kwargs.get("na", kwargs.get("nextAvailable"))))
+
+    def disconnectAttr(self, source, destination=None, **kwargs):
+        self.plan.command("disconnectAttr", [source, destination], kwargs)
+
+    def loadPlugin(self, path, **kwargs):
+        self.plan.command("loadPlugin", [path], kwargs)
+
+    # ---------------------------------------------------------------------
+    # queries
+    def pluginInfo(self, *args, **kwargs):
+        return True
+
+    def undoInfo(self, **kwargs):
+        return False
+
+    def refresh(self, **kwargs):
+        pass
+
+    def objExists(self, name):
+        nodeName, _, attrName = str(name).partition(".")
+        try:
+            node = self.plan.resolveNode(nodeName)
+        except ValueError:
+            return False
+        return self.plan.hasAttr(node, attrName) if attrName else node.index not in self.plan.deleted
+
+    def namespaceInfo(self, *args, **kwargs):
+        # namespaces of the recorded node names, nested ones with all their parents
+        namespaces = set()
+        for node in self.plan.nodes:
+            parts = node.name().split(":")[:-1]
+            namespaces.update(":".join(parts[:i+1]) for i in range(len(parts)))
+        return sorted(namespaces)
+
+    def attributeQuery(self, attrName, node=None, exists=False, **kwargs):
+        node = self.plan.resolveNode(node)
+        if kwargs.get("listEnum") or kwargs.get("le"):
+            return [self._enums.get((node.index, attrName), "")]
+        return self.plan.hasAttr(node, attrName)
+
+    def arclen(self, curve, **kwargs):
+        points = self.plan._points.get(self.plan.resolveNode(curve).index, [])
+        return sum((points[i+1]-points[i]).length() for i in range(len(points)-1))
+
+    def listRelatives(self, node, **kwargs):
+        node = self.plan.resolveNode(node)
+        nodeType = kwargs.get("typ", kwargs.get("type"))
+        if kwargs.get("p") or kwargs.get("parent"):
+            return [node.parent] if node.parent is not None else []
+        if kwargs.get("ad") or kwargs.get("allDescendents"):
+            result = []
+            stack = self.plan.children(node)
+            while stack:
+                child = stack.pop()
+                result.append(child)
+                stack.extend(self.plan.children(child))
+            return [x for x in result if not nodeType or x.type == nodeType]
+        return self.plan.children(node, nodeType)
+
+    def listConnections(self, objs, **kwargs):
+        objs = objs if isinstance(objs, list) else [objs]
+        nodeType = kwargs.get("t", kwargs.get("type"))
+        result = []
+        for obj in objs:
+            node = self.plan.resolveNode(obj)
+            path = self.plan._attrKey(obj)[1] if isinstance(obj, buildplan.PlanPlug) else None
+            for src, dst in self.plan._links:
+                for this, other in [(src, dst), (dst, src)]:
+                    if this.node is not node or (nodeType and other.node.type != nodeType):
+                        continue
+                    if path and not (self.plan._attrKey(this)[1]+"[").startswith(path):
+                        continue
+                    result.append((this, other) if kwargs.get("c") else other.node)
+        return result
+
+    def ls(self, *args, **kwargs):
+        nodeType = kwargs.get("type", kwargs.get("typ"))
+        nodes = [x for x in self.plan.nodes if x.index not in self.plan.deleted
+                 and (not nodeType or x.type == nodeType)]
+        if args:
+            nodePattern, _, attrName = str(args[0]).partition(".")
+            nodes = [x for x in nodes if fnmatch.fnmatchcase(x.name(), nodePattern)
+                     and (not attrName or self.plan.hasAttr(x, attrName))]
+        return nodes
+
+
+class StandInModules(object):
+    """
+    Context that swaps pymel.core and maya.OpenMaya for the stand-ins and
+    imports a fresh copy of the rig modules recording into the given plan.
+    The previous modules are restored on exit.
+    """
+    def __init__(self, plan):
+        self.plan = plan
+        self.modules = {}
+        self._saved = {}
+
+    def __enter__(self):
+        pm = StandInPymel(self.plan)
+        pymelPkg = types.ModuleType("pymel")
+        pymelPkg.core = pm
+        om = _StandInOpenMaya("maya.OpenMaya")
+        om2 = _StandInOpenMaya2("maya.api.OpenMaya")
+        apiPkg = types.ModuleType("maya.api")
+        apiPkg.OpenMaya = om2
+        mayaPkg = types.ModuleType("maya")
+        mayaPkg.OpenMaya = om
+        mayaPkg.api = apiPkg
+        standIns = {"pymel": pymelPkg, "pymel.core": pm, "maya": mayaPkg, "maya.OpenMaya": om,
+                    "maya.api": apiPkg, "maya.api.OpenMaya": om2}
+
+        for name in list(standIns) + RIG_MODULES:
+            self._saved[name] = sys.modules.pop(name, None)
+        sys.modules.update(standIns)
+        # the rig modules reload their dependencies on import, python 3 has no builtin reload
+        self._hasReload = hasattr(builtins, "reload")
+        if not self._hasReload:
+            builtins.reload = importlib.reload
+        for name in RIG_MODULES:
+            self.modules[name] = importlib.import_module(name)
+        return self
+
+    def __exit__(self, *args):
+        if not self._hasReload:
+            del builtins.reload
+        for name, module in self._saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def recordBuild(prefix, rigAttrs=None, startPos=None, endPos=None, metaPos=None, midPositions=None):
+    """
+    Record a SplineRig build without Maya.
+    :param prefix: `string` rig prefix
+    :param rigAttrs: `dict` SplineRig.rigAttrs values, class defaults are used for the others
+    :param startPos: `list` [x, y, z] start position of the chain
+    :param endPos: `list` [x, y, z] end position of the chain
+    :param metaPos: `list` [x, y, z] meta ctrl position, defaults to startPos
+    :param midPositions: `list` [[x, y, z], ...] positions the chain goes through between start and end
+    :return: `DryRunPlan` recorded plan
+    """
+    plan = DryRunPlan()
+    with StandInModules(plan) as standIn:
+        rig = standIn.modules["splinerig"].SplineRig(prefix)
+        for attrName, value in (rigAttrs or {}).items():
+            setattr(rig, attrName, value)
+        if startPos:
+            rig.startPos = rig.metaPos = list(startPos)
+        if endPos:
+            rig.endPos = list(endPos)
+        if metaPos:
+            rig.metaPos = list(metaPos)
+        if midPositions:
+            rig.midPositions = [list(x) for x in midPositions]
+        rig.buildRig(None, plan=plan)
+    return plan
+
+
+def rigDefaults():
+    """
+    Class defaults of SplineRig, read without Maya.
+    :return: `tuple` (`dict` rig attr name: default value, `list` scaffold chain positions)
+    """
+    with StandInModules(DryRunPlan()) as standIn:
+        rigClass = standIn.modules["splinerig"].SplineRig
+        return dict((x["ln"], x["dv"]) for x in rigClass.rigAttrs), [list(x) for x in rigClass.scaffoldChain]
+
+
+def recordScaffold(prefix, scaffoldChain, upAxisSolver=0):
+    """
+    Record a scaffold chain build without Maya.
+    :param prefix: `string` scaffold chain prefix
+    :param scaffoldChain: `list` ordered chain locator world positions, see scaffold.buildScaffoldChain
+    :param upAxisSolver: `int` scaffold.buildScaffoldChain upAxisSolver
+    :return: `DryRunPlan` recorded plan
+    """
+    plan = DryRunPlan()
+    with StandInModules(plan) as standIn:
+        standIn.modules["scaffold"].buildScaffoldChain(prefix, scaffoldChain, upAxisSolver=upAxisSolver)
+    return plan
+
+
+def formatSummary(summary):
+    """
+    Short text report of a plan summary.
+    :param summary: `dict` BuildPlan.summary() result
+    :return: `string`
+    """
+    lines = ["nodes: {0} (live {1})  connections: {2}  setAttrs: {3}  commands: {4}".format(
+        summary["nodes"], summary.get("liveNodes", summary["nodes"]), summary["connections"],
+        summary["setAttrs"], summary["commands"])]
+    for name, data in sorted(summary["subsystems"].items()):
+        lines.append("  {0:<12} nodes: {1:>6}  connections: {2:>6}  setAttrs: {3:>6}".format(
+            name, data["nodes"], data["connections"], data["setAttrs"]))
+    return "\n".join(lines)
+
+
+def _parseValue(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a DynRigBuilder rig build without Maya.")
+    parser.add_argument("prefix", help="rig prefix")
+    parser.add_argument("--set", action="append", default=[], metavar="ATTR=VALUE",
+                        help="rig attribute value, eg. --set jointNum=40")
+    parser.add_argument("--json", help="write the plan to this json file")
+    args = parser.parse_args(argv)
+
+    rigAttrs = dict((x.split("=", 1)[0], _parseValue(x.split("=", 1)[1])) for x in args.set)
+    plan = recordBuild(args.prefix, rigAttrs)
+    if args.json:
+        plan.toJson(args.json)
+    print(formatSummary(plan.summary()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,687 @@
+__author__ = 'wuxiaoyu'
+
+# custom compute nodes used by DynRigBuilder, load with mayautils.loadNodePlugin()
+
+import os
+import sys
+import maya.api.OpenMaya as om2
+
+# the plugin is loaded by path, make the sibling solver modules importable
+_pluginDir = os.path.dirname(os.path.abspath(__file__))
+if _pluginDir not in sys.path:
+    sys.path.append(_pluginDir)
+import curvecache
+from nodemath import MIN_FALLOFF, computeLengthParams, computeVariableFK
+
+# open cache readers by normalized file path, shared by all dynCurveCache nodes
+_cacheReaders = {}
+
+# up vector of every scaffold locator upAxis enum value, y:-y:z:-z
+UP_AXIS_VECTORS = [(0.0, 1.0, 0.0), (0.0, -1.0, 0.0), (0.0, 0.0, 1.0), (0.0, 0.0, -1.0)]
+
+
+def maya_useNewAPI():
+    pass
+
+
+class VariableFKNode(om2.MPxNode):
+    """
+    Evaluate the whole variable fk falloff network of a joint chain in one compute.
+    """
+    kNodeName = "dynVariableFK"
+    kNodeId = om2.MTypeId(0x0007F7A0)
+
+    jointParam = None
+    control = None
+    controlPosition = None
+    controlRotateFallOff = None
+    controlScaleFallOff = None
+    controlRotate = None
+    controlScale = None
+    output = None
+    outputRotate = None
+    outputScale = None
+
+    @staticmethod
+    def creator():
+        return VariableFKNode()
+
+    @classmethod
+    def initialize(cls):
+        nAttr = om2.MFnNumericAttribute()
+        uAttr = om2.MFnUnitAttribute()
+        cAttr = om2.MFnCompoundAttribute()
+
+        cls.jointParam = nAttr.create("jointParam", "jp", om2.MFnNumericData.kFloat, 0.0)
+        nAttr.array = True
+        nAttr.usesArrayDataBuilder = True
+
+        # fk ctrl inputs
+        cls.controlPosition = nAttr.create("controlPosition", "cp", om2.MFnNumericData.kFloat, 0.0)
+        cls.controlRotateFallOff = nAttr.create("controlRotateFallOff", "crf", om2.MFnNumericData.kFloat, 0.2)
+        nAttr.setMin(MIN_FALLOFF)
+        cls.controlScaleFallOff = nAttr.create("controlScaleFallOff", "csf", om2.MFnNumericData.kFloat, 0.2)
+        nAttr.setMin(MIN_FALLOFF)
+        rotChildren = [uAttr.create("controlRotate"+ax, "cr"+ax.lower(), om2.MFnUnitAttribute.kAngle, 0.0)
+                       for ax in "XYZ"]
+        cls.controlRotate = nAttr.create("controlRotate", "cr", *rotChildren)
+        cls.controlScale = nAttr.create("controlScale", "cs", om2.MFnNumericData.k3Double, 1.0)
+        cls.control = cAttr.create("control", "ctl")
+        for child in [cls.controlPosition, cls.controlRotateFallOff, cls.controlScaleFallOff,
+                      cls.controlRotate, cls.controlScale]:
+            cAttr.addChild(child)
+        cAttr.array = True
+
+        # per joint outputs
+        rotChildren = [uAttr.create("outputRotate"+ax, "or"+ax.lower(), om2.MFnUnitAttribute.kAngle, 0.0)
+                       for ax in "XYZ"]
+        cls.outputRotate = nAttr.create("outputRotate", "or", *rotChildren)
+        nAttr.writable = False
+        cls.outputScale = nAttr.create("outputScale", "os", om2.MFnNumericData.k3Double, 1.0)
+        nAttr.writable = False
+        cls.output = cAttr.create("output", "out")
+        cAttr.addChild(cls.outputRotate)
+        cAttr.addChild(cls.outputScale)
+        cAttr.array = True
+        cAttr.usesArrayDataBuilder = True
+        cAttr.writable = False
+        cAttr.storable = False
+
+        for attr in [cls.jointParam, cls.control, cls.output]:
+            cls.addAttribute(attr)
+        for attr in [cls.jointParam, cls.control]:
+            cls.attributeAffects(attr, cls.output)
+            cls.attributeAffects(attr, cls.outputRotate)
+            cls.attributeAffects(attr, cls.outputScale)
+
+    def compute(self, plug, dataBlock):
+        # output[i].outputRotate.outputRotateX is two levels below the element
+        while plug.isChild:
+            plug = plug.parent()
+        if plug.isElement:
+            plug = plug.array()
+        if plug.attribute() != self.output:
+            return None
+
+        # gather inputs
+        jntIndices = []
+        jntParams = []
+        jntHandle = dataBlock.inputArrayValue(self.jointParam)
+        for i in range(len(jntHandle)):
+            jntHandle.jumpToPhysicalElement(i)
+            jntIndices.append(jntHandle.elementLogicalIndex())
+            jntParams.append(jntHandle.inputValue().asFloat())
+
+        controls = []
+        ctrlHandle = dataBlock.inputArrayValue(self.control)
+        for i in range(len(ctrlHandle)):
+            ctrlHandle.jumpToPhysicalElement(i)
+            elem = ctrlHandle.inputValue()
+            controls.append((elem.child(self.controlPosition).asFloat(),
+                             elem.child(self.controlRotateFallOff).asFloat(),
+                             elem.child(self.controlScaleFallOff).asFloat(),
+                             elem.child(self.controlRotate).asDouble3(),
+                             elem.child(self.controlScale).asDouble3()))
+
+        # write all joint outputs at once
+        outHandle = dataBlock.outputArrayValue(self.output)
+        builder = outHandle.builder()
+        for index, (rot, scale) in zip(jntIndices, computeVariableFK(jntParams, controls)):
+            elem = builder.addElement(index)
+            elem.child(self.outputRotate).set3Double(*rot)
+            elem.child(self.outputScale).set3Double(*scale)
+        outHandle.set(builder)
+        outHandle.setAllClean()
+        dataBlock.setClean(plug)
+
+
+def getCacheReader(filePath):
+    """
+    Get the memory mapped reader of a curve cache file, reopened when the file changed.
+    :param filePath: `string` cache file path
+    :return: `CurveCacheReader` or None if the file doesn't exist
+    """
+    if not filePath or not os.path.exists(filePath):
+        return None
+    key = _readerKey(filePath)
+    reader = _cacheReaders.get(key)
+    if reader and reader.mtime != os.path.getmtime(filePath):
+        reader.close()
+        reader = None
+    if not reader:
+        reader = curvecache.CurveCacheReader(filePath)
+        _cacheReaders[key] = reader
+    return reader
+
+
+def closeCacheReader(filePath):
+    """
+    Close the reader of a curve cache file and release its memory map, eg. before the file is
+    written again or deleted. The file is opened again by the next dynCurveCache evaluation.
+    :param filePath: `string` cache file path
+    :return: `bool` True if a reader was open
+    """
+    reader = _cacheReaders.pop(_readerKey(filePath), None) if filePath else None
+    if reader:
+        reader.close()
+    return reader is not None
+
+
+def _readerKey(filePath):
+    return os.path.normcase(os.path.abspath(filePath))
+
+
+class CurveCacheNode(om2.MPxNode):
+    """
+    Play back a curve cache file, the curve of the current frame is read from the memory map.
+    """
+    kNodeName = "dynCurveCache"
+    kNodeId = om2.MTypeId(0x0007F7A1)
+
+    cacheFile = None
+    time = None
+    outCurve = None
+
+    @staticmethod
+    def creator():
+        return CurveCacheNode()
+
+    @classmethod
+    def initialize(cls):
+        tAttr = om2.MFnTypedAttribute()
+        uAttr = om2.MFnUnitAttribute()
+
+        cls.cacheFile = tAttr.create("cacheFile", "cf", om2.MFnData.kString)
+        tAttr.usedAsFilename = True
+        cls.time = uAttr.create("time", "tm", om2.MFnUnitAttribute.kTime, 0.0)
+        cls.outCurve = tAttr.create("outCurve", "oc", om2.MFnData.kNurbsCurve)
+        tAttr.writable = False
+        tAttr.storable = False
+
+        for attr in [cls.cacheFile, cls.time, cls.outCurve]:
+            cls.addAttribute(attr)
+        for attr in [cls.cacheFile, cls.time]:
+            cls.attributeAffects(attr, cls.outCurve)
+
+    def compute(self, plug, dataBlock):
+        if plug != self.outCurve:
+            return None
+
+        filePath = dataBlock.inputValue(self.cacheFile).asString()
+        frame = dataBlock.inputValue(self.time).asTime().asUnits(om2.MTime.uiUnit())
+        reader = getCacheReader(filePath)
+        outHandle = dataBlock.outputValue(self.outCurve)
+        if reader and reader.frameNum:
+            outData = om2.MFnNurbsCurveData().create()
+            cvs = om2.MPointArray([om2.MPoint(*cv) for cv in reader.sample(frame)])
+            om2.MFnNurbsCurve().create(cvs, reader.knots, reader.degree, reader.form,
+                                       False, False, outData)
+            outHandle.setMObject(outData)
+        outHandle.setClean()
+        dataBlock.setClean(plug)
+
+
+class CurveLengthNode(om2.MPxNode):
+    """
+    Arc length parameters of the ik sub curve with length preservation, computed with Gauss-Legendre
+    quadrature on the curve itself instead of a rebuilt high degree curve.
+    """
+    kNodeName = "dynCurveLength"
+    kNodeId = om2.MTypeId(0x0007F7A2)
+
+    inputCurve = None
+    restLength = None
+    globalScale = None
+    preserveLength = None
+    parameterNum = None
+    arcLength = None
+    outputParameter = None
+
+    @staticmethod
+    def creator():
+        return CurveLengthNode()
+
+    @classmethod
+    def initialize(cls):
+        tAttr = om2.MFnTypedAttribute()
+        nAttr = om2.MFnNumericAttribute()
+
+        cls.inputCurve = tAttr.create("inputCurve", "ic", om2.MFnData.kNurbsCurve)
+        cls.restLength = nAttr.create("restLength", "rl", om2.MFnNumericData.kDouble, 0.0)
+        nAttr.setMin(0.0)
+        cls.globalScale = nAttr.create("globalScale", "gs", om2.MFnNumericData.kDouble, 1.0)
+        cls.preserveLength = nAttr.create("preserveLength", "pl", om2.MFnNumericData.kBoolean, True)
+        cls.parameterNum = nAttr.create("parameterNum", "pn", om2.MFnNumericData.kInt, 2)
+        nAttr.setMin(1)
+
+        cls.arcLength = nAttr.create("arcLength", "al", om2.MFnNumericData.kDouble, 0.0)
+        nAttr.writable = False
+        nAttr.storable = False
+        cls.outputParameter = nAttr.create("outputParameter", "op", om2.MFnNumericData.kDouble, 0.0)
+        nAttr.array = True
+        nAttr.usesArrayDataBuilder = True
+        nAttr.writable = False
+        nAttr.storable = False
+
+        inputs = [cls.inputCurve, cls.restLength, cls.globalScale, cls.preserveLength, cls.parameterNum]
+        for attr in inputs + [cls.arcLength, cls.outputParameter]:
+            cls.addAttribute(attr)
+        for attr in inputs:
+            cls.attributeAffects(attr, cls.arcLength)
+            cls.attributeAffects(attr, cls.outputParameter)
+
+    def compute(self, plug, dataBlock):
+        if plug.isElement:
+            plug = plug.array()
+        if plug != self.arcLength and plug != self.outputParameter:
+            return None
+
+        curveFn = om2.MFnNurbsCurve(dataBlock.inputValue(self.inputCurve).asNurbsCurveTransformed())
+        restLength = dataBlock.inputValue(self.restLength).asDouble()*dataBlock.inputValue(self.globalScale).asDouble()
+        preserveLength = dataBlock.inputValue(self.preserveLength).asBool()
+        paramNum = dataBlock.inputValue(self.parameterNum).asInt()
+
+        minValue, maxValue = curveFn.knotDomain
+        breakpoints = sorted(set([minValue, maxValue] + [k for k in curveFn.knots() if minValue < k < maxValue]))
+        speed = lambda u: curveFn.getDerivativesAtParam(u, om2.MSpace.kObject)[1].length()
+        arcLength, params = computeLengthParams(speed, breakpoints, paramNum, restLength, preserveLength)
+
+        dataBlock.outputValue(self.arcLength).setDouble(arcLength)
+        outHandle = dataBlock.outputArrayValue(self.outputParameter)
+        builder = outHandle.builder()
+        for i, param in enumerate(params):
+            builder.addElement(i).setDouble(param)
+        outHandle.set(builder)
+        outHandle.setAllClean()
+        dataBlock.setClean(self.arcLength)
+        dataBlock.setClean(self.outputParameter)
+
+
+def _matrixFromAxes(xAxis, yAxis, zAxis, position=None):
+    values = [xAxis.x, xAxis.y, xAxis.z, 0.0,
+              yAxis.x, yAxis.y, yAxis.z, 0.0,
+              zAxis.x, zAxis.y, zAxis.z, 0.0]
+    values += [position.x, position.y, position.z, 1.0] if position else [0.0, 0.0, 0.0, 1.0]
+    return om2.MMatrix(values)
+
+
+def jointChannels(parentMatrix, positions, orientations, scales, jointOrients):
+    """
+    Translate/rotate of every joint of a chain reaching the given world positions and orientations.
+    Joints compensate the scale of their parent joint, the uniform scale of parentMatrix is inherited.
+    :param parentMatrix: `MMatrix` world matrix of the parent of the first joint
+    :param positions: `list` MPoint world position per joint
+    :param orientations: `list` MQuaternion world orientation per joint
+    :param scales: `list` [sx, sy, sz] scale channel values per joint
+    :param jointOrients: `list` MEulerRotation joint orient per joint
+    :return: `list` (MPoint translate, MEulerRotation rotate, MMatrix world matrix) per joint
+    """
+    parentXform = om2.MTransformationMatrix(parentMatrix)
+    parentScale = parentXform.scale(om2.MSpace.kWorld)[0]
+    parentWorld = parentMatrix
+    parentRotation = parentXform.rotation(asQuaternion=True).asMatrix()
+    channels = []
+    for position, orientation, scale, jointOrient in zip(positions, orientations, scales, jointOrients):
+        translate = om2.MPoint(position)*parentWorld.inverse()
+        rotate = om2.MTransformationMatrix(orientation.asMatrix()*parentRotation.inverse()*
+                                           jointOrient.asMatrix().inverse()).rotation()
+        xform = om2.MTransformationMatrix()
+        xform.setScale([x*parentScale for x in scale], om2.MSpace.kTransform)
+        xform.setRotation(orientation)
+        xform.setTranslation(om2.MVector(position), om2.MSpace.kTransform)
+        world = xform.asMatrix()
+        channels.append((translate, rotate, world))
+        parentWorld = world
+        parentRotation = orientation.asMatrix()
+    return channels
+
+
+def splineJointOrientations(positions, subRotations):
+    """
+    World orientation of every joint of the ik chain: x aims at the next joint, y follows the y axis of
+    the rotation blended between the two sub joints around the joint, the last joint takes that rotation.
+    :param positions: `list` MPoint world position of every joint
+    :param subRotations: `list` MQuaternion world rotation of every sub joint, evenly spread on the chain
+    :return: `list` MQuaternion per joint
+    """
+    jointNum = len(positions)
+    orientations = []
+    for i in range(jointNum):
+        # twist, slerp between the bracketing sub joints
+        fraction = i/(jointNum-1.0) if jointNum > 1 else 0.0
+        position = fraction*(len(subRotations)-1)
+        index = min(int(position), len(subRotations)-2)
+        if index < 0:
+            twist = subRotations[0]
+        else:
+            twist = om2.MQuaternion.slerp(subRotations[index], subRotations[index+1], position-index)
+        if i == jointNum-1:
+            orientations.append(twist)
+            continue
+
+        # aim
+        xAxis = om2.MVector(positions[i+1] - positions[i])
+        if xAxis.length() < 1e-9:
+            orientations.append(orientations[-1] if orientations else twist)
+            continue
+        xAxis.normalize()
+        upAxis = om2.MVector(0, 1, 0).rotateBy(twist)
+        zAxis = xAxis ^ upAxis
+        if zAxis.length() < 1e-9:
+            zAxis = xAxis ^ om2.MVector(0, 0, 1).rotateBy(twist)
+        zAxis.normalize()
+        yAxis = zAxis ^ xAxis
+        orientations.append(om2.MTransformationMatrix(_matrixFromAxes(xAxis, yAxis, zAxis)).rotation(asQuaternion=True))
+    return orientations
+
+
+class SplineJointsNode(om2.MPxNode):
+    """
+    Evaluate the whole ik aim chain in one compute: joints at equal arc lengths on the sub curve
+    (clipped at the rest length with preserveLength), twisted by the sub joints, aiming at the next joint.
+    Outputs the local translate/rotate of a joint chain under parentMatrix, and the joint world matrices.
+    """
+    kNodeName = "dynSplineJoints"
+    kNodeId = om2.MTypeId(0x0007F7A3)
+
+    inputCurve = None
+    subMatrix = None
+    parentMatrix = None
+    jointOrient = None
+    restLength = None
+    globalScale = None
+    preserveLength = None
+    jointNum = None
+    output = None
+    outputTranslate = None
+    outputRotate = None
+    outputMatrix = None
+
+    @staticmethod
+    def creator():
+        return SplineJointsNode()
+
+    @classmethod
+    def initialize(cls):
+        tAttr = om2.MFnTypedAttribute()
+        nAttr = om2.MFnNumericAttribute()
+        uAttr = om2.MFnUnitAttribute()
+        mAttr = om2.MFnMatrixAttribute()
+        cAttr = om2.MFnCompoundAttribute()
+
+        cls.inputCurve = tAttr.create("inputCurve", "ic", om2.MFnData.kNurbsCurve)
+        cls.subMatrix = mAttr.create("subMatrix", "sm")
+        mAttr.array = True
+        cls.parentMatrix = mAttr.create("parentMatrix", "pm")
+        joChildren = [uAttr.create("jointOrient"+ax, "jo"+ax.lower(), om2.MFnUnitAttribute.kAngle, 0.0)
+                      for ax in "XYZ"]
+        cls.jointOrient = nAttr.create("jointOrient", "jo", *joChildren)
+        nAttr.array = True
+        cls.restLength = nAttr.create("restLength", "rl", om2.MFnNumericData.kDouble, 0.0)
+        nAttr.setMin(0.0)
+        cls.globalScale = nAttr.create("globalScale", "gs", om2.MFnNumericData.kDouble, 1.0)
+        cls.preserveLength = nAttr.create("preserveLength", "pl", om2.MFnNumericData.kBoolean, True)
+        cls.jointNum = nAttr.create("jointNum", "jn", om2.MFnNumericData.kInt, 2)
+        nAttr.setMin(2)
+
+        # per joint outputs
+        cls.outputTranslate = nAttr.create("outputTranslate", "ot", om2.MFnNumericData.k3Double, 0.0)
+        nAttr.writable = False
+        rotChildren = [uAttr.create("outputRotate"+ax, "or"+ax.lower(), om2.MFnUnitAttribute.kAngle, 0.0)
+                       for ax in "XYZ"]
+        cls.outputRotate = nAttr.create("outputRotate", "or", *rotChildren)
+        nAttr.writable = False
+        cls.outputMatrix = mAttr.create("outputMatrix", "om")
+        mAttr.writable = False
+        cls.output = cAttr.create("output", "out")
+        for child in [cls.outputTranslate, cls.outputRotate, cls.outputMatrix]:
+            cAttr.addChild(child)
+        cAttr.array = True
+        cAttr.usesArrayDataBuilder = True
+        cAttr.writable = False
+        cAttr.storable = False
+
+        inputs = [cls.inputCurve, cls.subMatrix, cls.parentMatrix, cls.jointOrient, cls.restLength,
+                  cls.globalScale, cls.preserveLength, cls.jointNum]
+        for attr in inputs + [cls.output]:
+            cls.addAttribute(attr)
+        for attr in inputs:
+            for outAttr in [cls.output, cls.outputTranslate, cls.outputRotate, cls.outputMatrix]:
+                cls.attributeAffects(attr, outAttr)
+
+    def compute(self, plug, dataBlock):
+        while plug.isChild:
+            plug = plug.parent()
+        if plug.isElement:
+            plug = plug.array()
+        if plug != self.output:
+            return None
+
+        curveFn = om2.MFnNurbsCurve(dataBlock.inputValue(self.inputCurve).asNurbsCurveTransformed())
+        globalScale = dataBlock.inputValue(self.globalScale).asDouble()
+        restLength = dataBlock.inputValue(self.restLength).asDouble()*globalScale
+        preserveLength = dataBlock.inputValue(self.preserveLength).asBool()
+        jointNum = dataBlock.inputValue(self.jointNum).asInt()
+        parentMatrix = dataBlock.inputValue(self.parentMatrix).asMatrix()
+
+        subRotations = []
+        subHandle = dataBlock.inputArrayValue(self.subMatrix)
+        for i in range(len(subHandle)):
+            subHandle.jumpToPhysicalElement(i)
+            subRotations.append(om2.MTransformationMatrix(subHandle.inputValue().asMatrix()).rotation(asQuaternion=True))
+        jointOrients = {}
+        joHandle = dataBlock.inputArrayValue(self.jointOrient)
+        for i in range(len(joHandle)):
+            joHandle.jumpToPhysicalElement(i)
+            jointOrients[joHandle.elementLogicalIndex()] = om2.MEulerRotation(*joHandle.inputValue().asDouble3())
+        if not subRotations:
+            subRotations = [om2.MQuaternion()]
+
+        # positions at equal arc lengths
+        minValue, maxValue = curveFn.knotDomain
+        breakpoints = sorted(set([minValue, maxValue] + [k for k in curveFn.knots() if minValue < k < maxValue]))
+        speed = lambda u: curveFn.getDerivativesAtParam(u, om2.MSpace.kObject)[1].length()
+        params = computeLengthParams(speed, breakpoints, jointNum, restLength, preserveLength)[1]
+        positions = [curveFn.getPointAtParam(u, om2.MSpace.kObject) for u in params]
+        orientations = splineJointOrientations(positions, subRotations)
+
+        # joints are scaled by the global scale on y and z
+        scales = [[1.0, globalScale, globalScale]]*jointNum
+        jointOrients = [jointOrients.get(i, om2.MEulerRotation()) for i in range(jointNum)]
+        outHandle = dataBlock.outputArrayValue(self.output)
+        builder = outHandle.builder()
+        channels = jointChannels(parentMatrix, positions, orientations, scales, jointOrients)
+        for i, (translate, rotate, world) in enumerate(channels):
+            elem = builder.addElement(i)
+            elem.child(self.outputTranslate).set3Double(translate.x, translate.y, translate.z)
+            elem.child(self.outputRotate).set3Double(rotate.x, rotate.y, rotate.z)
+            elem.child(self.outputMatrix).setMMatrix(world)
+        outHandle.set(builder)
+        outHandle.setAllClean()
+        dataBlock.setClean(plug)
+
+
+class JointBlendNode(om2.MPxNode):
+    """
+    Blend two joint chains onto a third one in one compute: world positions are lerped and world
+    rotations slerped like a two target parentConstraint, scale channels are lerped like blendColors.
+    """
+    kNodeName = "dynJointBlend"
+    kNodeId = om2.MTypeId(0x0007F7A4)
+
+    blender = None
+    parentMatrix = None
+    target = None
+    input1Matrix = None
+    input2Matrix = None
+    input1Scale = None
+    input2Scale = None
+    jointOrient = None
+    output = None
+    outputTranslate = None
+    outputRotate = None
+    outputScale = None
+
+    @staticmethod
+    def creator():
+        return JointBlendNode()
+
+    @classmethod
+    def initialize(cls):
+        nAttr = om2.MFnNumericAttribute()
+        uAttr = om2.MFnUnitAttribute()
+        mAttr = om2.MFnMatrixAttribute()
+        cAttr = om2.MFnCompoundAttribute()
+
+        cls.blender = nAttr.create("blender", "b", om2.MFnNumericData.kDouble, 0.0)
+        nAttr.setMin(0.0)
+        nAttr.setMax(1.0)
+        nAttr.keyable = True
+        cls.parentMatrix = mAttr.create("parentMatrix", "pm")
+
+        # per joint inputs
+        cls.input1Matrix = mAttr.create("input1Matrix", "i1m")
+        cls.input2Matrix = mAttr.create("input2Matrix", "i2m")
+        cls.input1Scale = nAttr.create("input1Scale", "i1s", om2.MFnNumericData.k3Double, 1.0)
+        cls.input2Scale = nAttr.create("input2Scale", "i2s", om2.MFnNumericData.k3Double, 1.0)
+        joChildren = [uAttr.create("jointOrient"+ax, "jo"+ax.lower(), om2.MFnUnitAttribute.kAngle, 0.0)
+                      for ax in "XYZ"]
+        cls.jointOrient = nAttr.create("jointOrient", "jo", *joChildren)
+        cls.target = cAttr.create("target", "tgt")
+        for child in [cls.input1Matrix, cls.input2Matrix, cls.input1Scale, cls.input2Scale, cls.jointOrient]:
+            cAttr.addChild(child)
+        cAttr.array = True
+
+        # per joint outputs
+        cls.outputTranslate = nAttr.create("outputTranslate", "ot", om2.MFnNumericData.k3Double, 0.0)
+        nAttr.writable = False
+        rotChildren = [uAttr.create("outputRotate"+ax, "or"+ax.lower(), om2.MFnUnitAttribute.kAngle, 0.0)
+                       for ax in "XYZ"]
+        cls.outputRotate = nAttr.create("outputRotate", "or", *rotChildren)
+        nAttr.writable = False
+        cls.outputScale = nAttr.create("outputScale", "os", om2.MFnNumericData.k3Double, 1.0)
+        nAttr.writable = False
+        cls.output = cAttr.create("output", "out")
+        for child in [cls.outputTranslate, cls.outputRotate, cls.outputScale]:
+            cAttr.addChild(child)
+        cAttr.array = True
+        cAttr.usesArrayDataBuilder = True
+        cAttr.writable = False
+        cAttr.storable = False
+
+        for attr in [cls.blender, cls.parentMatrix, cls.target, cls.output]:
+            cls.addAttribute(attr)
+        for attr in [cls.blender, cls.parentMatrix, cls.target]:
+            for outAttr in [cls.output, cls.outputTranslate, cls.outputRotate, cls.outputScale]:
+                cls.attributeAffects(attr, outAttr)
+
+    def compute(self, plug, dataBlock):
+        while plug.isChild:
+            plug = plug.parent()
+        if plug.isElement:
+            plug = plug.array()
+        if plug != self.output:
+            return None
+
+        weight = dataBlock.inputValue(self.blender).asDouble()
+        parentMatrix = dataBlock.inputValue(self.parentMatrix).asMatrix()
+
+        positions, orientations, scales, jointOrients = [], [], [], []
+        targetHandle = dataBlock.inputArrayValue(self.target)
+        for i in range(len(targetHandle)):
+            targetHandle.jumpToPhysicalElement(i)
+            elem = targetHandle.inputValue()
+            xform1 = om2.MTransformationMatrix(elem.child(self.input1Matrix).asMatrix())
+            xform2 = om2.MTransformationMatrix(elem.child(self.input2Matrix).asMatrix())
+            position1 = xform1.translation(om2.MSpace.kWorld)
+            position2 = xform2.translation(om2.MSpace.kWorld)
+            positions.append(om2.MPoint(position2 + (position1-position2)*weight))
+            orientations.append(om2.MQuaternion.slerp(xform2.rotation(asQuaternion=True),
+                                                      xform1.rotation(asQuaternion=True), weight))
+            scale1 = elem.child(self.input1Scale).asDouble3()
+            scale2 = elem.child(self.input2Scale).asDouble3()
+            scales.append([b + (a-b)*weight for a, b in zip(scale1, scale2)])
+            jointOrients.append(om2.MEulerRotation(*elem.child(self.jointOrient).asDouble3()))
+
+        outHandle = dataBlock.outputArrayValue(self.output)
+        builder = outHandle.builder()
+        channels = jointChannels(parentMatrix, positions, orientations, scales, jointOrients)
+        for i, ((translate, rotate, world), scale) in enumerate(zip(channels, scales)):
+            elem = builder.addElement(i)
+            elem.child(self.outputTranslate).set3Double(translate.x, translate.y, translate.z)
+            elem.child(self.outputRotate).set3Double(rotate.x, rotate.y, rotate.z)
+            elem.child(self.outputScale).set3Double(*scale)
+        outHandle.set(builder)
+        outHandle.setAllClean()
+        dataBlock.setClean(plug)
+
+
+class UpAxisNode(om2.MPxNode):
+    """
+    Up vectors of the scaffold locator aim constraints, looked up from the upAxis enum of every
+    locator (y:-y:z:-z) in one node instead of three set driven key curves per locator.
+    """
+    kNodeName = "dynUpAxis"
+    kNodeId = om2.MTypeId(0x0007F7A5)
+
+    upAxis = None
+    upVector = None
+
+    @staticmethod
+    def creator():
+        return UpAxisNode()
+
+    @classmethod
+    def initialize(cls):
+        nAttr = om2.MFnNumericAttribute()
+
+        cls.upAxis = nAttr.create("upAxis", "ua", om2.MFnNumericData.kInt, 0)
+        nAttr.setMin(0)
+        nAttr.setMax(len(UP_AXIS_VECTORS)-1)
+        nAttr.array = True
+        cls.upVector = nAttr.create("upVector", "uv", om2.MFnNumericData.k3Double, 0.0)
+        nAttr.array = True
+        nAttr.usesArrayDataBuilder = True
+        nAttr.writable = False
+        nAttr.storable = False
+
+        for attr in [cls.upAxis, cls.upVector]:
+            cls.addAttribute(attr)
+        cls.attributeAffects(cls.upAxis, cls.upVector)
+
+    def compute(self, plug, dataBlock):
+        if plug.isChild:
+            plug = plug.parent()
+        if plug.isElement:
+            plug = plug.array()
+        if plug != self.upVector:
+            return None
+
+        inHandle = dataBlock.inputArrayValue(self.upAxis)
+        outHandle = dataBlock.outputArrayValue(self.upVector)
+        builder = outHandle.builder()
+        for i in range(len(inHandle)):
+            inHandle.jumpToPhysicalElement(i)
+            index = min(max(inHandle.inputValue().asInt(), 0), len(UP_AXIS_VECTORS)-1)
+            builder.addElement(inHandle.elementLogicalIndex()).set3Double(*UP_AXIS_VECTORS[index])
+        outHandle.set(builder)
+        outHandle.setAllClean()
+        dataBlock.setClean(plug)
+
+
+NODES = [VariableFKNode, CurveCacheNode, CurveLengthNode, SplineJointsNode, JointBlendNode, UpAxisNode]
+
+
+def initializePlugin(mobject):
+    plugin = om2.MFnPlugin(mobject, "wuxiaoyu", "1.0", "Any")
+    for node in NODES:
+        plugin.registerNode(node.kNodeName, node.kNodeId, node.creator, node.initialize)
+
+
+def uninitializePlugin(mobject):
+    plugin = om2.MFnPlugin(mobject)
+    for node in reversed(NODES):
+        plugin.deregisterNode(node.kNodeId)
+    for reader in _cacheReaders.values():
+        reader.close()
+    _cacheReaders.clear()
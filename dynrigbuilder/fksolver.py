@@ -0,0 +1,74 @@
+__author__ = 'wuxiaoyu'
+
+import numpy as np
+
+# minimum falloff of the fk ctrls and of the dynVariableFK node, same as nodemath.MIN_FALLOFF
+MIN_FALLOFF = 0.001
+
+
+def falloffWeights(jointParams, ctrlPositions, fallOffs):
+    """
+    Compute the variable fk falloff weight of every ctrl on every joint.
+    weight = 1 - clamp(|ctrl.position - joint.posOnSurface|, 0, falloff)/falloff
+    Falloffs below MIN_FALLOFF are clamped, like the falloff attrs in Maya.
+    :param jointParams: `array` (jointNum,) joint posOnSurface values
+    :param ctrlPositions: `array` (..., ctrlNum) ctrl position values, leading axes are batch axes (eg. frames)
+    :param fallOffs: `array` or `float` ctrl falloff values, broadcast against ctrlPositions
+    :return: `array` (..., jointNum, ctrlNum) falloff weights
+    """
+    jointParams = np.asarray(jointParams, dtype=np.float64)
+    ctrlPositions, fallOffs = np.broadcast_arrays(np.asarray(ctrlPositions, dtype=np.float64),
+                                                  np.asarray(fallOffs, dtype=np.float64))
+    fallOffs = np.maximum(fallOffs, MIN_FALLOFF)[..., np.newaxis, :]
+    dist = np.abs(ctrlPositions[..., np.newaxis, :] - jointParams[:, np.newaxis])
+    return 1.0 - np.minimum(dist, fallOffs)/fallOffs
+
+
+def solveVariableFK(jointParams, ctrlPositions, rotateFallOffs, scaleFallOffs,
+                    ctrlRotates, ctrlScales):
+    """
+    Compute the rotate/scale value of every fk joint, for a whole batch of frames at once.
+    joint.rotate = sum(rotateWeight*ctrl.rotate)
+    joint.scale = 1 + sum(scaleWeight*(ctrl.scale-1))
+    :param jointParams: `array` (jointNum,) joint posOnSurface values
+    :param ctrlPositions: `array` (frameNum, ctrlNum) or (ctrlNum,) ctrl position values
+    :param rotateFallOffs: `array` (frameNum, ctrlNum) or (ctrlNum,) ctrl rotateFallOff values
+    :param scaleFallOffs: `array` (frameNum, ctrlNum) or (ctrlNum,) ctrl scaleFallOff values
+    :param ctrlRotates: `array` (frameNum, ctrlNum, 3) or (ctrlNum, 3) ctrl rotate values
+    :param ctrlScales: `array` (frameNum, ctrlNum, 3) or (ctrlNum, 3) ctrl scale values
+    :return: `tuple` (rotate, scale) joint values, `array` (frameNum, jointNum, 3) or (jointNum, 3)
+    """
+    ctrlRotates = np.asarray(ctrlRotates, dtype=np.float64)
+    ctrlScales = np.asarray(ctrlScales, dtype=np.float64)
+    rotWeights = falloffWeights(jointParams, ctrlPositions, rotateFallOffs)
+    scaleWeights = falloffWeights(jointParams, ctrlPositions, scaleFallOffs)
+    rotate = np.einsum("...jc,...ck->...jk", rotWeights, ctrlRotates)
+    scale = 1.0 + np.einsum("...jc,...ck->...jk", scaleWeights, ctrlScales-1.0)
+    return rotate, scale
+
+
+def uncoveredJoints(jointParams, ctrlPositions, fallOffs):
+    """
+    Find the joints that no fk ctrl has influence on.
+    :param jointParams: `array` (jointNum,) joint posOnSurface values
+    :param ctrlPositions: `array` (ctrlNum,) ctrl position values
+    :param fallOffs: `array` (ctrlNum,) ctrl falloff values
+    :return: `list` indices of the uncovered joints
+    """
+    weights = falloffWeights(jointParams, ctrlPositions, fallOffs)
+    return np.flatnonzero(weights.sum(axis=-1) <= 0.0).tolist()
+
+
+def defaultLayout(jointNum, ctrlNum, fallOff=0.2):
+    """
+    Joint params and ctrl positions the way buildVariableFKSystem lays them out
+    on a straight chain, joints evenly spread on [0, 1], ctrls at 1/(ctrlNum+1)*(i+1).
+    :param jointNum: `int` number of joints
+    :param ctrlNum: `int` number of fk ctrls
+    :param fallOff: `float` default rotate/scale falloff
+    :return: `tuple` (jointParams, ctrlPositions, fallOffs)
+    """
+    jointParams = np.linspace(0.0, 1.0, jointNum)
+    ctrlPositions = np.arange(1, ctrlNum+1)/(ctrlNum+1.0)
+    fallOffs = np.full(ctrlNum, fallOff)
+    return jointParams, ctrlPositions, fallOffs
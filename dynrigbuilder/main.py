@@ -1,5 +1,8 @@
 __author__ = 'wuxiaoyu'
+from functools import partial
+from timeit import default_timer
 from maya import OpenMayaUI as omui
+import maya.api.OpenMaya as om2
 import pymel.core as pm
 
 from Qt.QtCore import *
@@ -12,15 +15,19 @@ except:
     from shiboken2 import wrapInstance
 
 import dynrigbuilderui
+import registry
 import splinerig
 import scaffold
 
-map(reload,[splinerig, scaffold, dynrigbuilderui])
+map(reload,[registry, splinerig, scaffold, dynrigbuilderui])
 
 
 mayaMainWindowPtr = omui.MQtUtil.mainWindow()
 mayaMainWindow = wrapInstance(long(mayaMainWindowPtr), QWidget)
 
+# time spent building before the UI gets control back, a step is never split
+BUILD_SLICE_SECONDS = 0.05
+
 
 _win = None
 def show():
@@ -29,6 +36,86 @@ def show():
         _win = DynRigBuilderUI()
     _win.show()
 
+def _removeCallbacks(callbackIds, *args):
+    for callbackId in callbackIds:
+        om2.MMessage.removeCallback(callbackId)
+    del callbackIds[:]
+
+
+class HairSystemCache(QObject):
+    """
+    Names of the hair systems in the scene, kept current by node and scene callbacks
+    so the UI doesn't list the scene every time it updates. The callbacks are removed
+    when the cache is destroyed, the owner removes them while it is hidden.
+    """
+    changed = Signal()
+
+    def __init__(self, parent=None):
+        super(HairSystemCache, self).__init__(parent)
+        # MObjectHandle hash code: hair system name
+        self._names = {}
+        self._callbackIds = []
+        # many nodes change at once on file open or delete, notify once they are done
+        self._notifyTimer = QTimer(self)
+        self._notifyTimer.setSingleShot(True)
+        self._notifyTimer.timeout.connect(self.changed.emit)
+        # the callbacks call into this object, they must not outlive it
+        self.destroyed.connect(partial(_removeCallbacks, self._callbackIds))
+        self.installCallbacks()
+
+    def names(self):
+        """
+        :return: `list` hair system names, sorted
+        """
+        return sorted(self._names.values())
+
+    def rescan(self, *args):
+        """
+        List the hair systems of the scene again, after a new scene, an open, an import or a reference change.
+        """
+        self._names = {}
+        nodeIt = om2.MItDependencyNodes(om2.MFn.kHairSystem)
+        while not nodeIt.isDone():
+            self._setName(nodeIt.thisNode())
+            nodeIt.next()
+        self._notifyTimer.start(0)
+
+    def _setName(self, node):
+        self._names[om2.MObjectHandle(node).hashCode()] = om2.MFnDependencyNode(node).name()
+
+    def _nodeAdded(self, node, *args):
+        self._setName(node)
+        self._notifyTimer.start(0)
+
+    def _nodeRemoved(self, node, *args):
+        if self._names.pop(om2.MObjectHandle(node).hashCode(), None) is not None:
+            self._notifyTimer.start(0)
+
+    def _nameChanged(self, node, prevName, *args):
+        if node.hasFn(om2.MFn.kHairSystem):
+            self._setName(node)
+            self._notifyTimer.start(0)
+
+    def installCallbacks(self):
+        """
+        List the hair systems and install the callbacks, if they are not installed yet.
+        """
+        if self._callbackIds:
+            return
+        self.rescan()
+        for message in registry.SCENE_MESSAGES:
+            self._callbackIds.append(om2.MSceneMessage.addCallback(getattr(om2.MSceneMessage, message), self.rescan))
+        self._callbackIds.append(om2.MDGMessage.addNodeAddedCallback(self._nodeAdded, "hairSystem"))
+        self._callbackIds.append(om2.MDGMessage.addNodeRemovedCallback(self._nodeRemoved, "hairSystem"))
+        self._callbackIds.append(om2.MNodeMessage.addNameChangedCallback(om2.MObject.kNullObj, self._nameChanged))
+
+    def removeCallbacks(self):
+        """
+        Remove the callbacks, the names are stale until installCallbacks() is called again.
+        """
+        _removeCallbacks(self._callbackIds)
+
+
 class DynRigBuilderUI(QWidget):
 
     def __init__(self, *args, **kwargs):
@@ -44,12 +131,19 @@ class DynRigBuilderUI(QWidget):
 
         self._scaffold = None
         self._rig = None
+        self._buildSteps = None
+        self._buildPrefix = None
+        self._buildTimer = None
+        self._buildProgress = None
         self._initUI()
 
     def _initUI(self):
         self.ui = dynrigbuilderui.Ui_Form()
         self.ui.setupUi(self)
 
+        self._hairSystems = HairSystemCache(self)
+        self._hairSystems.changed.connect(self._updateHairSystems)
+        self._updateHairSystems()
         self._updateUI()
 
         # set validators
@@ -98,11 +192,13 @@ class DynRigBuilderUI(QWidget):
             # dynamics
             self.ui.groupBox_dynamic.setChecked(self._scaffold.hasDynamic.get())
 
+    def _updateHairSystems(self):
+        # the selected hair system stays selected if it still exists
+        current = self.ui.comboBox_hairSystem.currentText()
         self.ui.comboBox_hairSystem.clear()
         self.ui.comboBox_hairSystem.addItem("New")
-        hairSystems = pm.ls(type="hairSystem")
-        for hairSys in hairSystems:
-            self.ui.comboBox_hairSystem.addItem(hairSys.name())
+        self.ui.comboBox_hairSystem.addItems(self._hairSystems.names())
+        self.ui.comboBox_hairSystem.setCurrentIndex(max(self.ui.comboBox_hairSystem.findText(current), 0))
 
 
     def _buildLayout(self):
@@ -116,22 +212,27 @@ class DynRigBuilderUI(QWidget):
             if scaffold.doesScaffoldExist(prefix):
                 self._scaffold = scaffold.getScaffoldTop(prefix)[0]
             else:
-                self._scaffold = splinerig.SplineRig.buildScaffoldChain(prefix)
+                # the builder runs in a session with the node plugin, one up axis node for all locators
+                self._scaffold = splinerig.SplineRig.buildScaffoldChain(prefix, upAxisSolver=1)
 
             self._updateUI()
 
     def _buildRig(self):
         prefix = self.ui.lineEdit_prefix.text()
         oldRig = splinerig.SplineRig.rigExists(prefix)
+        update = False
         if oldRig:
             msgBox = QMessageBox()
-            msgBox.setText("Rig with the same prefix already exists. Delete and rebuild?")
-            msgBox.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
-            msgBox.setDefaultButton(QMessageBox.Ok)
-            ret = msgBox.exec_()
-            if ret == QMessageBox.Ok:
-                splinerig.SplineRig.deleteRig(oldRig)
-            else:
+            msgBox.setText("Rig with the same prefix already exists. "
+                           "Update the changed parts only, or delete and rebuild?")
+            updateButton = msgBox.addButton("Update", QMessageBox.AcceptRole)
+            rebuildButton = msgBox.addButton("Rebuild", QMessageBox.DestructiveRole)
+            msgBox.addButton(QMessageBox.Cancel)
+            msgBox.setDefaultButton(updateButton)
+            msgBox.exec_()
+            if msgBox.clickedButton() == updateButton:
+                update = True
+            elif msgBox.clickedButton() != rebuildButton:
                 return
         splineRig = splinerig.SplineRig(prefix)
 
@@ -139,9 +240,91 @@ class DynRigBuilderUI(QWidget):
             hairSystem = pm.PyNode(self.ui.comboBox_hairSystem.currentText())
         except:
             hairSystem = None
-        splineRig.buildRig(self._scaffold, hairSystem)
+        if update:
+            splineRig.rebuildRig(self._scaffold, hairSystem)
+            self._updateUI()
+        else:
+            self._startBuild(splineRig, hairSystem, oldRig)
+
+    def _startBuild(self, splineRig, hairSystem, oldRig=None):
+        """
+        Build the rig in time slices driven by a timer, with a progress dialog to cancel it.
+        The whole build, the deletion of the old rig included, goes to one undo chunk.
+        """
+        pm.undoInfo(openChunk=True, chunkName="dynRigBuild_{0}".format(splineRig.prefix))
+        try:
+            if oldRig:
+                splinerig.SplineRig.deleteRig(oldRig)
+            self._buildSteps = splineRig.iterBuildRig(self._scaffold, hairSystem)
+        except Exception:
+            # the chunk must not stay open, it would swallow every later action
+            pm.undoInfo(closeChunk=True)
+            raise
+        self._buildPrefix = splineRig.prefix
+
+        self._buildProgress = QProgressDialog("Building {0}...".format(splineRig.prefix), "Cancel",
+                                              0, len(splineRig.BUILD_STEPS), self)
+        self._buildProgress.setWindowTitle("DynRigBuilder")
+        self._buildProgress.setWindowModality(Qt.ApplicationModal)
+        self._buildProgress.setMinimumDuration(0)
+        self._buildProgress.setAutoReset(False)
+        self._buildProgress.canceled.connect(self._cancelBuild)
+        self._buildProgress.setValue(0)
+
+        # single shot, restarted after every slice so the slices never overlap
+        self._buildTimer = QTimer(self)
+        self._buildTimer.setSingleShot(True)
+        self._buildTimer.timeout.connect(self._continueBuild)
+        self._buildTimer.start(0)
+
+    def _continueBuild(self):
+        startTime = default_timer()
+        try:
+            while default_timer() - startTime < BUILD_SLICE_SECONDS:
+                step = next(self._buildSteps, None)
+                if step is None:
+                    self._finishBuild()
+                    return
+                self._buildProgress.setLabelText("Building {0}: {1} done".format(self._buildPrefix, step))
+                self._buildProgress.setValue(self._buildProgress.value()+1)
+                if not self._buildSteps:
+                    # canceled while the progress dialog processed the events
+                    return
+        except Exception:
+            self._finishBuild(undo=True)
+            raise
+        self._buildTimer.start(0)
+
+    def _cancelBuild(self):
+        if self._buildSteps:
+            self._finishBuild(undo=True)
+
+    def _finishBuild(self, undo=False):
+        """
+        Stop the timed build, undo the partial build when it was canceled or failed.
+        """
+        self._buildTimer.stop()
+        self._buildSteps.close()
+        self._buildProgress.canceled.disconnect(self._cancelBuild)
+        self._buildProgress.close()
+        pm.undoInfo(closeChunk=True)
+        if undo:
+            pm.undo()
+        self._buildSteps = None
+        self._buildPrefix = None
+        self._buildTimer = None
+        self._buildProgress = None
         self._updateUI()
 
+    def showEvent(self, event):
+        # the hair systems may have changed while the window was closed
+        self._hairSystems.installCallbacks()
+        super(DynRigBuilderUI, self).showEvent(event)
+
+    def closeEvent(self, event):
+        # the window is kept for the next show(), stop following the scene meanwhile
+        self._hairSystems.removeCallbacks()
+        super(DynRigBuilderUI, self).closeEvent(event)
 
     def _setJointNum(self):
         if self._scaffold:
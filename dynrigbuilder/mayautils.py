@@ -1,7 +1,21 @@
 __author__ = 'wuxiaoyu'
 
-
+import contextlib
+import os
+import sys
 import pymel.core as pm
+import maya.api.OpenMaya as om2
+import buildplan
+
+map(reload, [buildplan])
+
+NODE_PLUGIN_NAME = "dynrignodes"
+NODE_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), NODE_PLUGIN_NAME+".py")
+
+# active build plan, utility nodes are recorded into it instead of created right away
+_buildPlan = None
+# active build profiler, told when the build moves on to another subsystem
+_buildProfiler = None
 
 
 def addAttributes(target, attrList):
@@ -18,11 +32,15 @@ def addAttributes(target, attrList):
                     }
                     ...
                     ]
+                    attributes that already exist on target are skipped, so rebuilt
+                    subsystems keep their existing attribute values.
     :return:
     """
     if not isinstance(attrList, list):
         attrList = [attrList]
     for attrDict in attrList:
+        if pm.attributeQuery(attrDict["ln"], node=target, exists=1):
+            continue
         paramDict = attrDict.copy()
         cb = 0
         if "cb" in attrDict.keys():
@@ -75,15 +93,72 @@ def createParentTransform(suffix="grp", targetNode=None):
         try:
             targetNode = pm.ls(sl=True)[0]
         except:
-            print "No target node is specified."
+            print("No target node is specified.")
             return None
 
     grpNode = pm.createNode("transform", n="{0}_{1}".format(targetNode.name(),suffix))
-    pm.delete(pm.parentConstraint(targetNode, grpNode, mo=False))
+    setWorldMatrix(grpNode, getWorldMatrix(targetNode), "tr")
     grpNode.setParent(targetNode.getParent())
     targetNode.setParent(grpNode)
     return grpNode
 
+def getWorldMatrix(node):
+    """
+    Get the world matrix of the node.
+    :param node: `PyNode` dag node
+    :return: `MMatrix` world matrix
+    """
+    return om2.MMatrix(pm.xform(node, q=1, ws=1, m=1))
+
+def setWorldMatrix(node, matrix, channels="trs"):
+    """
+    Move the node to the world matrix, like a constraint would without leaving one behind.
+    :param node: `PyNode` transform node to move
+    :param matrix: `MMatrix` world matrix
+    :param channels: `string` t/r/s components of the matrix to apply, the others are kept
+    :return:
+    """
+    if channels != "trs":
+        current = om2.MTransformationMatrix(getWorldMatrix(node))
+        target = om2.MTransformationMatrix(matrix)
+        if "t" not in channels:
+            target.setTranslation(current.translation(om2.MSpace.kWorld), om2.MSpace.kWorld)
+        if "r" not in channels:
+            target.setRotation(current.rotation(asQuaternion=True))
+        if "s" not in channels:
+            target.setScale(current.scale(om2.MSpace.kWorld), om2.MSpace.kWorld)
+        matrix = target.asMatrix()
+    pm.xform(node, ws=1, m=list(matrix))
+
+def aimMatrix(position, targetPosition, aimVector=[1,0,0], upVector=[0,1,0], worldUpVector=[0,1,0]):
+    """
+    World matrix at position, aiming aimVector to targetPosition with upVector towards worldUpVector.
+    Same result as an aimConstraint with the scene up type.
+    :param position: `list` [x,y,z] world position
+    :param targetPosition: `list` [x,y,z] world position to aim to
+    :param aimVector: `list` local aim axis
+    :param upVector: `list` local up axis
+    :param worldUpVector: `list` world up direction
+    :return: `MMatrix` world matrix
+    """
+    def frame(aim, up):
+        aim = om2.MVector(aim).normal()
+        side = aim ^ om2.MVector(up)
+        if side.length() < 1e-6:
+            # aiming along the up vector, pick any perpendicular side axis
+            side = aim ^ om2.MVector(0, 0, 1) if abs(aim.z) < 0.9 else aim ^ om2.MVector(1, 0, 0)
+        side.normalize()
+        up = side ^ aim
+        return om2.MMatrix([aim.x, aim.y, aim.z, 0, up.x, up.y, up.z, 0,
+                            side.x, side.y, side.z, 0, 0, 0, 0, 1])
+
+    worldAim = om2.MVector(targetPosition) - om2.MVector(position)
+    localFrame = frame(aimVector, upVector)
+    worldFrame = frame(worldAim, worldUpVector)
+    matrix = om2.MTransformationMatrix(localFrame.transpose() * worldFrame)
+    matrix.setTranslation(om2.MVector(position), om2.MSpace.kWorld)
+    return matrix.asMatrix()
+
 def matchObject(toTarget, fromTarget, channels="trs"):
     """
     Match object to the target.
@@ -91,27 +166,21 @@ def matchObject(toTarget, fromTarget, channels="trs"):
     :param fromTarget: `PyNode` object to transform
     :return:
     """
-    if "r" in channels:
-        pm.delete(pm.orientConstraint(toTarget, fromTarget, mo=0))
-    if "t" in channels:
-        pm.delete(pm.pointConstraint(toTarget, fromTarget, mo=0))
-    if "s" in channels:
-        pm.delete(pm.scaleConstraint(toTarget, fromTarget, mo=0))
+    setWorldMatrix(fromTarget, getWorldMatrix(toTarget), channels)
 
-def aimObject(toTarget, fromTarget):
+def aimObject(toTarget, fromTarget, aimVector=[1,0,0], upVector=[0,1,0]):
     """
     Aim object to the target.
     :param toTarget: `PyNode` or `list` object or world position to aim to
     :param fromTarget: `PyNode` object to transform
+    :param aimVector: `list` local axis of fromTarget that points to the target
+    :param upVector: `list` local axis of fromTarget that points up the world y axis
     :return:
     """
-    if isinstance(toTarget, list):
-        targetObj = pm.createNode("transform")
-        pm.xform(targetObj, t=toTarget, ws=1)
-        pm.delete(pm.aimConstraint(targetObj, fromTarget, mo=0, wut=0))
-        pm.delete(targetObj)
-    else:
-        pm.delete(pm.aimConstraint(toTarget, fromTarget, mo=0, wut=0))
+    if not isinstance(toTarget, list):
+        toTarget = pm.xform(toTarget, q=1, ws=1, rp=1)
+    position = pm.xform(fromTarget, q=1, ws=1, rp=1)
+    setWorldMatrix(fromTarget, aimMatrix(position, toTarget, aimVector, upVector), "r")
 
 def colorObject(target, color):
     """
@@ -131,7 +200,7 @@ def colorObject(target, color):
     if color in colorDict:
         targetShape.overrideColor.set(colorDict[color])
     else:
-        print "color:", color
+        print("color: {0}".format(color))
         targetShape.overrideColor.set(int(color))
 
 
@@ -223,7 +292,7 @@ def createCtrl(ctrlName, type="locator", size=1, color=None, matchTarget=None, r
     ctrl.r.set(rotation)
     pm.makeIdentity(ctrl, a=1)
     if matchTarget and ctrl:
-        pm.delete(pm.parentConstraint(matchTarget, ctrl, mo=0))
+        setWorldMatrix(ctrl, getWorldMatrix(matchTarget), "tr")
 
     if color:
         colorObject(ctrl, color)
@@ -251,7 +320,118 @@ def addBreakLine(ctrl, contentString):
     """
     attrName = "_"
     while pm.objExists("{0}.{1}".format(ctrl.name(), attrName)):
+        # the breakline is already there when a subsystem is rebuilt
+        if pm.attributeQuery(attrName, node=ctrl, listEnum=1)[0] == contentString:
+            return
         attrName = attrName + "_"
     pm.addAttr(ctrl, ln=attrName, at="enum", en=contentString)
     pm.setAttr("{0}.{1}".format(ctrl.name(), attrName), e=1, channelBox=1)
 
+def loadNodePlugin():
+    """
+    Load the plugin holding the custom DynRigBuilder nodes, if not loaded yet.
+    :return:
+    """
+    if not pm.pluginInfo(NODE_PLUGIN_NAME, q=1, loaded=1):
+        pm.loadPlugin(NODE_PLUGIN_PATH, qt=1)
+
+
+def closeCacheReader(filePath):
+    """
+    Release a curve cache file held open by the dynCurveCache nodes, see dynrignodes.closeCacheReader().
+    :param filePath: `string` cache file path
+    :return: `bool` True if a reader was open
+    """
+    # the plugin module holds the readers, nothing is open while the plugin is not loaded
+    nodeModule = sys.modules.get(NODE_PLUGIN_NAME)
+    if nodeModule is None:
+        return False
+    return nodeModule.closeCacheReader(filePath)
+
+
+@contextlib.contextmanager
+def batchBuildContext():
+    """
+    Disable undo and suspend viewport refresh for the duration of a batch build.
+    The previous undo state is restored on exit.
+    """
+    undoState = pm.undoInfo(q=1, state=1)
+    pm.undoInfo(stateWithoutFlush=False)
+    pm.refresh(suspend=True)
+    try:
+        yield
+    finally:
+        pm.refresh(suspend=False)
+        pm.undoInfo(stateWithoutFlush=undoState)
+
+
+def setBuildPlan(plan):
+    """
+    Set the active build plan. While a plan is active, createNode/connectAttr
+    record into the plan and nothing is created until flushBuildPlan is called.
+    :param plan: `BuildPlan` build plan, None to build directly with pymel
+    :return: `BuildPlan` previously active plan
+    """
+    global _buildPlan
+    previous = _buildPlan
+    _buildPlan = plan
+    return previous
+
+def getBuildPlan():
+    return _buildPlan
+
+def flushBuildPlan():
+    """
+    Commit the operations recorded in the active build plan.
+    :return: `int` number of operations committed
+    """
+    if _buildPlan:
+        return _buildPlan.flush()
+    return 0
+
+def setBuildSubsystem(name):
+    """
+    Tag the operations recorded from now on in the active build plan with a subsystem name,
+    and start a new phase in the active build profiler.
+    :param name: `string` subsystem name, eg. "ik"
+    :return:
+    """
+    if _buildPlan:
+        _buildPlan.subsystem = name
+    if _buildProfiler:
+        _buildProfiler.startPhase(name)
+
+def setBuildProfiler(profiler):
+    """
+    Set the active build profiler.
+    :param profiler: `BuildProfiler` profiler, None to stop profiling
+    :return: `BuildProfiler` previously active profiler
+    """
+    global _buildProfiler
+    previous = _buildProfiler
+    _buildProfiler = profiler
+    return previous
+
+def createNode(nodeType, name):
+    """
+    Create a dependency node, or record it in the active build plan.
+    :param nodeType: `string` node type
+    :param name: `string` node name
+    :return: `PyNode` or `PlanNode` created node
+    """
+    if _buildPlan:
+        return _buildPlan.createNode(nodeType, name)
+    return pm.createNode(nodeType, n=name)
+
+def connectAttr(source, destination, force=False):
+    """
+    Connect two attributes, or record the connection in the active build plan.
+    :param source: `PyNode` or `PlanPlug` source attribute
+    :param destination: `PyNode` or `PlanPlug` destination attribute
+    :param force: `bool` break the existing input connection of destination
+    :return:
+    """
+    if _buildPlan:
+        _buildPlan.connectAttr(source, destination, force)
+    else:
+        pm.connectAttr(str(source), str(destination), f=force)
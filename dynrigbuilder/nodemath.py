@@ -0,0 +1,142 @@
+__author__ = 'wuxiaoyu'
+
+# Maya independent math of the compute nodes of dynrignodes, importable without Maya
+# so the NumPy models and the tests evaluate exactly what the nodes evaluate.
+
+import bisect
+try:
+    import fksolver
+except ImportError:
+    # numpy is not available in this maya python
+    fksolver = None
+
+# minimum falloff of the fk ctrls and of the dynVariableFK node, a falloff of 0 divides by 0
+MIN_FALLOFF = 0.001
+
+
+def computeVariableFK(jointParams, controls):
+    """
+    Evaluate the variable fk falloff for every joint.
+    joint.rotate = sum((1-clamp(|ctrl.position-joint.posOnSurface|, 0, rotateFallOff)/rotateFallOff)*ctrl.rotate)
+    joint.scale = 1 + sum((1-clamp(|ctrl.position-joint.posOnSurface|, 0, scaleFallOff)/scaleFallOff)*(ctrl.scale-1))
+    :param jointParams: `list` joint position on the fk surface
+    :param controls: `list` (position, rotateFallOff, scaleFallOff, [rx,ry,rz], [sx,sy,sz]) per fk ctrl
+    :return: `list` ([rx,ry,rz], [sx,sy,sz]) per joint
+    """
+    if fksolver and controls:
+        positions, rotFallOffs, scaleFallOffs, ctrlRots, ctrlScales = zip(*controls)
+        rot, scale = fksolver.solveVariableFK(jointParams, positions, rotFallOffs,
+                                              scaleFallOffs, ctrlRots, ctrlScales)
+        return list(zip(rot.tolist(), scale.tolist()))
+
+    result = []
+    for jntParam in jointParams:
+        rot = [0.0, 0.0, 0.0]
+        scale = [1.0, 1.0, 1.0]
+        for position, rotFallOff, scaleFallOff, ctrlRot, ctrlScale in controls:
+            dist = abs(position - jntParam)
+            rotFallOff = max(rotFallOff, MIN_FALLOFF)
+            scaleFallOff = max(scaleFallOff, MIN_FALLOFF)
+            rotWeight = 1.0 - min(dist, rotFallOff)/rotFallOff
+            scaleWeight = 1.0 - min(dist, scaleFallOff)/scaleFallOff
+            for k in range(3):
+                rot[k] += rotWeight*ctrlRot[k]
+                scale[k] += scaleWeight*(ctrlScale[k]-1.0)
+        result.append((rot, scale))
+    return result
+
+
+# 5 point Gauss-Legendre abscissas and weights on [-1, 1]
+GAUSS_LEGENDRE = [
+    (0.0, 0.5688888888888889),
+    (-0.5384693101056831, 0.4786286704993665),
+    (0.5384693101056831, 0.4786286704993665),
+    (-0.9061798459386640, 0.2369268850561891),
+    (0.9061798459386640, 0.2369268850561891),
+]
+
+
+def gaussLegendreLength(speed, start, end):
+    """
+    Arc length between two parameters with a 5 point Gauss-Legendre quadrature.
+    :param speed: `function` curve parameter -> length of the first derivative
+    :param start: `float` start parameter
+    :param end: `float` end parameter
+    :return: `float`
+    """
+    half = (end-start)*0.5
+    mid = (start+end)*0.5
+    return half*sum(w*speed(mid+half*x) for x, w in GAUSS_LEGENDRE)
+
+
+def adaptiveLength(speed, start, end, tolerance=1e-6, depth=8):
+    """
+    Arc length between two parameters, the range is halved until both halves agree with the whole.
+    :param speed: `function` curve parameter -> length of the first derivative
+    :param start: `float` start parameter
+    :param end: `float` end parameter
+    :param tolerance: `float` absolute length tolerance
+    :param depth: `int` maximum number of subdivisions
+    :return: `float`
+    """
+    mid = (start+end)*0.5
+    whole = gaussLegendreLength(speed, start, end)
+    left = gaussLegendreLength(speed, start, mid)
+    right = gaussLegendreLength(speed, mid, end)
+    if depth <= 0 or abs(left+right-whole) <= tolerance:
+        return left+right
+    return (adaptiveLength(speed, start, mid, tolerance*0.5, depth-1) +
+            adaptiveLength(speed, mid, end, tolerance*0.5, depth-1))
+
+
+def paramAtLength(speed, breakpoints, lengths, length, tolerance=1e-6, iterations=16):
+    """
+    Parameter at an arc length from the start of the curve, Newton steps kept inside the span by bisection.
+    :param speed: `function` curve parameter -> length of the first derivative
+    :param breakpoints: `list` span boundary parameters
+    :param lengths: `list` arc length at every breakpoint
+    :param length: `float` arc length
+    :param tolerance: `float` absolute length tolerance
+    :param iterations: `int` maximum number of steps
+    :return: `float`
+    """
+    span = min(max(bisect.bisect_right(lengths, length)-1, 0), len(breakpoints)-2)
+    start, end = breakpoints[span], breakpoints[span+1]
+    remaining = length - lengths[span]
+    spanLength = lengths[span+1] - lengths[span]
+    param = start + (end-start)*remaining/spanLength if spanLength > 0 else start
+    low, high = start, end
+    for _ in range(iterations):
+        error = gaussLegendreLength(speed, start, param) - remaining
+        if abs(error) <= tolerance:
+            break
+        if error > 0:
+            high = param
+        else:
+            low = param
+        derivative = speed(param)
+        param = param - error/derivative if derivative > 0 else low
+        if not low < param < high:
+            param = (low+high)*0.5
+    return param
+
+
+def computeLengthParams(speed, breakpoints, paramNum, restLength, preserveLength=True, tolerance=1e-6):
+    """
+    Parameters splitting the curve in equal arc lengths, the curve is clipped at the rest length
+    when it is stretched and preserveLength is on, like the rebuildCurve/curveInfo/detachCurve network.
+    :param speed: `function` curve parameter -> length of the first derivative
+    :param breakpoints: `list` span boundary parameters, sorted
+    :param paramNum: `int` number of parameters
+    :param restLength: `float` rest length, global scale included
+    :param preserveLength: `bool` clip the curve at the rest length
+    :param tolerance: `float` absolute length tolerance
+    :return: `tuple` (arc length, `list` parameters)
+    """
+    lengths = [0.0]
+    for start, end in zip(breakpoints[:-1], breakpoints[1:]):
+        lengths.append(lengths[-1]+adaptiveLength(speed, start, end, tolerance))
+    arcLength = lengths[-1]
+    usedLength = min(arcLength, restLength) if preserveLength and restLength > 0 else arcLength
+    step = usedLength/(paramNum-1.0) if paramNum > 1 else 0.0
+    return arcLength, [paramAtLength(speed, breakpoints, lengths, step*i, tolerance) for i in range(paramNum)]
@@ -0,0 +1,475 @@
+__author__ = 'wuxiaoyu'
+
+# NumPy nurbs curves mirroring the curves of the IK spline system, to predict joint
+# placement and lengths without Maya.
+#
+# Curves are (cvs, knots, degree) with the full clamped knot vector (cvNum+degree+1 knots,
+# Maya leaves out the first and the last one). cvs may carry leading batch axes, eg.
+# (frameNum, cvNum, 3), and are evaluated for all frames at once: the basis functions only
+# depend on the parameters, so they are computed once and applied to every frame.
+
+import numpy as np
+
+import nodemath
+
+
+def clampedKnots(cvNum, degree, minValue=0.0, maxValue=1.0):
+    """
+    Uniform knot vector with multiple end knots, as built by rebuildCurve(rt=0, end=1).
+    :param cvNum: `int` number of cvs
+    :param degree: `int` curve degree
+    :param minValue: `float` start of the parameter range
+    :param maxValue: `float` end of the parameter range
+    :return: `array` (cvNum+degree+1,) knots
+    """
+    spanNum = cvNum - degree
+    if spanNum < 1:
+        raise ValueError("A degree {0} curve needs at least {1} cvs.".format(degree, degree+1))
+    inner = np.linspace(minValue, maxValue, spanNum+1)
+    return np.concatenate([np.full(degree, minValue), inner, np.full(degree, maxValue)])
+
+
+def findSpans(knots, degree, params):
+    """
+    Index of the knot span of every parameter, parameters at the end of the range fall in the last span.
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param params: `array` (paramNum,) parameters
+    :return: `array` (paramNum,) span indices, knots[span] <= param < knots[span+1]
+    """
+    knots = np.asarray(knots, dtype=np.float64)
+    cvNum = len(knots) - degree - 1
+    spans = np.searchsorted(knots, params, side="right") - 1
+    return np.clip(spans, degree, cvNum-1)
+
+
+def basisMatrix(knots, degree, params):
+    """
+    Value of every basis function at every parameter, with the Cox-de Boor recursion.
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param params: `array` (paramNum,) parameters
+    :return: `array` (paramNum, cvNum) basis values, positions = basis.dot(cvs)
+    """
+    knots = np.asarray(knots, dtype=np.float64)
+    params = np.clip(np.asarray(params, dtype=np.float64), knots[degree], knots[-degree-1])
+    cvNum = len(knots) - degree - 1
+    spans = findSpans(knots, degree, params)
+
+    # the degree+1 non zero basis functions of every parameter, N[:, r] belongs to cv span-degree+r
+    values = np.zeros((len(params), degree+1))
+    values[:, 0] = 1.0
+    left = np.zeros((len(params), degree+1))
+    right = np.zeros((len(params), degree+1))
+    for j in range(1, degree+1):
+        left[:, j] = params - knots[spans+1-j]
+        right[:, j] = knots[spans+j] - params
+        saved = np.zeros(len(params))
+        for r in range(j):
+            denom = right[:, r+1] + left[:, j-r]
+            temp = np.divide(values[:, r], denom, out=np.zeros(len(params)), where=denom != 0)
+            values[:, r] = saved + right[:, r+1]*temp
+            saved = left[:, j-r]*temp
+        values[:, j] = saved
+
+    basis = np.zeros((len(params), cvNum))
+    cols = spans[:, np.newaxis] - degree + np.arange(degree+1)
+    basis[np.arange(len(params))[:, np.newaxis], cols] = values
+    return basis
+
+
+def evaluate(cvs, knots, degree, params):
+    """
+    Positions on the curve.
+    :param cvs: `array` (..., cvNum, 3) cv positions, leading axes are batch axes (eg. frames)
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param params: `array` (paramNum,) parameters
+    :return: `array` (..., paramNum, 3) positions
+    """
+    return np.einsum("pc,...ck->...pk", basisMatrix(knots, degree, params), np.asarray(cvs, dtype=np.float64))
+
+
+def percentageToParam(knots, degree, percentages):
+    """
+    Parameters of pointOnCurveInfo.turnOnPercentage values, the percentage is taken of the
+    parameter range, not of the arc length.
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param percentages: `array` (paramNum,) values between 0 and 1
+    :return: `array` (paramNum,) parameters
+    """
+    minValue, maxValue = knots[degree], knots[-degree-1]
+    return minValue + (maxValue-minValue)*np.asarray(percentages, dtype=np.float64)
+
+
+def arcLengthTable(cvs, knots, degree, sampleNum=256):
+    """
+    Arc length from the start of the curve at evenly spread parameters, measured on a polyline.
+    :param cvs: `array` (..., cvNum, 3) cv positions
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param sampleNum: `int` number of samples, more samples are more accurate
+    :return: `tuple` (params (sampleNum,), lengths (..., sampleNum))
+    """
+    params = np.linspace(knots[degree], knots[-degree-1], sampleNum)
+    points = evaluate(cvs, knots, degree, params)
+    segments = np.linalg.norm(np.diff(points, axis=-2), axis=-1)
+    lengths = np.concatenate([np.zeros(segments.shape[:-1]+(1,)), np.cumsum(segments, axis=-1)], axis=-1)
+    return params, lengths
+
+
+def arcLength(cvs, knots, degree, sampleNum=256):
+    """
+    Length of the curve, like curveInfo.arcLength.
+    :return: `array` (...) lengths
+    """
+    return arcLengthTable(cvs, knots, degree, sampleNum)[1][..., -1]
+
+
+def paramsAtLengthFractions(cvs, knots, degree, fractions, sampleNum=256):
+    """
+    Parameters that split the curve by arc length, the arc length parameterization of the curve.
+    :param cvs: `array` (..., cvNum, 3) cv positions
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param fractions: `array` (paramNum,) arc length fractions between 0 and 1
+    :param sampleNum: `int` number of arc length samples
+    :return: `array` (..., paramNum) parameters
+    """
+    params, lengths = arcLengthTable(cvs, knots, degree, sampleNum)
+    targets = np.asarray(fractions, dtype=np.float64)*lengths[..., -1:]
+    # index of the sample segment holding every target length, for all batches at once
+    index = np.clip((lengths[..., np.newaxis, :] <= targets[..., np.newaxis]).sum(axis=-1) - 1, 0, sampleNum-2)
+    start = np.take_along_axis(lengths, index, axis=-1)
+    end = np.take_along_axis(lengths, index+1, axis=-1)
+    weight = np.divide(targets-start, end-start, out=np.zeros_like(targets), where=end > start)
+    return params[index] + (params[index+1]-params[index])*weight
+
+
+def pointsAtLengths(cvs, knots, degree, lengths, sampleNum=256):
+    """
+    Points at arc lengths from the start of the curve, like the joints of a spline ik chain
+    that keeps its joint lengths, lengths beyond the curve end stay at the end.
+    :param cvs: `array` (cvNum, 3) cv positions
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param lengths: `array` (pointNum,) arc lengths
+    :param sampleNum: `int` number of arc length samples
+    :return: `array` (pointNum, 3) positions
+    """
+    curveLength = arcLength(cvs, knots, degree, sampleNum)
+    fractions = np.clip(np.asarray(lengths, dtype=np.float64)/max(curveLength, 1e-12), 0.0, 1.0)
+    return evaluate(cvs, knots, degree, paramsAtLengthFractions(cvs, knots, degree, fractions, sampleNum))
+
+
+def aimMatrices(positions, upVector=(0.0, 1.0, 0.0)):
+    """
+    World matrices of a joint chain, x aims at the next joint and y is closest to the up vector,
+    the last joint takes the orientation of the one before.
+    :param positions: `array` (..., jointNum, 3) joint positions
+    :param upVector: `list` [x, y, z] world up vector
+    :return: `array` (..., jointNum, 4, 4) row major matrices, the translation in the last row like MMatrix
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    xAxis = np.diff(positions, axis=-2)
+    xAxis = np.concatenate([xAxis, xAxis[..., -1:, :]], axis=-2)
+    xAxis /= np.maximum(np.linalg.norm(xAxis, axis=-1, keepdims=True), 1e-12)
+    zAxis = np.cross(xAxis, np.asarray(upVector, dtype=np.float64))
+    zAxis /= np.maximum(np.linalg.norm(zAxis, axis=-1, keepdims=True), 1e-12)
+    yAxis = np.cross(zAxis, xAxis)
+    matrices = np.zeros(positions.shape[:-1]+(4, 4))
+    matrices[..., 0, :3] = xAxis
+    matrices[..., 1, :3] = yAxis
+    matrices[..., 2, :3] = zAxis
+    matrices[..., 3, :3] = positions
+    matrices[..., 3, 3] = 1.0
+    return matrices
+
+
+def interpolateCurve(points, degree=3):
+    """
+    Clamped curve using the points as cvs, like pm.curve(p=points, d=degree).
+    :param points: `array` (..., pointNum, 3) cv positions
+    :param degree: `int` curve degree
+    :return: `tuple` (cvs, knots, degree)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    pointNum = points.shape[-2]
+    return points, clampedKnots(pointNum, degree, 0.0, pointNum-degree), degree
+
+
+def rebuildCurve(cvs, knots, degree, spanNum, newDegree=3, sampleNum=None):
+    """
+    Least squares fit of the curve with uniform knots on [0, 1], keeping the end points,
+    like pm.rebuildCurve(rpo=1, rt=0, end=1, kr=0, kep=1, s=spanNum, d=newDegree).
+    The samples are spread by arc length, so the rebuilt parameterization is close to uniform in length.
+    :param cvs: `array` (..., cvNum, 3) cv positions
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param spanNum: `int` number of spans of the rebuilt curve
+    :param newDegree: `int` degree of the rebuilt curve
+    :param sampleNum: `int` number of fitted samples, 8 per span if None
+    :return: `tuple` (cvs, knots, degree) rebuilt curve
+    """
+    sampleNum = sampleNum or 8*(spanNum+newDegree)
+    newKnots = clampedKnots(spanNum+newDegree, newDegree)
+    fractions = np.linspace(0.0, 1.0, sampleNum)
+    if np.ndim(cvs) > 2:
+        samples = np.stack([evaluate(x, knots, degree, paramsAtLengthFractions(x, knots, degree, fractions))
+                            for x in np.reshape(cvs, (-1,)+np.shape(cvs)[-2:])])
+        samples = samples.reshape(np.shape(cvs)[:-2]+samples.shape[-2:])
+    else:
+        samples = evaluate(cvs, knots, degree, paramsAtLengthFractions(cvs, knots, degree, fractions))
+    basis = basisMatrix(newKnots, newDegree, fractions)
+
+    # end cvs are the end points, the inner cvs are solved for
+    startPoint, endPoint = samples[..., :1, :], samples[..., -1:, :]
+    rhs = samples - np.einsum("p,...k->...pk", basis[:, 0], startPoint[..., 0, :]) \
+        - np.einsum("p,...k->...pk", basis[:, -1], endPoint[..., 0, :])
+    inner = np.linalg.pinv(basis[:, 1:-1])
+    innerCvs = np.einsum("cp,...pk->...ck", inner, rhs)
+    newCvs = np.concatenate([startPoint, innerCvs, endPoint], axis=-2)
+    return newCvs, newKnots, newDegree
+
+
+def curveFromPoints(points, ibtCVNum=0, degree=3):
+    """
+    Curve through joint positions, like rigutils.createCurveFromJoint.
+    :param points: `array` (pointNum, 3) joint positions
+    :param ibtCVNum: `int` number of cv points added inbetween the joint positions
+    :param degree: `int` curve degree
+    :return: `tuple` (cvs, knots, degree)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if ibtCVNum > 0:
+        weights = np.arange(ibtCVNum+1)/(ibtCVNum+1.0)
+        segments = points[:-1, np.newaxis, :] + (points[1:]-points[:-1])[:, np.newaxis, :]*weights[:, np.newaxis]
+        cvPos = np.concatenate([segments.reshape(-1, 3), points[-1:]])
+    else:
+        cvPos = points
+    cvs, knots, degree = interpolateCurve(cvPos, degree)
+    return rebuildCurve(cvs, knots, degree, len(cvPos)-1, degree)
+
+
+def skinWeights(cvs, jointPositions):
+    """
+    Rigid skin weights of the curve cvs on a joint chain, each cv is shared by the two joints
+    around its closest point on the chain, like skinCluster(mi=2, dr=1) on a straight chain.
+    :param cvs: `array` (cvNum, 3) rest cv positions
+    :param jointPositions: `array` (jointNum, 3) rest joint positions
+    :return: `array` (cvNum, jointNum) weights
+    """
+    cvs = np.asarray(cvs, dtype=np.float64)
+    joints = np.asarray(jointPositions, dtype=np.float64)
+    starts, segments = joints[:-1], joints[1:] - joints[:-1]
+    toCv = cvs[:, np.newaxis, :] - starts[np.newaxis]
+    segLengths = np.maximum(np.einsum("sk,sk->s", segments, segments), 1e-12)
+    ratios = np.clip(np.einsum("csk,sk->cs", toCv, segments)/segLengths, 0.0, 1.0)
+    closest = starts[np.newaxis] + ratios[..., np.newaxis]*segments[np.newaxis]
+    segIds = np.argmin(np.linalg.norm(cvs[:, np.newaxis, :]-closest, axis=-1), axis=1)
+    ratio = ratios[np.arange(len(cvs)), segIds]
+
+    weights = np.zeros((len(cvs), len(joints)))
+    weights[np.arange(len(cvs)), segIds] = 1.0 - ratio
+    weights[np.arange(len(cvs)), segIds+1] += ratio
+    return weights
+
+
+def deformCvs(restCvs, weights, restJointPositions, jointPositions):
+    """
+    Move skinned cvs with the translation of their joints.
+    :param restCvs: `array` (cvNum, 3) rest cv positions
+    :param weights: `array` (cvNum, jointNum) skin weights
+    :param restJointPositions: `array` (jointNum, 3) rest joint positions
+    :param jointPositions: `array` (..., jointNum, 3) posed joint positions
+    :return: `array` (..., cvNum, 3) posed cv positions
+    """
+    offsets = np.asarray(jointPositions, dtype=np.float64) - np.asarray(restJointPositions, dtype=np.float64)
+    return np.asarray(restCvs, dtype=np.float64) + np.einsum("cj,...jk->...ck", weights, offsets)
+
+
+def derivativeCurve(cvs, knots, degree):
+    """
+    First derivative of the curve, a curve one degree lower.
+    :param cvs: `array` (..., cvNum, 3) cv positions
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree, at least 1
+    :return: `tuple` (cvs (..., cvNum-1, 3), knots, degree-1)
+    """
+    cvs = np.asarray(cvs, dtype=np.float64)
+    knots = np.asarray(knots, dtype=np.float64)
+    spans = knots[degree+1:-1] - knots[1:-degree-1]
+    scale = np.divide(degree, spans, out=np.zeros_like(spans), where=spans > 0)
+    return np.diff(cvs, axis=-2)*scale[:, np.newaxis], knots[1:-1], degree-1
+
+
+def lengthParams(cvs, knots, degree, paramNum, restLength, preserveLength=True):
+    """
+    Parameters splitting the curve in equal arc lengths, clipped at the rest length when the curve
+    is stretched, with the quadrature of the dynCurveLength and dynSplineJoints nodes.
+    :param cvs: `array` (cvNum, 3) cv positions
+    :param knots: `array` full knot vector
+    :param degree: `int` curve degree
+    :param paramNum: `int` number of parameters
+    :param restLength: `float` rest length, global scale included
+    :param preserveLength: `bool` clip the curve at the rest length
+    :return: `tuple` (arc length, `array` (paramNum,) parameters), see nodemath.computeLengthParams()
+    """
+    dCvs, dKnots, dDegree = derivativeCurve(cvs, knots, degree)
+    speed = lambda u: float(np.linalg.norm(evaluate(dCvs, dKnots, dDegree, [u])[0]))
+    breakpoints = np.unique(knots[degree:-degree]).tolist()
+    curveLength, params = nodemath.computeLengthParams(speed, breakpoints, paramNum, restLength, preserveLength)
+    return curveLength, np.array(params)
+
+
+def pointsAlongPolyline(positions, pointNum):
+    """
+    Points at equal arc lengths along the polyline through the positions, like
+    rigutils.getPointsAlongCurve on a linear curve.
+    :param positions: `array` (positionNum, 3) ordered positions
+    :param pointNum: `int` number of points, at least 2
+    :return: `array` (pointNum, 3)
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    lengths = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(positions, axis=0), axis=-1))])
+    targets = np.linspace(0.0, lengths[-1], pointNum)
+    return np.stack([np.interp(targets, lengths, positions[:, k]) for k in range(positions.shape[1])], axis=-1)
+
+
+def subCtrlPercentages(masterCtrlNum, ibtSubCtrlNum):
+    """
+    pointOnCurveInfo percentages of the sub ctrls on the master curve, as laid out by buildIKSystem.
+    :return: `array` (ibtSubCtrlNum+1)*(masterCtrlNum-1)+1 percentages
+    """
+    subCtrlNum = ibtSubCtrlNum + 1
+    return np.arange(subCtrlNum*(masterCtrlNum-1)+1)/float(subCtrlNum*(masterCtrlNum-1))
+
+
+class IKSplineChain(object):
+    """
+    Positions of the ik joints of a spline rig, mirroring buildIKSystem:
+    master ctrls -> skinned master curve -> sub ctrls on it -> skinned sub curve -> ik joints on it.
+    The length preservation of every lengthSolver/ikSolver mode is followed:
+      - network (lengthSolver 0, ikSolver 0): the sub curve is rebuilt to degree 7 with 64 spans and
+        detached at the rest/current arc length ratio, the joints sit at even percentages of the result
+      - dynCurveLength (lengthSolver 1) and dynSplineJoints (ikSolver 1): the joints sit at equal arc
+        lengths of the sub curve, up to the rest length
+      - preserveLength off: the joints sit at even percentages of the sub curve
+    Ctrls are moved by translation only, orientations of the ctrls are ignored.
+    """
+    # rebuildCurve of the length preservation network
+    PRESERVE_SPAN_NUM = 64
+    PRESERVE_DEGREE = 7
+
+    def __init__(self, startPos, endPos, masterCtrlNum, ibtSubCtrlNum, jointNum, preserveLength=True,
+                 lengthSolver=0, ikSolver=0, pathPositions=None):
+        """
+        :param startPos: `list` [x, y, z] start position of the chain
+        :param endPos: `list` [x, y, z] end position of the chain
+        :param masterCtrlNum: `int` number of master controls
+        :param ibtSubCtrlNum: `int` number of inbetween sub controls
+        :param jointNum: `int` number of joints in the IK chain
+        :param preserveLength: `bool` preserveLength rig attr, builds the length preservation
+        :param lengthSolver: `int` lengthSolver rig attr
+        :param ikSolver: `int` ikSolver rig attr
+        :param pathPositions: `list` [[x, y, z], ...] positions the chain goes through from startPos to endPos,
+                              eg. SplineRig._getChainPositions(), straight if None or 2 positions
+        """
+        startPos = np.asarray(startPos, dtype=np.float64)
+        endPos = np.asarray(endPos, dtype=np.float64)
+        self.jointNum = jointNum
+        self.preserveLength = bool(preserveLength)
+        self.ikSolver = ikSolver
+        self.lengthSolver = lengthSolver if not ikSolver else 0
+        if pathPositions is not None and len(pathPositions) > 2:
+            self.restMasterPositions = pointsAlongPolyline(pathPositions, masterCtrlNum)
+        else:
+            self.restMasterPositions = startPos + np.linspace(0.0, 1.0, masterCtrlNum)[:, np.newaxis]*(endPos-startPos)
+
+        self.masterCvs, self.masterKnots, self.masterDegree = curveFromPoints(self.restMasterPositions, 1, 3)
+        self.masterWeights = skinWeights(self.masterCvs, self.restMasterPositions)
+        self.subPercentages = subCtrlPercentages(masterCtrlNum, ibtSubCtrlNum)
+        self.restSubPositions = evaluate(self.masterCvs, self.masterKnots, self.masterDegree,
+                                         percentageToParam(self.masterKnots, self.masterDegree, self.subPercentages))
+
+        self.subCvs, self.subKnots, self.subDegree = curveFromPoints(self.restSubPositions, 1, 3)
+        self.subWeights = skinWeights(self.subCvs, self.restSubPositions)
+        self.aimPercentages = np.linspace(0.0, 1.0, jointNum)
+        # rest length measured at build time, on the rebuilt sub curve for the network
+        if self._usesNetwork():
+            self.restLength = float(arcLength(*self._rebuildSubCurve(self.subCvs)))
+        else:
+            self.restLength = float(lengthParams(self.subCvs, self.subKnots, self.subDegree, 2, 0.0, False)[0])
+
+    def _usesNetwork(self):
+        return self.preserveLength and not self.lengthSolver and not self.ikSolver
+
+    def _rebuildSubCurve(self, subCvs):
+        return rebuildCurve(subCvs, self.subKnots, self.subDegree, self.PRESERVE_SPAN_NUM, self.PRESERVE_DEGREE)
+
+    def subPositions(self, masterPositions, subOffsets=None):
+        """
+        Sub ctrl positions driven by the master ctrls.
+        :param masterPositions: `array` (..., masterCtrlNum, 3) world positions of the master ctrls
+        :param subOffsets: `array` (..., subCtrlNum, 3) translation of the sub ctrls on top of it
+        :return: `array` (..., subCtrlNum, 3)
+        """
+        cvs = deformCvs(self.masterCvs, self.masterWeights, self.restMasterPositions, masterPositions)
+        positions = evaluate(cvs, self.masterKnots, self.masterDegree,
+                             percentageToParam(self.masterKnots, self.masterDegree, self.subPercentages))
+        return positions if subOffsets is None else positions + subOffsets
+
+    def subCurve(self, subPositions):
+        """
+        Cvs of the skinned sub curve.
+        :param subPositions: `array` (..., subCtrlNum, 3) sub ctrl positions
+        :return: `array` (..., cvNum, 3)
+        """
+        return deformCvs(self.subCvs, self.subWeights, self.restSubPositions, subPositions)
+
+    def _jointPositions(self, subCvs, globalScale, preserveLength):
+        restLength = self.restLength*globalScale
+        if self._usesNetwork():
+            # detachCurve at clamp(rest/current arc length) of the rebuilt curve, or at its end
+            cvs, knots, degree = self._rebuildSubCurve(subCvs)
+            ratio = restLength/max(float(arcLength(cvs, knots, degree)), 1e-12) if preserveLength else 1.0
+            params = percentageToParam(knots, degree, self.aimPercentages*min(max(ratio, 0.0), 1.0))
+            return evaluate(cvs, knots, degree, params)
+        if self.preserveLength and (self.lengthSolver or self.ikSolver):
+            params = lengthParams(subCvs, self.subKnots, self.subDegree, self.jointNum, restLength, preserveLength)[1]
+            return evaluate(subCvs, self.subKnots, self.subDegree, params)
+        if self.ikSolver:
+            # dynSplineJoints spreads the joints by arc length even without length preservation
+            params = lengthParams(subCvs, self.subKnots, self.subDegree, self.jointNum, restLength, False)[1]
+            return evaluate(subCvs, self.subKnots, self.subDegree, params)
+        return evaluate(subCvs, self.subKnots, self.subDegree,
+                        percentageToParam(self.subKnots, self.subDegree, self.aimPercentages))
+
+    def aimPositions(self, masterPositions=None, subOffsets=None, subPositions=None, globalScale=1.0,
+                     preserveLength=True):
+        """
+        Positions of the ik joints, where the ik aim references put them.
+        :param masterPositions: `array` (..., masterCtrlNum, 3) master ctrl positions, rest if None
+        :param subOffsets: `array` (..., subCtrlNum, 3) sub ctrl translations
+        :param subPositions: `array` (..., subCtrlNum, 3) sub ctrl positions, overrides the master ctrls
+        :param globalScale: `float` global scale of the rig
+        :param preserveLength: `bool` preserveLength attr of the meta ctrl
+        :return: `array` (..., jointNum, 3)
+        """
+        if subPositions is None:
+            masterPositions = self.restMasterPositions if masterPositions is None else masterPositions
+            subPositions = self.subPositions(masterPositions, subOffsets)
+        subCvs = self.subCurve(subPositions)
+        # the clip depends on the length of every curve, the batch is evaluated curve by curve
+        flatCvs = subCvs.reshape((-1,)+subCvs.shape[-2:])
+        positions = np.stack([self._jointPositions(x, globalScale, preserveLength) for x in flatCvs])
+        return positions.reshape(subCvs.shape[:-2]+positions.shape[-2:])
+
+    def jointLengths(self, aimPositions):
+        """
+        Length of every ik joint.
+        :param aimPositions: `array` (..., jointNum, 3) aimPositions() result
+        :return: `array` (..., jointNum-1)
+        """
+        return np.linalg.norm(np.diff(aimPositions, axis=-2), axis=-1)
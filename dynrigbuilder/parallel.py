@@ -0,0 +1,236 @@
+__author__ = 'wuxiaoyu'
+
+# Build the rigs of a layout file with a pool of mayapy worker processes, then
+# merge the worker scenes into one, eg.
+#   mayapy parallel.py layouts.json --workers 8 --output asset_rig.ma
+#
+# Every worker runs batch.py on its shard of the layouts and saves its own scene.
+# The merge imports the worker scenes under a namespace each, moves the follicles of
+# hair systems shared across shards onto a single hair system, and merges the
+# namespaces back into the root namespace.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+_moduleDir = os.path.dirname(os.path.abspath(__file__))
+if _moduleDir not in sys.path:
+    sys.path.append(_moduleDir)
+
+import pymel.core as pm
+import batch
+import registry
+import rigutils
+
+map(reload, [batch, registry, rigutils])
+
+BATCH_SCRIPT = os.path.join(_moduleDir, "batch.py")
+SHARD_NAMESPACE = "dynRigShard{0:0>2d}"
+
+
+def defaultMayapy():
+    """
+    mayapy executable of the running maya, MAYAPY environment variable overrides it.
+    :return: `string`
+    """
+    if os.environ.get("MAYAPY"):
+        return os.environ["MAYAPY"]
+    exeDir = os.path.dirname(sys.executable)
+    name = "mayapy.exe" if sys.platform.startswith("win") else "mayapy"
+    return os.path.join(exeDir, name)
+
+
+def shardLayouts(layouts, workerNum):
+    """
+    Split layouts into shards of about the same build cost, the joint number of a rig is used as its cost.
+    :param layouts: `list` rig layouts
+    :param workerNum: `int` number of shards
+    :return: `list` list of layout lists, empty shards are dropped
+    """
+    defaultJointNum = [x["dv"] for x in batch.splinerig.SplineRig.rigAttrs if x["ln"] == "jointNum"][0]
+    cost = lambda layout: layout.get("rigAttrs", {}).get("jointNum", defaultJointNum)
+    shards = [[] for _ in range(workerNum)]
+    loads = [0]*workerNum
+    for layout in sorted(layouts, key=cost, reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(layout)
+        loads[i] += cost(layout)
+    return [x for x in shards if x]
+
+
+def _runWorker(args):
+    """
+    Build one shard with a mayapy process.
+    """
+    index, shard, workDir, mayapy, options = args
+    shardName = "shard{0:0>2d}".format(index)
+    layoutFile = os.path.join(workDir, shardName+"_layout.json")
+    sceneFile = os.path.join(workDir, shardName+".mb")
+    reportFile = os.path.join(workDir, shardName+"_report.json")
+    logFile = os.path.join(workDir, shardName+".log")
+    batch.writeLayout(layoutFile, shard)
+
+    cmd = [mayapy, BATCH_SCRIPT, layoutFile, "--output", sceneFile, "--report", reportFile] + options
+    startTime = time.time()
+    with open(logFile, "w") as log:
+        returnCode = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT)
+    seconds = time.time() - startTime
+
+    report = []
+    if os.path.exists(reportFile):
+        with open(reportFile) as f:
+            report = json.load(f)
+    built = len([x for x in report if x["status"] == "built"])
+    return {
+        "worker": index,
+        "rigs": len(shard),
+        "built": built,
+        "seconds": seconds,
+        "rigsPerSecond": built/seconds if seconds else 0.0,
+        "returnCode": returnCode,
+        "scene": sceneFile if os.path.exists(sceneFile) else None,
+        "log": logFile,
+        "report": report,
+    }
+
+
+def runWorkers(layouts, workerNum=None, workDir=None, mayapy=None, backend="pymel", replace=False):
+    """
+    Build the layouts with a pool of mayapy worker processes, one scene per worker.
+    :param layouts: `list` rig layouts
+    :param workerNum: `int` number of worker processes, cpu count if None
+    :param workDir: `string` folder for the shard layouts, scenes, reports and logs, a temp folder if None
+    :param mayapy: `string` mayapy executable, defaultMayapy() if None
+    :param backend: `string` SplineRig.buildRig backend used by the workers
+    :param replace: `bool` passed to the workers, see batch.buildBatch()
+    :return: `list` per worker report {"worker", "rigs", "built", "seconds", "rigsPerSecond",
+                                       "returnCode", "scene", "log", "report"}
+    """
+    if not layouts:
+        return []
+    workerNum = workerNum or cpu_count()
+    workDir = workDir or tempfile.mkdtemp(prefix="dynRigBuild_")
+    mayapy = mayapy or defaultMayapy()
+    options = ["--backend", backend] + (["--replace"] if replace else [])
+
+    shards = shardLayouts(layouts, workerNum)
+    pool = ThreadPool(len(shards))
+    try:
+        return pool.map(_runWorker, [(i, shard, workDir, mayapy, options) for i, shard in enumerate(shards)])
+    finally:
+        pool.close()
+        pool.join()
+
+
+def mergeScenes(sceneFiles, sharedHairSystems):
+    """
+    Import worker scenes into the current scene and merge the shared and the pooled hair systems.
+    :param sceneFiles: `list` worker scene files
+    :param sharedHairSystems: `list` names of the hair systems shared by rigs across the shards
+    :return: `dict` shared hair system name: merged hair system transform
+    """
+    namespaces = []
+    for i, sceneFile in enumerate(sceneFiles):
+        namespace = SHARD_NAMESPACE.format(i)
+        pm.importFile(sceneFile, namespace=namespace)
+        namespaces.append(namespace)
+
+    # every worker creates its own hair pools, merge them by name like the shared hair systems
+    poolHairSystems = pm.ls("*:*.{0}".format(rigutils.HAIR_POOL_TAG), o=1, type="hairSystem")
+    poolNames = sorted(set(x.getParent().name().split(":")[-1] for x in poolHairSystems))
+    merged = {}
+    for name in list(sharedHairSystems) + [x for x in poolNames if x not in sharedHairSystems]:
+        instances = [pm.PyNode("{0}:{1}".format(ns, name)) for ns in namespaces
+                     if pm.objExists("{0}:{1}".format(ns, name))]
+        if not instances:
+            continue
+        for hairSys in instances[1:]:
+            rigutils.moveFollicles(hairSys, instances[0])
+        merged[name] = instances[0]
+
+    # and move the merged pools onto a single nucleus
+    poolNuclei = [pm.PyNode("{0}:{1}".format(ns, rigutils.HAIR_POOL_NUCLEUS)) for ns in namespaces
+                  if pm.objExists("{0}:{1}".format(ns, rigutils.HAIR_POOL_NUCLEUS))]
+    for name in poolNames:
+        hairSys = merged[name].getShape()
+        if poolNuclei and hairSys.currentState.connections()[0] != poolNuclei[0]:
+            pm.select(hairSys, r=1)
+            pm.mel.assignNSolver(poolNuclei[0].name())
+    for nucleus in poolNuclei[1:]:
+        if not pm.listConnections(nucleus.outputObjects, type="hairSystem"):
+            pm.delete(nucleus)
+
+    for namespace in namespaces:
+        pm.namespace(removeNamespace=namespace, mergeNamespaceWithRoot=True)
+    # the worker registries come in as dynRigRegistry1, dynRigRegistry2, ...
+    registry.mergeRegistries()
+    return merged
+
+
+def buildParallel(layouts, workerNum=None, workDir=None, mayapy=None, backend="pymel", replace=False):
+    """
+    Build the layouts in parallel and merge the results into the current scene.
+    :param layouts: `list` rig layouts
+    :param workerNum: `int` number of worker processes, cpu count if None
+    :param workDir: `string` folder for the worker files, a temp folder if None
+    :param mayapy: `string` mayapy executable, defaultMayapy() if None
+    :param backend: `string` SplineRig.buildRig backend used by the workers
+    :param replace: `bool` passed to the workers, see batch.buildBatch()
+    :return: `list` per worker reports, see runWorkers()
+    """
+    workerReports = runWorkers(layouts, workerNum, workDir, mayapy, backend, replace)
+    sharedHairSystems = sorted(set(x["hairSystem"] for x in layouts if x.get("hairSystem")))
+    with batch.mayautils.batchBuildContext():
+        mergeScenes([x["scene"] for x in workerReports if x["scene"]], sharedHairSystems)
+    return workerReports
+
+
+def formatWorkerReport(workerReports):
+    """
+    Text summary of the worker throughput.
+    :param workerReports: `list` runWorkers() result
+    :return: `string`
+    """
+    lines = ["{0:<8} {1:>6} {2:>6} {3:>10} {4:>10}".format("worker", "rigs", "built", "seconds", "rigs/s")]
+    for report in workerReports:
+        lines.append("{0:<8} {1:>6} {2:>6} {3:>10.3f} {4:>10.3f}".format(
+            report["worker"], report["rigs"], report["built"], report["seconds"], report["rigsPerSecond"]))
+        if report["returnCode"]:
+            lines.append("  worker {0} exited with {1}, see {2}".format(
+                report["worker"], report["returnCode"], report["log"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build DynRigBuilder rigs with a pool of mayapy workers.")
+    parser.add_argument("layout", help="json layout file")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, cpu count by default")
+    parser.add_argument("--workDir", help="folder for the worker scenes, reports and logs")
+    parser.add_argument("--mayapy", help="mayapy executable of the workers")
+    parser.add_argument("--output", help="save the merged scene to this file")
+    parser.add_argument("--report", help="write the worker reports to this json file")
+    parser.add_argument("--backend", default="pymel", choices=["pymel", "modifier"])
+    parser.add_argument("--replace", action="store_true", help="rebuild rigs that already exist")
+    args = parser.parse_args(argv)
+
+    startTime = time.time()
+    workerReports = buildParallel(batch.readLayout(args.layout), args.workers, args.workDir,
+                                  args.mayapy, args.backend, args.replace)
+    print(formatWorkerReport(workerReports))
+    print("total {0:.3f}s".format(time.time()-startTime))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(workerReports, f, indent=1)
+    if args.output:
+        pm.saveAs(args.output, force=True)
+    return 0 if all(x["returnCode"] == 0 for x in workerReports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+__author__ = 'wuxiaoyu'
+
+# Per-phase profile of a rig build, eg.
+#   with profiler.BuildProfiler("hairA") as prof:
+#       rig.buildRig(scaffoldTop)
+#   prof.writeReport("hairA_profile.json")
+#
+# Phases follow the subsystems tagged by mayautils.setBuildSubsystem() during the build
+# (baseCtrl, baseJnt, ik, fk, ikfkBlend, dynamic, finalize), everything before the first
+# tag goes to "setup". For every phase the report holds the wall time, the nodes created
+# by type and the pymel calls made by name.
+
+import json
+import os
+import time
+from collections import OrderedDict
+from timeit import default_timer
+
+import pymel.core as pm
+import maya.api.OpenMaya as om2
+import mayautils
+
+map(reload, [mayautils])
+
+SETUP_PHASE = "setup"
+
+# pymel methods counted on top of the pymel.core functions
+COUNTED_METHODS = [
+    (pm.Attribute, ["set", "get", "connect", "disconnect", "inputs", "outputs", "lock", "setKeyable"]),
+    (pm.nt.DependNode, ["rename", "nodeType", "attr", "hasAttr"]),
+    (pm.nt.DagNode, ["setParent", "getParent", "getShape", "getChildren"]),
+    (pm.nt.Transform, ["getTranslation", "setTranslation", "getMatrix"]),
+]
+
+
+class BuildProfiler(object):
+    """
+    Time the build phases and count the nodes and pymel calls of each phase.
+    """
+    def __init__(self, name="", countCalls=True):
+        """
+        :param name: `string` name of the profiled build, usually the rig prefix
+        :param countCalls: `bool` count the pymel calls, wraps pymel.core while profiling
+        """
+        self.name = name
+        self.countCalls = countCalls
+        self.phases = OrderedDict()
+        self.totalSeconds = 0.0
+        self._phase = None
+        self._phaseStart = None
+        self._startTime = None
+        self._callbackId = None
+        self._patched = []
+        self._previousProfiler = None
+
+    def _getPhase(self, name):
+        if name not in self.phases:
+            self.phases[name] = {"seconds": 0.0, "nodes": {}, "calls": {}}
+        return self.phases[name]
+
+    def startPhase(self, name):
+        """
+        Close the running phase and start timing another one, a phase run twice adds up.
+        :param name: `string` phase name
+        :return:
+        """
+        now = default_timer()
+        if self._phase:
+            self._getPhase(self._phase)["seconds"] += now - self._phaseStart
+        self._phase = name
+        self._phaseStart = now
+        self._getPhase(name)
+
+    def _count(self, key, name):
+        counts = self._getPhase(self._phase)[key]
+        counts[name] = counts.get(name, 0) + 1
+
+    def _nodeAdded(self, node, *args):
+        self._count("nodes", om2.MFnDependencyNode(node).typeName)
+
+    def _wrap(self, owner, attrName, name, func):
+        # patch the attribute the function is reached by, its __name__ may differ (decorators, aliases)
+        def counted(*args, **kwargs):
+            self._count("calls", name)
+            return func(*args, **kwargs)
+        counted.__name__ = attrName
+        counted.__doc__ = func.__doc__
+        self._patched.append((owner, attrName, func))
+        setattr(owner, attrName, counted)
+
+    def _patchPymel(self):
+        for attrName, value in list(vars(pm).items()):
+            if attrName.startswith("_") or not callable(value) or isinstance(value, type):
+                continue
+            if getattr(value, "__name__", None) != attrName:
+                # aliases and callable objects like pm.mel
+                continue
+            self._wrap(pm, attrName, attrName, value)
+        for cls, methodNames in COUNTED_METHODS:
+            for methodName in methodNames:
+                # only methods defined on the class itself, inherited ones are wrapped on their owner
+                if methodName in vars(cls):
+                    self._wrap(cls, methodName, "{0}.{1}".format(cls.__name__, methodName), vars(cls)[methodName])
+
+    def _unpatchPymel(self):
+        for owner, attrName, func in reversed(self._patched):
+            setattr(owner, attrName, func)
+        self._patched = []
+
+    def start(self):
+        """
+        Start profiling, called by the with statement.
+        :return:
+        """
+        self.phases = OrderedDict()
+        self._startTime = default_timer()
+        self.startPhase(SETUP_PHASE)
+        self._callbackId = om2.MDGMessage.addNodeAddedCallback(self._nodeAdded, "dependNode")
+        if self.countCalls:
+            self._patchPymel()
+        self._previousProfiler = mayautils.setBuildProfiler(self)
+
+    def stop(self):
+        """
+        Stop profiling, called by the with statement.
+        :return:
+        """
+        mayautils.setBuildProfiler(self._previousProfiler)
+        self._unpatchPymel()
+        if self._callbackId is not None:
+            om2.MMessage.removeCallback(self._callbackId)
+            self._callbackId = None
+        now = default_timer()
+        self._getPhase(self._phase)["seconds"] += now - self._phaseStart
+        self.totalSeconds = now - self._startTime
+        self._phase = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def report(self):
+        """
+        Profile as a json friendly dictionary.
+        :return: `dict` {"name", "date", "mayaVersion", "seconds", "nodeCount", "callCount",
+                         "phases": [{"name", "seconds", "nodeCount", "callCount", "nodes", "calls"}, ...]}
+        """
+        phases = []
+        for name, phase in self.phases.items():
+            phases.append(OrderedDict([
+                ("name", name),
+                ("seconds", phase["seconds"]),
+                ("nodeCount", sum(phase["nodes"].values())),
+                ("callCount", sum(phase["calls"].values())),
+                ("nodes", OrderedDict(sorted(phase["nodes"].items(), key=lambda x: -x[1]))),
+                ("calls", OrderedDict(sorted(phase["calls"].items(), key=lambda x: -x[1]))),
+            ]))
+        return OrderedDict([
+            ("name", self.name),
+            ("date", time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ("mayaVersion", pm.about(version=1)),
+            ("seconds", self.totalSeconds),
+            ("nodeCount", sum(x["nodeCount"] for x in phases)),
+            ("callCount", sum(x["callCount"] for x in phases)),
+            ("phases", phases),
+        ])
+
+    def formatReport(self, topNum=3):
+        """
+        Short text summary of the profile.
+        :param topNum: `int` number of most created node types listed per phase
+        :return: `string`
+        """
+        report = self.report()
+        total = report["seconds"] or 1.0
+        lines = ["{0} build profile, {1:.3f}s, {2} nodes, {3} pymel calls".format(
+            report["name"], report["seconds"], report["nodeCount"], report["callCount"])]
+        lines.append("{0:<12} {1:>9} {2:>6} {3:>7} {4:>7}  {5}".format(
+            "phase", "seconds", "%", "nodes", "calls", "top node types"))
+        for phase in report["phases"]:
+            topNodes = ", ".join("{0} {1}".format(k, v) for k, v in list(phase["nodes"].items())[:topNum])
+            lines.append("{0:<12} {1:>9.3f} {2:>6.1f} {3:>7} {4:>7}  {5}".format(
+                phase["name"], phase["seconds"], 100.0*phase["seconds"]/total,
+                phase["nodeCount"], phase["callCount"], topNodes))
+        return "\n".join(lines)
+
+    def writeReport(self, filePath):
+        """
+        Write the profile to a json file, and its text summary next to it with a .txt extension.
+        :param filePath: `string` json file path
+        :return: `string` text summary
+        """
+        summary = self.formatReport()
+        with open(filePath, "w") as f:
+            json.dump(self.report(), f, indent=1)
+        with open(os.path.splitext(filePath)[0]+".txt", "w") as f:
+            f.write(summary+"\n")
+        return summary
@@ -0,0 +1,217 @@
+__author__ = 'wuxiaoyu'
+
+# Registry of the scaffold and rig top nodes of the scene, keyed by rig prefix.
+# One network node holds a message connection to every top, the prefix of a top is the
+# value of its tag attribute. The registry is read once into an in-memory index, which
+# scene callbacks mark stale on new/open/import/reference changes and when a tagged node
+# is added or removed (delete, undo, redo), so a lookup is an exact dictionary access
+# instead of a wildcard scan over every node of the scene.
+# Registry nodes are found by their attributes, not their name, so the renamed registries
+# of imported scenes are read as well. Tops without a registry connection (scenes saved
+# before the registry) are found by a tag scan, run only after a new/open/import/reference
+# change, not after every node change.
+
+import pymel.core as pm
+import maya.api.OpenMaya as om2
+import mayautils
+
+map(reload, [mayautils])
+
+REGISTRY_NODE = "dynRigRegistry"
+# kind: (registry attribute, tag attribute of the top node, top node name suffix of older scenes),
+# the tags are scaffold.SCAFFOLD_TOP_TAG and SplineRig.RIG_TOP_TAG
+KINDS = {
+    "scaffold": ("scaffoldTops", "scaffoldTop", "_scaffold_grp"),
+    "rig": ("rigTops", "rigTop", "_all_ctrl"),
+}
+SCENE_MESSAGES = ["kAfterNew", "kAfterOpen", "kAfterImport", "kAfterCreateReference",
+                  "kAfterRemoveReference", "kAfterLoadReference", "kAfterUnloadReference"]
+
+# kind: {prefix: top node}, None when stale
+_index = None
+# kind: [tagged top nodes], None when the scene has to be scanned again
+_scanned = None
+# kept across reloads, the installed callbacks call into the reloaded module
+try:
+    _callbackIds
+except NameError:
+    _callbackIds = []
+
+
+def getRegistryNode(create=False):
+    """
+    Get the registry node of the scene.
+    :param create: `bool` create the registry node if the scene has none
+    :return: `PyNode` registry network node, None if there is none and create is False
+    """
+    if pm.objExists(REGISTRY_NODE):
+        return pm.PyNode(REGISTRY_NODE)
+    if not create:
+        return None
+    registryNode = pm.createNode("network", n=REGISTRY_NODE)
+    mayautils.addAttributes(registryNode, [{"ln":x[0], "at":"message", "m":1, "im":0} for x in KINDS.values()])
+    return registryNode
+
+
+def listRegistryNodes():
+    """
+    All registry nodes of the scene, of its references and of the imported scenes.
+    :return: `list` registry network nodes, the scene's own registry last
+    """
+    regAttr = KINDS["rig"][0]
+    nodes = []
+    for pattern in ["*:*.{0}", "*.{0}"]:
+        nodes += [x for x in pm.ls(pattern.format(regAttr), o=1, type="network") if x not in nodes]
+    registryNode = getRegistryNode()
+    if registryNode is not None and registryNode in nodes:
+        nodes.remove(registryNode)
+        nodes.append(registryNode)
+    return nodes
+
+
+def mergeRegistries():
+    """
+    Fold the registries of imported scenes (dynRigRegistry1, ...) into the scene's registry.
+    Registries of referenced scenes are kept, they can not be deleted.
+    :return:
+    """
+    registryNodes = [x for x in listRegistryNodes() if not x.isReferenced()]
+    if not registryNodes:
+        return
+    registryNode = getRegistryNode(create=True)
+    for otherNode in registryNodes:
+        if otherNode == registryNode:
+            continue
+        for regAttr, tagAttr, suffix in KINDS.values():
+            for top in pm.listConnections(otherNode.attr(regAttr), s=1, d=0):
+                pm.connectAttr(top.message, registryNode.attr(regAttr), na=1)
+        pm.delete(otherNode)
+    invalidateIndex()
+
+
+def _getPrefix(kind, node):
+    tagAttr, suffix = KINDS[kind][1:]
+    prefix = pm.getAttr("{0}.{1}".format(node.name(), tagAttr))
+    if not prefix and node.name().endswith(suffix):
+        # rig tops of older scenes have an empty tag
+        prefix = node.name().split(":")[-1][:-len(suffix)]
+    return prefix
+
+
+def _scanTops():
+    global _scanned
+    _scanned = {}
+    for kind, (regAttr, tagAttr, suffix) in KINDS.items():
+        _scanned[kind] = pm.ls("*:*.{0}".format(tagAttr), o=1) + pm.ls("*.{0}".format(tagAttr), o=1)
+    return _scanned
+
+
+def rebuildIndex():
+    """
+    Read the registry nodes of the scene, of its references and of the imported scenes into the index.
+    Tagged tops missing from the registries (scenes saved before the registry) are indexed as well.
+    :return: `dict` kind: {prefix: top node}
+    """
+    global _index
+    installCallbacks()
+    scanned = _scanned if _scanned is not None else _scanTops()
+    _index = dict((x, {}) for x in KINDS)
+    registryNodes = listRegistryNodes()
+    for kind, (regAttr, tagAttr, suffix) in KINDS.items():
+        registered = []
+        for registryNode in registryNodes:
+            registered += pm.listConnections(registryNode.attr(regAttr), s=1, d=0)
+        # unregistered tops first, the registered ones win, the scene's own registry last
+        tops = [x for x in scanned[kind] if x not in registered and x.exists()] + registered
+        for top in tops:
+            _index[kind][_getPrefix(kind, top)] = top
+    return _index
+
+
+def _getIndex():
+    return _index if _index is not None else rebuildIndex()
+
+
+def registerTop(kind, prefix, node):
+    """
+    Add a scaffold or rig top to the registry.
+    :param kind: `string` "scaffold" or "rig"
+    :param prefix: `string` rig prefix, also written to the tag attribute of the node
+    :param node: `PyNode` top node
+    :return:
+    """
+    index = _getIndex()
+    regAttr, tagAttr = KINDS[kind][:2]
+    pm.setAttr("{0}.{1}".format(node.name(), tagAttr), prefix)
+    registryNode = getRegistryNode(create=True)
+    pm.connectAttr(node.message, registryNode.attr(regAttr), na=1)
+    index[kind][prefix] = node
+
+
+def getTop(kind, prefix):
+    """
+    Get the scaffold or rig top node of a prefix.
+    :param kind: `string` "scaffold" or "rig"
+    :param prefix: `string` exact rig prefix
+    :return: `PyNode` top node, None if there is none
+    """
+    tops = _getIndex()[kind]
+    node = tops.get(prefix)
+    if node is not None and not node.exists():
+        del tops[prefix]
+        node = None
+    return node
+
+
+def listTops(kind):
+    """
+    All scaffold or rig top nodes of the scene.
+    :param kind: `string` "scaffold" or "rig"
+    :return: `list` top nodes, sorted by prefix
+    """
+    tops = _getIndex()[kind]
+    return [tops[x] for x in sorted(tops) if getTop(kind, x) is not None]
+
+
+def invalidateIndex(*args):
+    """
+    Mark the index stale, it is read again from the registry and the scene is scanned
+    again for unregistered tops at the next lookup.
+    """
+    global _index, _scanned
+    _index = None
+    _scanned = None
+
+
+def _nodeChanged(node, *args):
+    global _index
+    if _index is None:
+        return
+    fnNode = om2.MFnDependencyNode(node)
+    if any(fnNode.hasAttribute(x[1]) for x in KINDS.values()):
+        # tops are added and removed through the registry, no need to scan the scene again
+        _index = None
+
+
+def installCallbacks():
+    """
+    Keep the index current with scene and node callbacks, installed once per session.
+    :return:
+    """
+    if _callbackIds:
+        return
+    for message in SCENE_MESSAGES:
+        _callbackIds.append(om2.MSceneMessage.addCallback(getattr(om2.MSceneMessage, message), invalidateIndex))
+    _callbackIds.append(om2.MDGMessage.addNodeAddedCallback(_nodeChanged, "transform"))
+    _callbackIds.append(om2.MDGMessage.addNodeRemovedCallback(_nodeChanged, "transform"))
+
+
+def removeCallbacks():
+    """
+    Remove the callbacks installed by installCallbacks().
+    :return:
+    """
+    for callbackId in _callbackIds:
+        om2.MMessage.removeCallback(callbackId)
+    del _callbackIds[:]
+    invalidateIndex()
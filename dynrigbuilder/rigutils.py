@@ -2,13 +2,15 @@ __author__ = 'wuxiaoyu'
 
 import pymel.core as pm
 import maya.OpenMaya as om
+import curvecache
 import mayautils
 
-map(reload, [mayautils])
+map(reload, [curvecache, mayautils])
 
 def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
                   jointNum, metaCtrl=None, preserveVolume=True,
-                  preserveLength=True, globalScalePlug=None):
+                  preserveLength=True, globalScalePlug=None, lengthNode=False,
+                  jointNode=False, pathPositions=None):
     """
     Build a spline IK.
     :param prefix: `string` prefix added to the related nodes
@@ -21,6 +23,15 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
     :param preserveVolume: `bool` preserve volume when deformed
     :param preserveLength: `bool` preserve spline length when deformed
     :param globalScalePlug: `PyNode` global scale attribute
+    :param lengthNode: `bool` preserve the length with a dynCurveLength node computing the ik joint
+                       parameters, instead of the rebuildCurve/curveInfo/detachCurve network
+    :param jointNode: `bool` drive the ik joints with a single dynSplineJoints node instead of
+                      the aim joint chain and its constraints, the node preserves the length itself
+    :param pathPositions: `list` [[x, y, z], ...] ordered positions the spline goes through at rest, from
+                          startPos to endPos. eg. the scaffold locators of a curved chain, straight if None.
+                          the spline only passes through masterCtrlNum points along the path, a path of
+                          more locators than master ctrls is followed loosely. the ik joints rest on the
+                          spline itself, so they don't move when the ik starts evaluating
     :return: `PyNode` top node of the system hierarchy
     """
     # ---------------------------------------------------------------------
@@ -59,7 +70,7 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
     restLen = om.MPoint(*startPos).distanceTo(om.MPoint(*endPos))
     endJntDict = {"top":startPos, "bot":endPos}#{"top":[0,0,0], "bot":[restLen,0,0]}
     endJnts = []
-    for name, pos in endJntDict.iteritems():
+    for name, pos in endJntDict.items():
         jnt = pm.createNode("joint", n="{0}_{1}_jnt".format(prefix, name))
         jnt.translate.set(pos)
         ctrl = mayautils.createCtrl("{0}_{1}_ctrl".format(prefix, name), "hollowSphere", 1, "yellow")
@@ -73,6 +84,15 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
     pm.skinCluster(endJnts, auxSurf, n="{0}_ik_base_skc".format(prefix), mi=2, dr=1)
     auxSurf.setParent(ikAuxGrp)
 
+    # curved chains: the master ctrls rest on the path and keep their offset to the base surface
+    masterPoints = None
+    if pathPositions and len(pathPositions) > 2:
+        pathCrv = pm.curve(d=1, p=pathPositions)
+        masterPoints = getPointsAlongCurve(pathCrv, masterCtrlNum)
+        pm.delete(pathCrv)
+    else:
+        pathPositions = [startPos, endPos]
+
     # build master ctrls
     masterJnts = []
     ratio = 1.0/(masterCtrlNum-1)
@@ -88,9 +108,14 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
         masterCtrlOff = mayautils.createParentTransform("off", masterCtrl)
         aimTarget = endJnts[1] if i<masterCtrlNum-1 else endJnts[0]
         aimVector = [1,0,0] if i<masterCtrlNum-1 else [-1,0,0]
-        pm.delete(pm.aimConstraint(aimTarget, masterCtrlOrg, wut=0, aim=aimVector))
-        pm.aimConstraint(aimTarget, masterCtrlOff, wut=0, aim=aimVector)
-        pm.pointConstraint(masterFol, masterCtrlOff, mo=0)
+        if masterPoints:
+            pm.xform(masterCtrlOrg, t=masterPoints[i], ws=1)
+            mayautils.aimObject(masterPoints[i+1] if i<masterCtrlNum-1 else masterPoints[i-1], masterCtrlOrg, aimVector)
+            pm.parentConstraint(masterFol, masterCtrlOff, mo=1)
+        else:
+            mayautils.aimObject(aimTarget, masterCtrlOrg, aimVector)
+            pm.aimConstraint(aimTarget, masterCtrlOff, wut=0, aim=aimVector)
+            pm.pointConstraint(masterFol, masterCtrlOff, mo=0)
         masterJnt = pm.createNode("joint", n="{0}_ik_master_{1:0>2d}_jnt".format(prefix, i))
         masterJntOrg = mayautils.createParentTransform("org", masterJnt)
         masterJntOrg.setParent(ikAuxGrp)
@@ -121,16 +146,16 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
             subCtrlOff.setParent(subCtrlOrg)
 
             # subCtrl position
-            poci = pm.createNode("pointOnCurveInfo", n="{0}_ik_sub_{1:0>2d}_poci".format(prefix, id))
-            vecp = pm.createNode("vectorProduct", n="{0}_ik_sub_{1:0>2d}_vecp".format(prefix, id))
-            masterCrv.worldSpace[0].connect(poci.inputCurve)
+            poci = mayautils.createNode("pointOnCurveInfo", "{0}_ik_sub_{1:0>2d}_poci".format(prefix, id))
+            vecp = mayautils.createNode("vectorProduct", "{0}_ik_sub_{1:0>2d}_vecp".format(prefix, id))
+            mayautils.connectAttr(masterCrv.worldSpace[0], poci.inputCurve)
             param = ratio1*id
             poci.parameter.set(param)
             poci.turnOnPercentage.set(1)
             vecp.operation.set(4)
-            poci.position.connect(vecp.input1)
-            subCtrlOff.parentInverseMatrix[0].connect(vecp.matrix)
-            vecp.output.connect(subCtrlOff.translate)
+            mayautils.connectAttr(poci.position, vecp.input1)
+            mayautils.connectAttr(subCtrlOff.parentInverseMatrix[0], vecp.matrix)
+            mayautils.connectAttr(vecp.output, subCtrlOff.translate)
 
             # subCtrl orientation
             if j==0:
@@ -158,6 +183,8 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
             # utils.connectChannels(subCtrl, subJnt, 'tr')
             # utils.connectChannels(subCtrlOff, subJntOrg, 'tr')
 
+    # sub joints have to be in place before the sub curve is built on them
+    mayautils.flushBuildPlan()
     subCrv = createCurveFromJoint(subJnts, "{0}_ik_sub_crv".format(prefix), 1, 3)
     subCrvSkc = pm.skinCluster(subJnts, subCrv, n="{0}_ik_sub_skc".format(prefix), mi=2, dr=1)
     subCrv.setParent(ikAuxGrp)
@@ -165,104 +192,159 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
     # ---------------------------------------------------------------------
     # length preservation
     # compute restArcLength/currentArcLength ratio to determine where to detach the curve
-    if preserveLength:
+    if preserveLength and not lengthNode and not jointNode:
         subCrvRbc = pm.rebuildCurve(subCrv, rpo=1, end=1, kr=0, rt=0, d=7, ch=1, s=64)[1]
-        rLenMdl = pm.createNode("multDoubleLinear", n="{0}_restLength_mdl".format(prefix))
+        rLenMdl = mayautils.createNode("multDoubleLinear", "{0}_restLength_mdl".format(prefix))
         rLenMdl.input1.set(pm.arclen(subCrv))
-        globalScalePlug.connect(rLenMdl.input2)
-        subCrvInfo = pm.createNode("curveInfo", n="{0}_subCrv_cinfo".format(prefix))
-        subCrvRbc.outputCurve.connect(subCrvInfo.inputCurve)
-        lenRatioMd = pm.createNode("multiplyDivide", n="{0}_lenRatio_md".format(prefix))
+        mayautils.connectAttr(globalScalePlug, rLenMdl.input2)
+        subCrvInfo = mayautils.createNode("curveInfo", "{0}_subCrv_cinfo".format(prefix))
+        mayautils.connectAttr(subCrvRbc.outputCurve, subCrvInfo.inputCurve)
+        lenRatioMd = mayautils.createNode("multiplyDivide", "{0}_lenRatio_md".format(prefix))
         lenRatioMd.operation.set(2)
-        subCrvInfo.arcLength.connect(lenRatioMd.input2X)
-        rLenMdl.output.connect(lenRatioMd.input1X)
-        lenRatioMdl = pm.createNode("multDoubleLinear", n="{0}_lenRatio_mdl".format(prefix))
-        lenRatioMd.outputX.connect(lenRatioMdl.input1)
-        metaCtrl.preserveLength.connect(lenRatioMdl.input2)
-        preservelenRev = pm.createNode("reverse", n="{0}_preserveLen_rev".format(prefix))
-        metaCtrl.preserveLength.connect(preservelenRev.inputX)
-        lenRatioAdl = pm.createNode("addDoubleLinear", n="{0}_lenRatio_adl".format(prefix))
-        lenRatioMdl.output.connect(lenRatioAdl.input1)
-        preservelenRev.outputX.connect(lenRatioAdl.input2)
-        lenClp = pm.createNode("clamp", n="{0}_preserveLen_clp".format(prefix))
+        mayautils.connectAttr(subCrvInfo.arcLength, lenRatioMd.input2X)
+        mayautils.connectAttr(rLenMdl.output, lenRatioMd.input1X)
+        lenRatioMdl = mayautils.createNode("multDoubleLinear", "{0}_lenRatio_mdl".format(prefix))
+        mayautils.connectAttr(lenRatioMd.outputX, lenRatioMdl.input1)
+        mayautils.connectAttr(metaCtrl.preserveLength, lenRatioMdl.input2)
+        preservelenRev = mayautils.createNode("reverse", "{0}_preserveLen_rev".format(prefix))
+        mayautils.connectAttr(metaCtrl.preserveLength, preservelenRev.inputX)
+        lenRatioAdl = mayautils.createNode("addDoubleLinear", "{0}_lenRatio_adl".format(prefix))
+        mayautils.connectAttr(lenRatioMdl.output, lenRatioAdl.input1)
+        mayautils.connectAttr(preservelenRev.outputX, lenRatioAdl.input2)
+        lenClp = mayautils.createNode("clamp", "{0}_preserveLen_clp".format(prefix))
         lenClp.minR.set(0.0)
         lenClp.maxR.set(1.0)
-        lenRatioAdl.output.connect(lenClp.inputR)
-        detachCrv = pm.createNode("detachCurve", n="{0}_preserveLen_dtc".format(prefix))
-        subCrvRbc.outputCurve.connect(detachCrv.inputCurve)
-        lenClp.outputR.connect(detachCrv.parameter[0])
-        detachCrv.outputCurve[0].connect(subCrv.create, f=1)
+        mayautils.connectAttr(lenRatioAdl.output, lenClp.inputR)
+        detachCrv = mayautils.createNode("detachCurve", "{0}_preserveLen_dtc".format(prefix))
+        mayautils.connectAttr(subCrvRbc.outputCurve, detachCrv.inputCurve)
+        mayautils.connectAttr(lenClp.outputR, detachCrv.parameter[0])
+        mayautils.connectAttr(detachCrv.outputCurve[0], subCrv.create, force=True)
+
+    # same clip computed from the arc length of the sub curve itself, the ik joints
+    # are placed at equal arc lengths from the node parameters
+    crvLen = None
+    if preserveLength and lengthNode and not jointNode:
+        mayautils.loadNodePlugin()
+        crvLen = mayautils.createNode("dynCurveLength", "{0}_preserveLen_crvLen".format(prefix))
+        crvLen.restLength.set(pm.arclen(subCrv))
+        crvLen.parameterNum.set(jointNum)
+        mayautils.connectAttr(subCrv.worldSpace[0], crvLen.inputCurve)
+        mayautils.connectAttr(globalScalePlug, crvLen.globalScale)
+        mayautils.connectAttr(metaCtrl.preserveLength, crvLen.preserveLength)
+
+    # curved chains: the joints rest where the ik puts them on the sub curve, not on the path,
+    # at equal arc lengths for the length nodes, at evenly spread parameters for the pointOnCurveInfos
+    restPoints = None
+    if masterPoints:
+        # the length preservation network drives the sub curve shape, it has to exist to be sampled
+        mayautils.flushBuildPlan()
+        if crvLen or jointNode:
+            restPoints = getPointsAlongCurve(subCrv, jointNum)
+        else:
+            restPoints = getPointsAtPercentages(subCrv, jointNum)
 
     # ---------------------------------------------------------------------
     # build ik aim joint chain
-    aimJnts = buildJointChain("{0}_ik_aim".format(prefix), "jnt", startPos, endPos, jointNum)#[]
-    aimRefs = []
-    ratio= 1.0/(jointNum-1.0)
-    ratio2 = subCtrlNum*(masterCtrlNum-1.0)/(jointNum-1.0)
-    aimJntGrp = pm.createNode("transform", n="{0}_ik_aim_jnt_grp".format(prefix))
-    aimRefGrp = pm.createNode("transform", n="{0}_ik_aim_ref_grp".format(prefix))
-    aimRefGrp.setParent(ikAuxGrp)
-    aimJntGrp.inheritsTransform.set(0)
-    aimJntGrp.setParent(ikJntGrp)
-    for i in range(jointNum):
-        aimJntRef = pm.createNode("transform", n="{0}_ik_aim_{1:0>2d}_ref".format(prefix, i))
-        aimJntRef.setParent(aimRefGrp)
-        aimRefs.append(aimJntRef)
-
-        poci = pm.createNode("pointOnCurveInfo", n="{0}_ik_aim_{1:0>2d}_poci".format(prefix, id))
-        poci.turnOnPercentage.set(1)
-        subCrv.worldSpace[0].connect(poci.inputCurve)
-        param = ratio*i
-        poci.parameter.set(param)
-
-        vecp = pm.createNode("vectorProduct", n="{0}_ik_aim_{1:0>2d}_vecp".format(prefix, id))
-        vecp.operation.set(4)
-        poci.position.connect(vecp.input1)
-        aimJntRef.parentInverseMatrix[0].connect(vecp.matrix)
-        vecp.output.connect(aimJntRef.translate)
-
-        subJntId = int(i*ratio2)
-        if i == jointNum-1:
-            pm.orientConstraint(subJnts[subJntId], aimJntRef)
-        else:
-            oriCst = pm.orientConstraint(subJnts[subJntId], subJnts[subJntId+1], aimJntRef)
-            oriCst.interpType.set(2)
-            weight = min(1, max(0, (param-subJnts[subJntId].pociParam.get())
-                    /(subJnts[subJntId+1].pociParam.get()-subJnts[subJntId].pociParam.get())))
-            weightAttrs = pm.orientConstraint(oriCst, q=1, wal=1)
-            pm.setAttr(weightAttrs[0], weight)
-            pm.setAttr(weightAttrs[1], 1-weight)
-
-
-        aimJnt = aimJnts[i]
-        # aimJnt = pm.createNode("joint", n="{0}_ik_aim_{1:0>2d}_jnt".format(prefix, i))
-        # aimJnts.append(aimJnt)
-        if i==0:
-            aimJnt.setParent(aimJntGrp)
+    if not jointNode:
+        if restPoints:
+            aimJnts = buildJointChainAtPoints("{0}_ik_aim".format(prefix), "jnt", restPoints)
         else:
-            aimJnt.setParent(aimJnts[i-1])
-            aimCst = pm.aimConstraint(aimJntRef, aimJnts[i-1], wut=2)
-            aimRefs[i-1].worldMatrix[0].connect(aimCst.worldUpMatrix)
-        if i == jointNum-1:
-            pm.orientConstraint(aimJntRef, aimJnts[i])
-        pm.pointConstraint(aimJntRef, aimJnt)
+            aimJnts = buildJointChainFromPoints("{0}_ik_aim".format(prefix), "jnt", pathPositions, jointNum)
+        aimRefs = []
+        ratio= 1.0/(jointNum-1.0)
+        ratio2 = subCtrlNum*(masterCtrlNum-1.0)/(jointNum-1.0)
+        aimJntGrp = pm.createNode("transform", n="{0}_ik_aim_jnt_grp".format(prefix))
+        aimRefGrp = pm.createNode("transform", n="{0}_ik_aim_ref_grp".format(prefix))
+        aimRefGrp.setParent(ikAuxGrp)
+        aimJntGrp.inheritsTransform.set(0)
+        aimJntGrp.setParent(ikJntGrp)
+        for i in range(jointNum):
+            aimJntRef = pm.createNode("transform", n="{0}_ik_aim_{1:0>2d}_ref".format(prefix, i))
+            aimJntRef.setParent(aimRefGrp)
+            aimRefs.append(aimJntRef)
+
+            poci = mayautils.createNode("pointOnCurveInfo", "{0}_ik_aim_{1:0>2d}_poci".format(prefix, i))
+            mayautils.connectAttr(subCrv.worldSpace[0], poci.inputCurve)
+            param = ratio*i
+            if crvLen:
+                mayautils.connectAttr(crvLen.outputParameter[i], poci.parameter)
+            else:
+                poci.turnOnPercentage.set(1)
+                poci.parameter.set(param)
+
+            vecp = mayautils.createNode("vectorProduct", "{0}_ik_aim_{1:0>2d}_vecp".format(prefix, i))
+            vecp.operation.set(4)
+            mayautils.connectAttr(poci.position, vecp.input1)
+            mayautils.connectAttr(aimJntRef.parentInverseMatrix[0], vecp.matrix)
+            mayautils.connectAttr(vecp.output, aimJntRef.translate)
+
+            subJntId = int(i*ratio2)
+            if i == jointNum-1:
+                pm.orientConstraint(subJnts[subJntId], aimJntRef)
+            else:
+                oriCst = pm.orientConstraint(subJnts[subJntId], subJnts[subJntId+1], aimJntRef)
+                oriCst.interpType.set(2)
+                weight = min(1, max(0, (param-subJnts[subJntId].pociParam.get())
+                        /(subJnts[subJntId+1].pociParam.get()-subJnts[subJntId].pociParam.get())))
+                weightAttrs = pm.orientConstraint(oriCst, q=1, wal=1)
+                pm.setAttr(weightAttrs[0], weight)
+                pm.setAttr(weightAttrs[1], 1-weight)
+
+
+            aimJnt = aimJnts[i]
+            # aimJnt = pm.createNode("joint", n="{0}_ik_aim_{1:0>2d}_jnt".format(prefix, i))
+            # aimJnts.append(aimJnt)
+            if i==0:
+                aimJnt.setParent(aimJntGrp)
+            else:
+                aimJnt.setParent(aimJnts[i-1])
+                aimCst = pm.aimConstraint(aimJntRef, aimJnts[i-1], wut=2)
+                aimRefs[i-1].worldMatrix[0].connect(aimCst.worldUpMatrix)
+            if i == jointNum-1:
+                pm.orientConstraint(aimJntRef, aimJnts[i])
+            pm.pointConstraint(aimJntRef, aimJnt)
 
     # build ik joint chain
     retJntGrp = pm.createNode("transform", n="{0}_ik_ret_jnt_grp".format(prefix))
     retJntGrp.setParent(ikJntGrp)
-    mayautils.connectChannels(aimJntGrp, retJntGrp, 'trs')
+    if not jointNode:
+        mayautils.connectChannels(aimJntGrp, retJntGrp, 'trs')
     # ikJnts = []
     # for aimJnt in aimJnts:
         # ikJnt = pm.joint(n=aimJnt.name().replace("aim", "ret"))
         # utils.connectChannels(aimJnt, ikJnt, "tr")
         # ikJnts.append(ikJnt)
-    ikJnts = buildJointChain("{0}_ik_ret".format(prefix), "jnt", startPos, endPos, jointNum)
+    if restPoints:
+        ikJnts = buildJointChainAtPoints("{0}_ik_ret".format(prefix), "jnt", restPoints)
+    else:
+        ikJnts = buildJointChainFromPoints("{0}_ik_ret".format(prefix), "jnt", pathPositions, jointNum)
     for i in range(jointNum):
-        mayautils.connectChannels(aimJnts[i], ikJnts[i], "tr")
+        if not jointNode:
+            mayautils.connectChannels(aimJnts[i], ikJnts[i], "tr")
         globalScalePlug.connect(ikJnts[i].scaleY)
         globalScalePlug.connect(ikJnts[i].scaleZ)
         ikJnts[i].message.connect(ikTopGrp.resultJnt, na=1)
     ikJnts[0].setParent(retJntGrp)
+
+    # whole chain evaluated in one node, from the sub curve and the sub joint rotations
+    if jointNode:
+        mayautils.loadNodePlugin()
+        jntSolver = mayautils.createNode("dynSplineJoints", "{0}_ik_splineJoints".format(prefix))
+        jntSolver.restLength.set(pm.arclen(subCrv))
+        jntSolver.jointNum.set(jointNum)
+        if preserveLength:
+            mayautils.connectAttr(metaCtrl.preserveLength, jntSolver.preserveLength)
+        else:
+            jntSolver.preserveLength.set(0)
+        mayautils.connectAttr(subCrv.worldSpace[0], jntSolver.inputCurve)
+        mayautils.connectAttr(retJntGrp.worldMatrix[0], jntSolver.parentMatrix)
+        mayautils.connectAttr(globalScalePlug, jntSolver.globalScale)
+        for i, subJnt in enumerate(subJnts):
+            mayautils.connectAttr(subJnt.worldMatrix[0], jntSolver.subMatrix[i])
+        for i, ikJnt in enumerate(ikJnts):
+            mayautils.connectAttr(ikJnt.jointOrient, jntSolver.jointOrient[i])
+            mayautils.connectAttr(jntSolver.output[i].outputTranslate, ikJnt.translate)
+            mayautils.connectAttr(jntSolver.output[i].outputRotate, ikJnt.rotate)
     # ---------------------------------------------------------------------
     # TODO volume preservation
 
@@ -275,13 +357,15 @@ def buildIKSystem(prefix, startPos, endPos, masterCtrlNum, ibtSubCtrlNum,
 def buildRegularFKSystem(joints, prefix, ctrlNum):
     pass
 
-def buildVariableFKSystem(joints, prefix, ctrlNum, metaCtrl=None):
+def buildVariableFKSystem(joints, prefix, ctrlNum, metaCtrl=None, useComputeNode=False):
     """
     Build variable fk contrl on the given joint chain.
     :param joints: `list` joints in the target joint chain
     :param prefix: `string` prefix added to the related nodes
     :param ctrlNum: `int` number of fk controls
     :param metaCtrl: `PyNode` meta ctrl node. will be created if not given.
+    :param useComputeNode: `bool` evaluate the falloff of all joints in one dynVariableFK node
+                            instead of building a utility node network per joint/ctrl pair
     :return: `PyNode` top node of the system hierarchy
     """
     if not metaCtrl:
@@ -361,90 +445,112 @@ def buildVariableFKSystem(joints, prefix, ctrlNum, metaCtrl=None):
         # calculate joint position on surface and store in attribute
         cpos.inPosition.set(jnt.getTranslation(space="world"))
         pm.addAttr(jnt, ln="posOnSurface", at="float", dv=cpos.parameterV.get())
+        if useComputeNode:
+            continue
 
         # build rotate/scale parameter network
-        rotPma = pm.createNode("plusMinusAverage", n="{0}_fk_{1:0>2d}_rot_pma".format(prefix,i))
+        rotPma = mayautils.createNode("plusMinusAverage", "{0}_fk_{1:0>2d}_rot_pma".format(prefix,i))
         rotPma.operation.set(1)
-        rotPma.output3D.connect(jnt.rotate)
-        scalePma = pm.createNode("plusMinusAverage", n="{0}_fk_{1:0>2d}_scale_pma".format(prefix,i))
+        mayautils.connectAttr(rotPma.output3D, jnt.rotate)
+        scalePma = mayautils.createNode("plusMinusAverage", "{0}_fk_{1:0>2d}_scale_pma".format(prefix,i))
         scalePma.operation.set(1)
         scalePma.input3D[0].set([1,1,1])
-        scalePma.output3D.connect(jnt.scale)
+        mayautils.connectAttr(scalePma.output3D, jnt.scale)
         for j in range(ctrlNum):
             # calculate absolute distance from joint to ctrl
             fkCtrl = fkCtrls[j]
             nodePrefix = "{0}_fk_{1:0>2d}_{2:0>2d}".format(prefix, i, j)
-            distPma = pm.createNode("plusMinusAverage", n="{0}_dist_pma".format(nodePrefix))
+            distPma = mayautils.createNode("plusMinusAverage", "{0}_dist_pma".format(nodePrefix))
             distPma.operation.set(2)
-            fkCtrl.position.connect(distPma.input1D[0])
-            jnt.posOnSurface.connect(distPma.input1D[1])
-            absMd1 = pm.createNode("multiplyDivide", n="{0}_dist_abs1_md".format(nodePrefix))
+            mayautils.connectAttr(fkCtrl.position, distPma.input1D[0])
+            mayautils.connectAttr(jnt.posOnSurface, distPma.input1D[1])
+            absMd1 = mayautils.createNode("multiplyDivide", "{0}_dist_abs1_md".format(nodePrefix))
             absMd1.operation.set(3)
             absMd1.input2X.set(2)
-            absMd2 = pm.createNode("multiplyDivide", n="{0}_dist_abs1_md".format(nodePrefix))
+            absMd2 = mayautils.createNode("multiplyDivide", "{0}_dist_abs2_md".format(nodePrefix))
             absMd2.operation.set(3)
             absMd2.input2X.set(0.5)
-            distPma.output1D.connect(absMd1.input1X)
-            absMd1.output.connect(absMd2.input1)
+            mayautils.connectAttr(distPma.output1D, absMd1.input1X)
+            mayautils.connectAttr(absMd1.output, absMd2.input1)
 
             # clamp to (0, falloff)
-            distClamp = pm.createNode("clamp", n="{0}_dist_cla".format(nodePrefix))
+            distClamp = mayautils.createNode("clamp", "{0}_dist_cla".format(nodePrefix))
             distClamp.minR.set(0)
             distClamp.minG.set(0)
-            fkCtrl.rotateFallOff.connect(distClamp.maxR)
-            fkCtrl.scaleFallOff.connect(distClamp.maxG)
-            absMd2.outputX.connect(distClamp.inputR)
-            absMd2.outputX.connect(distClamp.inputG)
+            mayautils.connectAttr(fkCtrl.rotateFallOff, distClamp.maxR)
+            mayautils.connectAttr(fkCtrl.scaleFallOff, distClamp.maxG)
+            mayautils.connectAttr(absMd2.outputX, distClamp.inputR)
+            mayautils.connectAttr(absMd2.outputX, distClamp.inputG)
 
             # calculate rotation/scale multiplier ratio
-            ratioMd = pm.createNode("multiplyDivide", n="{0}_ratio_md".format(nodePrefix))
+            ratioMd = mayautils.createNode("multiplyDivide", "{0}_ratio_md".format(nodePrefix))
             ratioMd.operation.set(2)
-            distClamp.outputR.connect(ratioMd.input1X)
-            distClamp.outputG.connect(ratioMd.input1Y)
-            fkCtrl.rotateFallOff.connect(ratioMd.input2X)
-            fkCtrl.scaleFallOff.connect(ratioMd.input2Y)
-            ratioRev = pm.createNode("reverse", n="{0}_ratio_rev".format(nodePrefix))
-            ratioMd.output.connect(ratioRev.input)
+            mayautils.connectAttr(distClamp.outputR, ratioMd.input1X)
+            mayautils.connectAttr(distClamp.outputG, ratioMd.input1Y)
+            mayautils.connectAttr(fkCtrl.rotateFallOff, ratioMd.input2X)
+            mayautils.connectAttr(fkCtrl.scaleFallOff, ratioMd.input2Y)
+            ratioRev = mayautils.createNode("reverse", "{0}_ratio_rev".format(nodePrefix))
+            mayautils.connectAttr(ratioMd.output, ratioRev.input)
 
             # calculate rotation value
-            rotTweak = pm.createNode("multDoubleLinear", n="{0}_rot_tweak_md".format(nodePrefix))
-            ratioRev.outputX.connect(rotTweak.input1)
+            rotTweak = mayautils.createNode("multDoubleLinear", "{0}_rot_tweak_md".format(nodePrefix))
+            mayautils.connectAttr(ratioRev.outputX, rotTweak.input1)
             rotTweak.input2.set(1)
-            rotMd = pm.createNode("multiplyDivide", n="{0}_rot_md".format(nodePrefix))
+            rotMd = mayautils.createNode("multiplyDivide", "{0}_rot_md".format(nodePrefix))
             rotMd.operation.set(1)
-            rotTweak.output.connect(rotMd.input2X)
-            rotTweak.output.connect(rotMd.input2Y)
-            rotTweak.output.connect(rotMd.input2Z)
-            fkCtrl.rotate.connect(rotMd.input1)
-            rotMd.output.connect(rotPma.input3D[j])
+            mayautils.connectAttr(rotTweak.output, rotMd.input2X)
+            mayautils.connectAttr(rotTweak.output, rotMd.input2Y)
+            mayautils.connectAttr(rotTweak.output, rotMd.input2Z)
+            mayautils.connectAttr(fkCtrl.rotate, rotMd.input1)
+            mayautils.connectAttr(rotMd.output, rotPma.input3D[j])
 
             # calculate scale value
-            scalePrePma = pm.createNode("plusMinusAverage", n="{0}_scale_pma".format(nodePrefix))
+            scalePrePma = mayautils.createNode("plusMinusAverage", "{0}_scale_pma".format(nodePrefix))
             scalePrePma.operation.set(2)
-            fkCtrl.scale.connect(scalePrePma.input3D[0])
+            mayautils.connectAttr(fkCtrl.scale, scalePrePma.input3D[0])
             scalePrePma.input3D[1].set([1,1,1])
-            scaleTweak = pm.createNode("multDoubleLinear", n="{0}_scale_tweak_md".format(nodePrefix))
-            ratioRev.outputY.connect(scaleTweak.input1)
+            scaleTweak = mayautils.createNode("multDoubleLinear", "{0}_scale_tweak_md".format(nodePrefix))
+            mayautils.connectAttr(ratioRev.outputY, scaleTweak.input1)
             scaleTweak.input2.set(1)
-            scaleMd = pm.createNode("multiplyDivide", n="{0}_scale_md".format(nodePrefix))
+            scaleMd = mayautils.createNode("multiplyDivide", "{0}_scale_md".format(nodePrefix))
             scaleMd.operation.set(1)
-            scaleTweak.output.connect(scaleMd.input2X)
-            scaleTweak.output.connect(scaleMd.input2Y)
-            scaleTweak.output.connect(scaleMd.input2Z)
-            scalePrePma.output3D.connect(scaleMd.input1)
-            scaleMd.output.connect(scalePma.input3D[j+1])
-
+            mayautils.connectAttr(scaleTweak.output, scaleMd.input2X)
+            mayautils.connectAttr(scaleTweak.output, scaleMd.input2Y)
+            mayautils.connectAttr(scaleTweak.output, scaleMd.input2Z)
+            mayautils.connectAttr(scalePrePma.output3D, scaleMd.input1)
+            mayautils.connectAttr(scaleMd.output, scalePma.input3D[j+1])
     pm.delete(cpos)
+
+    # same falloff evaluated for the whole chain in a single node
+    if useComputeNode:
+        mayautils.loadNodePlugin()
+        fkNode = mayautils.createNode("dynVariableFK", "{0}_fk_variableFK".format(prefix))
+        for j, fkCtrl in enumerate(fkCtrls):
+            ctrlPlug = fkNode.control[j]
+            mayautils.connectAttr(fkCtrl.position, ctrlPlug.controlPosition)
+            mayautils.connectAttr(fkCtrl.rotateFallOff, ctrlPlug.controlRotateFallOff)
+            mayautils.connectAttr(fkCtrl.scaleFallOff, ctrlPlug.controlScaleFallOff)
+            mayautils.connectAttr(fkCtrl.rotate, ctrlPlug.controlRotate)
+            mayautils.connectAttr(fkCtrl.scale, ctrlPlug.controlScale)
+        for i, jnt in enumerate(fkJnts):
+            mayautils.connectAttr(jnt.posOnSurface, fkNode.jointParam[i])
+            mayautils.connectAttr(fkNode.output[i].outputRotate, jnt.rotate)
+            mayautils.connectAttr(fkNode.output[i].outputScale, jnt.scale)
+
     return fkTopGrp
 
 
 
-def buildDynamicSystem(prefix, joints, metaCtrl=None, hairSystem=None):
+def buildDynamicSystem(prefix, joints, metaCtrl=None, hairSystem=None, hairPool=None, hairPoolSize=1):
     """
     Build dynamic system based on the given joint chain.
     :param joints: `list` joints in the target joint chain
     :param prefix: `string` prefix added to the related nodes
     :param metaCtrl: `PyNode` meta ctrl node. will be created if not given.
+    :param hairSystem: `PyNode` shared hair system to assign the curve to
+    :param hairPool: `string` assign the curve to a pooled hair system of this pool
+                     when no hair system is given, see getPooledHairSystem()
+    :param hairPoolSize: `int` maximum number of hair systems in the pool
     :return: `PyNode` top node of the system hierarchy
     """
     # add dynamic related attr to meta_ctrl
@@ -477,6 +583,8 @@ def buildDynamicSystem(prefix, joints, metaCtrl=None, hairSystem=None):
 
     # create dynamic system
     animCrv = createCurveFromJoint(joints, "{0}_anim_crv".format(prefix))
+    if not hairSystem and hairPool:
+        hairSystem = getPooledHairSystem(hairPool, hairPoolSize)
     dynSys = makeCurveDynamic(animCrv, hairSystem)
     dynCrv = dynSys["outCurve"]
     dynCrv.setParent(dynAuxGrp)
@@ -497,10 +605,14 @@ def buildDynamicSystem(prefix, joints, metaCtrl=None, hairSystem=None):
         metaCtrl.dynamicSwitch.connect(dynSys["nucleus"].enable)
         metaCtrl.startFrame.connect(dynSys["nucleus"].startFrame)
         metaCtrl.animationAttract.connect(dynSys["hairSystem"].getShape().startCurveAttract)
+    else:
+        # the shared hair system and nucleus belong to other rigs too, drive the
+        # follicle overrides instead. the start frame follows the shared nucleus.
+        driveFollicleOverrides(dynSys["follicle"], metaCtrl.animationAttract, metaCtrl.dynamicSwitch, prefix)
 
-    dynRev = pm.createNode("reverse")
-    metaCtrl.dynamicSwitch.connect(dynRev.inputX)
-    dynRev.outputX.connect(dynSwitchBS.envelope)
+    dynRev = mayautils.createNode("reverse", "{0}_dynSwitch_rev".format(prefix))
+    mayautils.connectAttr(metaCtrl.dynamicSwitch, dynRev.inputX)
+    mayautils.connectAttr(dynRev.outputX, dynSwitchBS.envelope)
     metaCtrl.animationBlend.connect(animCrvBS.envelope)
 
     # create dynamic joints
@@ -629,7 +741,6 @@ def createSurfaceFromJoints(joints, name="surface", ibtCVNum=0, degree=3):
     offDir = (om.MVector(*(startPos-endPos))^om.MVector(0,1,0)).normal()
     if offDir.length() == 0: offDir = om.MVector(0,0,-1)
 
-    print startPos, endPos, offDir[0], offDir[1], offDir[2]
     buildCrv1 = pm.duplicate(auxCrv)
     pm.move(offDir.x*0.5, offDir.y*0.5, offDir.z*0.5, buildCrv1, r=1)
     buildCrv2 = pm.duplicate(auxCrv)
@@ -664,6 +775,24 @@ def buildJointChain(prefix, suffix, startPos, endPos, jointNum, orientJoint="xyz
     return jnts
 
 
+def buildJointChainAtPoints(prefix, suffix, positions, orientJoint="xyz", saoType="yup"):
+    """
+    Build a joint chain with one joint at each of the positions.
+    :param prefix: `string` prefix string in joint name
+    :param suffix: `string` suffix string in joint name
+    :param positions: `list` [[x,y,z], ...] ordered world positions of the joints
+    :param orientJoint: `string` orient joint flag
+    :param saoType: `string` secondary axis orient flag
+    :return: `list` list of joint nodes in the joint chain. sorted by hierarchy.
+    """
+    pm.select(d=1)
+    jnts = []
+    for i, pos in enumerate(positions):
+        jnts.append(pm.joint(p=tuple(pos), n="{0}_{1:0>2d}_{2}".format(prefix, i, suffix)))
+    pm.joint(jnts, e=True, oj=orientJoint, sao=saoType)
+    return jnts
+
+
 def duplicateJointChain(rootJoint, replace=None, suffix=None):
     """
     Duplicate the given joint chain.
@@ -700,34 +829,248 @@ def duplicateJointChain(rootJoint, replace=None, suffix=None):
 
 def buildJointChainFromCurve(curve, jointNum, prefix, suffix, rebuildCurve=False, orientJoint="xyz", saoType="yup"):
     """
-    Build joint chain along the curve.
+    Build joint chain along the curve, the joints are placed at equal arc lengths.
     :param curve: `PyNode` curve that defines the joint position
     :param jointNum: `int` number of joints in the chain
     :param prefix: `string` prefix string in joint name
     :param suffix: `string` suffix string in joint name
-    :param rebuildCurve: `bool` if true, rebuild the input curve to make sure the joints are evenly positioned,
-                        but can't guarantee the joints lands exacly on the input curve
+    :param rebuildCurve: `bool` if true, place the joints on a smooth rebuilt copy of the input curve,
+                        they can't be guaranteed to land exactly on the input curve
     :param orientJoint: `string` orient joint flag
     :param saoType: `string` secondary axis orient flag
     :return: `list` list of joint nodes in the joint chain. sorted by hierarchy.
     """
     if rebuildCurve:
         curve = pm.rebuildCurve(curve, rpo=0, end=1, kr=0, rt=0, d=7, ch=0, s=64)[0]
-    poci = pm.createNode("pointOnCurveInfo")
-    poci.turnOnPercentage.set(1)
-    curve.worldSpace[0].connect(poci.inputCurve)
+        points = getPointsAlongCurve(curve, jointNum)
+        pm.delete(curve)
+    else:
+        points = getPointsAlongCurve(curve, jointNum)
 
     joints = []
-    ratio = 1.0/(jointNum-1.0)
     pm.select(d=1)
-    for i in range(jointNum):
-        poci.parameter.set(ratio*i)
-        joint = pm.joint(n="{0}_{1:0>2d}_{2}".format(prefix, i, suffix), p=poci.position.get())
-        joints.append(joint)
-    pm.joint(joints, oj=orientJoint, sao=saoType)
+    for i, point in enumerate(points):
+        joints.append(pm.joint(n="{0}_{1:0>2d}_{2}".format(prefix, i, suffix), p=point))
+    pm.joint(joints, e=True, oj=orientJoint, sao=saoType)
+    return joints
+
+
+def buildJointChainFromPoints(prefix, suffix, positions, jointNum, orientJoint="xyz", saoType="yup"):
+    """
+    Build a joint chain along the linear curve through the positions, eg. the locators of a scaffold.
+    :param prefix: `string` prefix string in joint name
+    :param suffix: `string` suffix string in joint name
+    :param positions: `list` [[x,y,z], ...] ordered world positions the chain goes through
+    :param jointNum: number of joints in the joint chain
+    :param orientJoint: `string` orient joint flag
+    :param saoType: `string` secondary axis orient flag
+    :return: `list` list of joint nodes in the joint chain. sorted by hierarchy.
+    """
+    if len(positions) < 3:
+        return buildJointChain(prefix, suffix, positions[0], positions[-1], jointNum, orientJoint, saoType)
+    pathCrv = pm.curve(d=1, p=positions)
+    joints = buildJointChainFromCurve(pathCrv, jointNum, prefix, suffix, False, orientJoint, saoType)
+    pm.delete(pathCrv)
     return joints
 
 
+def getPointsAlongCurve(curve, pointNum):
+    """
+    World positions at equal arc lengths along the curve, from its start to its end.
+    :param curve: `PyNode` curve transform
+    :param pointNum: `int` number of points, at least 2
+    :return: `list` [[x,y,z], ...]
+    """
+    curveShape = curve.getShape()
+    length = curveShape.length()
+    points = []
+    for i in range(pointNum):
+        param = curveShape.findParamFromLength(length*i/(pointNum-1.0))
+        point = curveShape.getPointAtParam(param, space="world")
+        points.append([point.x, point.y, point.z])
+    return points
+
+
+def getPointsAtPercentages(curve, pointNum):
+    """
+    World positions at evenly spread parameters of the curve, where pointOnCurveInfo
+    nodes with turnOnPercentage put them.
+    :param curve: `PyNode` curve transform
+    :param pointNum: `int` number of points, at least 2
+    :return: `list` [[x,y,z], ...]
+    """
+    curveShape = curve.getShape()
+    minParam, maxParam = curveShape.getKnotDomain()
+    points = []
+    for i in range(pointNum):
+        point = curveShape.getPointAtParam(minParam + (maxParam-minParam)*i/(pointNum-1.0), space="world")
+        points.append([point.x, point.y, point.z])
+    return points
+
+
+def bakeCurveCache(follicle, filePath, startFrame, endFrame):
+    """
+    Simulate the output curve of a follicle frame by frame and write it to a curve cache file.
+    :param follicle: `PyNode` follicle transform or shape
+    :param filePath: `string` cache file path
+    :param startFrame: `int` first frame, usually the nucleus start frame
+    :param endFrame: `int` last frame
+    :return: `string` cache file path
+    """
+    if follicle.nodeType() != "follicle":
+        follicle = follicle.getShape()
+    plug = follicle.outCurve.__apimplug__()
+    currentFrame = pm.currentTime(q=1)
+    # the file is truncated by the writer, the dynCurveCache nodes must not hold it mapped
+    mayautils.closeCacheReader(filePath)
+    writer = None
+    try:
+        with mayautils.batchBuildContext():
+            for frame in range(int(startFrame), int(endFrame)+1):
+                pm.currentTime(frame, update=1)
+                fnCurve = om.MFnNurbsCurve(plug.asMObject())
+                cvs = om.MPointArray()
+                fnCurve.getCVs(cvs, om.MSpace.kObject)
+                if writer is None:
+                    knots = om.MDoubleArray()
+                    fnCurve.getKnots(knots)
+                    writer = curvecache.CurveCacheWriter(filePath, frame, cvs.length(), fnCurve.degree(),
+                                                         fnCurve.form(), [knots[i] for i in range(knots.length())])
+                writer.writeFrame([(cvs[i].x, cvs[i].y, cvs[i].z) for i in range(cvs.length())])
+    finally:
+        if writer:
+            writer.close()
+        pm.currentTime(currentFrame, update=1)
+    return filePath
+
+
+def bakeStrandPreview(follicles, filePaths, startFrame, endFrame, attractPlugs=None, workerNum=None,
+                      **simSettings):
+    """
+    Simulate the output curves of follicles with the NumPy strand simulator instead of nHair,
+    and write each of them to a curve cache file. The strands are partitioned by hair system
+    and simulated on a thread pool, see strandsim.streamPartitions(). The frames are streamed
+    from the scene to the cache files, so memory use doesn't grow with the frame range.
+    The throughput is printed.
+    :param follicles: `list` follicle transforms or shapes
+    :param filePaths: `list` cache file path of every follicle
+    :param startFrame: `int` first frame, the start curves are at rest on this frame
+    :param endFrame: `int` last frame
+    :param attractPlugs: `list` start curve attraction attr of every follicle read every frame,
+                         eg. the meta ctrl animationAttract, no attraction if None
+    :param workerNum: `int` number of simulation threads, cpu count if None
+    :param simSettings: strandsim.StrandBatch flags, eg. damping=0.1, substeps=4
+    :return: `list` cache file paths
+    """
+    import strandpipeline
+    import strandsim
+    follicles = [x if x.nodeType() == "follicle" else x.getShape() for x in follicles]
+    startCurves = [x.startPosition.inputs(plugs=1)[0].node() for x in follicles]
+    plugs = [x.worldSpace[0].__apimplug__() for x in startCurves]
+    simSettings.setdefault("fps", pm.mel.currentTimeUnitToFPS())
+
+    writers = []
+    for plug, filePath in zip(plugs, filePaths):
+        mayautils.closeCacheReader(filePath)
+        fnCurve = om.MFnNurbsCurve(plug.asMObject())
+        knots = om.MDoubleArray()
+        fnCurve.getKnots(knots)
+        writers.append(curvecache.CurveCacheWriter(filePath, startFrame, fnCurve.numCVs(), fnCurve.degree(),
+                                                   fnCurve.form(), [knots[i] for i in range(knots.length())]))
+
+    def readStartCurves():
+        for frame in range(int(startFrame), int(endFrame)+1):
+            pm.currentTime(frame, update=1)
+            frameCvs = []
+            for plug in plugs:
+                cvs = om.MPointArray()
+                om.MFnNurbsCurve(plug.asMObject()).getCVs(cvs, om.MSpace.kObject)
+                frameCvs.append([(cvs[i].x, cvs[i].y, cvs[i].z) for i in range(cvs.length())])
+            yield frameCvs
+
+    def readAttracts():
+        # pulled right after the start curves of the same frame
+        while True:
+            yield [x.get() for x in attractPlugs]
+
+    # the scene is read on this thread, so the frames are not buffered
+    keys = [(pm.listConnections(x.outHair, type="hairSystem") or [x])[0].name() for x in follicles]
+    stats = {}
+    currentFrame = pm.currentTime(q=1)
+    try:
+        with mayautils.batchBuildContext():
+            frames = strandsim.streamPartitions(readStartCurves(), keys, readAttracts() if attractPlugs else None,
+                                                workerNum, **simSettings)
+            frames = strandpipeline.writeCaches(frames, writers)
+            strandpipeline.drain(strandpipeline.collectStats(frames, stats))
+    finally:
+        for writer in writers:
+            writer.close()
+        pm.currentTime(currentFrame, update=1)
+    print(strandsim.formatStats(stats))
+    return list(filePaths)
+
+
+def attachCurveCache(follicle, filePath, name=None):
+    """
+    Feed the output curve of a follicle from a curve cache file instead of the simulation.
+    :param follicle: `PyNode` follicle transform or shape
+    :param filePath: `string` cache file path
+    :param name: `string` cache node name
+    :return: `PyNode` dynCurveCache node
+    """
+    if follicle.nodeType() != "follicle":
+        follicle = follicle.getShape()
+    mayautils.loadNodePlugin()
+    cache = pm.createNode("dynCurveCache", n=name or "{0}_cache".format(follicle.getParent().name()))
+    cache.cacheFile.set(filePath, type="string")
+    pm.addAttr(cache, ln="follicle", at="message")
+    follicle.message.connect(cache.follicle)
+    pm.PyNode("time1").outTime.connect(cache.time)
+    for dst in follicle.outCurve.outputs(plugs=1):
+        cache.outCurve.connect(dst, f=1)
+    return cache
+
+
+def detachCurveCache(cache):
+    """
+    Give the output curve back to the simulation and delete the cache node.
+    :param cache: `PyNode` dynCurveCache node
+    :return: `PyNode` follicle shape
+    """
+    follicle = cache.follicle.inputs()[0]
+    filePath = cache.cacheFile.get()
+    for dst in cache.outCurve.outputs(plugs=1):
+        follicle.outCurve.connect(dst, f=1)
+    pm.delete(cache)
+    # other cache nodes reading the same file open it again on their next evaluation
+    mayautils.closeCacheReader(filePath)
+    return follicle
+
+
+def deleteSystem(topGrp):
+    """
+    Delete a rig subsystem: its hierarchy and the utility nodes that only hang off it.
+    Utility nodes are collected through their connections without crossing other dag
+    nodes, so ctrls and joints outside the system and the nodes behind them are kept.
+    :param topGrp: `PyNode` top node of the system hierarchy
+    :return:
+    """
+    keepTypes = ["time", "shadingEngine", "dagPose", "nucleus"]
+    dagNodes = [topGrp] + (pm.listRelatives(topGrp, ad=1) or [])
+    dgNodes = set()
+    stack = pm.listConnections(dagNodes, skipConversionNodes=False) or []
+    while stack:
+        node = stack.pop()
+        if node in dgNodes or isinstance(node, pm.nt.DagNode):
+            continue
+        if node.nodeType() in keepTypes or node.isDefaultNode():
+            continue
+        dgNodes.add(node)
+        stack.extend(pm.listConnections(node, skipConversionNodes=False) or [])
+    pm.delete([topGrp]+list(dgNodes))
+
+
 def getJointsInChain(rootJoint):
     """
     get all the joints in the joint chain. sorted by hierarchy.
@@ -770,6 +1113,126 @@ def makeCurveDynamic(inputCurve, hairSys=None):
     outCurve = follicle.outCurve.connections()[0]
     return {"outCurve": outCurve, "follicle": follicle, "hairSystem":hairSys.getParent(), "nucleus":nucleus}
 
+
+def driveFollicleOverrides(follicle, attractPlug=None, switchPlug=None, prefix=None):
+    """
+    Drive the dynamic overrides of a follicle instead of its hair system and nucleus,
+    for follicles on a hair system shared with other rigs.
+    :param follicle: `PyNode` follicle transform or shape
+    :param attractPlug: `Attribute` drives the follicle startCurveAttract, eg. the meta ctrl animationAttract
+    :param switchPlug: `Attribute` turns the follicle simulation on and off, eg. the meta ctrl dynamicSwitch
+    :param prefix: `string` prefix of the created nodes, the follicle name if None
+    :return:
+    """
+    if follicle.nodeType() != "follicle":
+        follicle = follicle.getShape()
+    prefix = prefix or follicle.getParent().name()
+    follicle.overrideDynamics.set(1)
+    if attractPlug is not None:
+        attractPlug.connect(follicle.startCurveAttract, f=1)
+    if switchPlug is not None:
+        # simulationMethod 0: off, 2: dynamic
+        dynSimMult = mayautils.createNode("multDoubleLinear", "{0}_dynSwitch_mult".format(prefix))
+        mayautils.connectAttr(switchPlug, dynSimMult.input1)
+        dynSimMult.input2.set(2)
+        mayautils.connectAttr(dynSimMult.output, follicle.simulationMethod)
+
+
+def moveFollicles(srcHairSys, dstHairSys, deleteSource=True):
+    """
+    Move all follicles of a hair system to another hair system. Follicles without dynamic
+    overrides were driven through their own hair system and nucleus (eg. by a rig meta ctrl),
+    the drivers of its startCurveAttract and nucleus enable are moved to the follicle overrides.
+    :param srcHairSys: `PyNode` hair system shape or transform the follicles are taken from
+    :param dstHairSys: `PyNode` hair system shape or transform the follicles are assigned to
+    :param deleteSource: `bool` delete the source hair system, and its nucleus if nothing else uses it
+    :return: `list` moved follicle shapes
+    """
+    if srcHairSys.nodeType() != "hairSystem":
+        srcHairSys = srcHairSys.getShape()
+    if dstHairSys.nodeType() != "hairSystem":
+        dstHairSys = dstHairSys.getShape()
+    nucleus = srcHairSys.currentState.connections()
+    attractPlug = (srcHairSys.startCurveAttract.inputs(plugs=True) or [None])[0]
+    switchPlug = (nucleus[0].enable.inputs(plugs=True) or [None])[0] if nucleus else None
+
+    follicles = []
+    for follicle in pm.listConnections(srcHairSys.outputHair, type="follicle", shapes=True) or []:
+        if follicle in follicles:
+            continue
+        follicles.append(follicle)
+        pm.disconnectAttr(follicle.outHair, follicle.outHair.outputs(plugs=True)[0])
+        pm.connectAttr(follicle.outHair, dstHairSys.inputHair, na=True)
+        index = follicle.outHair.outputs(plugs=True)[0].index()
+        pm.connectAttr(dstHairSys.outputHair[index], follicle.currentPosition, f=True)
+        if not follicle.overrideDynamics.get() and (attractPlug is not None or switchPlug is not None):
+            folName = follicle.getParent().name()
+            prefix = folName[:-len("_dyn_fol")] if folName.endswith("_dyn_fol") else folName
+            driveFollicleOverrides(follicle, attractPlug, switchPlug, prefix)
+
+    if deleteSource:
+        pm.delete(srcHairSys.getParent())
+        if nucleus and not pm.listConnections(nucleus[0].outputObjects, type="hairSystem"):
+            pm.delete(nucleus[0])
+    return follicles
+
+
+HAIR_POOL_TAG = "dynRigPool"
+HAIR_POOL_NUCLEUS = "dynRigPool_nucleus"
+HAIR_POOL_GRP = "dynRigPool_grp"
+
+
+def listPoolHairSystems():
+    """
+    All pooled hair systems, found under the pool groups of the scene and of its namespaces
+    instead of a scan over every node of the scene.
+    :return: `list` hair system shapes tagged with their pool
+    """
+    namespaces = pm.namespaceInfo(":", listOnlyNamespaces=True, recurse=True) or []
+    poolGrps = [HAIR_POOL_GRP] + ["{0}:{1}".format(x, HAIR_POOL_GRP) for x in namespaces]
+    hairSystems = []
+    for poolGrp in poolGrps:
+        if pm.objExists(poolGrp):
+            hairSystems += [x for x in pm.listRelatives(poolGrp, ad=1, type="hairSystem") or []
+                            if pm.attributeQuery(HAIR_POOL_TAG, node=x, exists=1)]
+    return hairSystems
+
+
+def getPooledHairSystem(poolKey, poolSize=1):
+    """
+    Get the hair system of a pool the next follicle should be assigned to.
+    Every pool holds at most poolSize hair systems, all pools share one nucleus.
+    A new hair system is created until the pool is full, after that the hair system
+    with the fewest follicles is returned.
+    :param poolKey: `string` pool name, eg. a region of the asset like "scalpBack"
+    :param poolSize: `int` maximum number of hair systems in the pool
+    :return: `PyNode` hair system shape
+    """
+    hairSystems = [x for x in listPoolHairSystems() if x.attr(HAIR_POOL_TAG).get() == poolKey]
+    if len(hairSystems) >= max(poolSize, 1):
+        follicleNums = [len(set(pm.listConnections(x.outputHair, type="follicle", shapes=True) or []))
+                        for x in hairSystems]
+        return hairSystems[follicleNums.index(min(follicleNums))]
+
+    if pm.objExists(HAIR_POOL_GRP):
+        poolGrp = pm.PyNode(HAIR_POOL_GRP)
+    else:
+        poolGrp = pm.createNode("transform", n=HAIR_POOL_GRP)
+    hairSys = pm.createNode("hairSystem")
+    pm.select(hairSys, r=1)
+    if pm.objExists(HAIR_POOL_NUCLEUS):
+        pm.mel.assignNSolver(HAIR_POOL_NUCLEUS)
+    else:
+        pm.mel.assignNSolver("")
+        nucleus = hairSys.currentState.connections()[0]
+        nucleus.rename(HAIR_POOL_NUCLEUS)
+        nucleus.setParent(poolGrp)
+    hairSys.getParent().rename("{0}_{1}_{2:0>2d}_hairSystem".format(HAIR_POOL_TAG, poolKey, len(hairSystems)))
+    hairSys.getParent().setParent(poolGrp)
+    mayautils.addAttributes(hairSys, [{"ln":HAIR_POOL_TAG, "dt":"string"}])
+    hairSys.attr(HAIR_POOL_TAG).set(poolKey)
+    return hairSys
+
 #
 # def makeCurveDynamic(inputCurve, outputCurve, hairSys=None):
 #     """
@@ -2,8 +2,9 @@ __author__ = 'wuxiaoyu'
 
 import pymel.core as pm
 import mayautils
+import registry
 
-map(reload, [mayautils])
+map(reload, [mayautils, registry])
 
 SCAFFOLD_TOP_TAG = "scaffoldTop"
 SCAFFOLD_META_PIV_TAG = "metaPiv"
@@ -12,16 +13,45 @@ SCAFFOLD_END_LOC_COLOR = 6
 SCAFFOLD_PIV_COLOR = 17
 
 
-def buildScaffoldChain(prefix, scaffoldChainDict):
+def scaffoldLocNames(locNum):
+    """
+    Names of the locators of a chain, "start", "01", "02", ..., "end".
+    :param locNum: `int` number of locators, at least 2
+    :return: `list` locator names
+    """
+    return ["start"] + ["{0:0>2d}".format(i) for i in range(1, locNum-1)] + ["end"]
+
+
+def getChainItems(scaffoldChain):
+    """
+    Ordered (locator name, position) pairs of a scaffold chain definition.
+    :param scaffoldChain: `list` ordered positions or (name, position) pairs, or `dict` name: position
+    :return: `list` [(name, [x, y, z]), ...]
+    """
+    if isinstance(scaffoldChain, dict):
+        return [(x, list(scaffoldChain[x])) for x in scaffoldChain]
+    if all(len(x) == 2 for x in scaffoldChain):
+        return [(name, list(pos)) for name, pos in scaffoldChain]
+    return list(zip(scaffoldLocNames(len(scaffoldChain)), [list(x) for x in scaffoldChain]))
+
+
+def buildScaffoldChain(prefix, scaffoldChain, upAxisSolver=0):
     """
     Build a basic scaffold chain
     :param prefix: `string` scaffold chain prefix. eg."tail"
-    :param scaffoldChainDict:`dict`
-        dictionary that defines the chain structure.
-        chain locator prefix: chain locator world position
-        example: {"base": [0,0,0], "end":[3,-6,7]}
+    :param scaffoldChain:`list`
+        ordered world positions of the chain locators, named by scaffoldLocNames(),
+        or ordered (chain locator prefix, position) pairs.
+        example: [[0,0,0], [1,-3,4], [3,-6,7]] or [("base", [0,0,0]), ("end", [3,-6,7])]
+        a `dict` chain locator prefix: position is read in its key order
+    :param upAxisSolver: `int` how the upAxis of the locators drives their aim up vector,
+                         0: three set driven key curves per locator, 1: one dynUpAxis node for all locators,
+                         loads the dynrignodes plugin, the scene then needs it wherever it is opened
     :return: `PyNode` scaffold chain top group
     """
+    chainItems = getChainItems(scaffoldChain)
+    positions = [x[1] for x in chainItems]
+
     # create scaffold top node
     scaffoldTop = pm.createNode("transform", n="{0}_scaffold_grp".format(prefix))
     mayautils.disableChannels(scaffoldTop, "trs", "lh")
@@ -33,7 +63,7 @@ def buildScaffoldChain(prefix, scaffoldChainDict):
         {"ln":"scaffoldType", "dt":"string"}
     ]
     mayautils.addAttributes(scaffoldTop, scaffAttrs)
-    pm.setAttr("{0}.{1}".format(scaffoldTop.name(), SCAFFOLD_TOP_TAG), prefix)
+    registry.registerTop("scaffold", prefix, scaffoldTop)
 
     # create group hierarchy
     jntGrp = pm.createNode("transform", n="{0}_scaffold_jnt_grp".format(prefix))
@@ -48,29 +78,28 @@ def buildScaffoldChain(prefix, scaffoldChainDict):
     # create meta pivot ctrl
     # metaPiv = pm.spaceLocator(n="{0}_scaffold_piv".format(prefix))
     metaPiv = mayautils.createCtrl("{0}_scaffold_piv".format(prefix), "locator", 1.5, SCAFFOLD_PIV_COLOR)
-    pm.xform(metaPiv, t=scaffoldChainDict.values()[0], ws=1)
+    pm.xform(metaPiv, t=positions[0], ws=1)
     metaPiv.setParent(scaffoldTop)
     pm.connectAttr(metaPiv.message,
                    "{0}.{1}".format(scaffoldTop.name(), SCAFFOLD_META_PIV_TAG))
 
-    # create scaffold joints and ctrls
-    scaffLocators = []
-    for i, locName in enumerate(scaffoldChainDict):
-        locPos = scaffoldChainDict[locName]
-
-        # create joints
-        locJnt = pm.joint(n="{0}_{1}_scaffold_jnt".format(prefix, locName), p=locPos)
+    # create loc ctrls, the shape is built once and duplicated for the inbetween locators
+    locNames = ["{0}_{1}_scaffold_loc".format(prefix, x[0]) for x in chainItems]
+    scaffLocators = [mayautils.createCtrl(locNames[0], "hollowSphere", 0.5, SCAFFOLD_LOC_COLOR)]
+    scaffLocators += [pm.duplicate(scaffLocators[0], n=x)[0] for x in locNames[1:-1]]
+    scaffLocators.append(mayautils.createCtrl(locNames[-1], "hollowSphere", 0.5, SCAFFOLD_END_LOC_COLOR))
+
+    # create scaffold joints and place the ctrls
+    locCtrlOffs = []
+    for i, (locName, locPos) in enumerate(chainItems):
+        locJnt = pm.createNode("joint", n="{0}_{1}_scaffold_jnt".format(prefix, locName), p=jntGrp)
+        locJnt.translate.set(locPos)
         locJnt.v.set(0)
-        locJnt.setParent(jntGrp)
-
-        # create loc ctrls
-        ctrlColor = SCAFFOLD_LOC_COLOR if i<len(scaffoldChainDict)-1 else SCAFFOLD_END_LOC_COLOR
-        locCtrl = mayautils.createCtrl("{0}_{1}_scaffold_loc".format(prefix, locName), "hollowSphere", 0.5, ctrlColor)
-        mayautils.matchObject(locJnt, locCtrl, "t")
-        locCtrlOff = mayautils.createParentTransform("off", locCtrl)
-        locCtrlOff.setParent(locGrp)
+
+        locCtrl = scaffLocators[i]
+        locCtrl.translate.set(locPos)
+        locCtrlOffs.append(mayautils.createParentTransform("off", locCtrl))
         pm.pointConstraint(locCtrl, locJnt, n=locJnt.name()+"_pnt", mo=0)
-        scaffLocators.append(locCtrl)
         locCtrl.message.connect(scaffoldTop.locators[i])
 
         # connect with scaffold top
@@ -80,11 +109,15 @@ def buildScaffoldChain(prefix, scaffoldChainDict):
         mayautils.disableChannels(locCtrl, "rsv")
 
         # # create pivot ctrls
-        # if i < len(scaffoldChainDict) - 1:
+        # if i < len(chainItems) - 1:
         #     locPiv = mayautils.createCtrl("{0}_{1}_scaffold_piv".format(prefix, locName), "locator", 1.0, SCAFFOLD_PIV_COLOR, locJnt) #pm.createNode("locator", n="{0}_{1}_scaffold_piv".format(prefix, locName))
         #     locPiv.setParent(pivGrp)
+    pm.parent(locCtrlOffs, locGrp)
 
     # build secondary axis controls
+    if upAxisSolver:
+        mayautils.loadNodePlugin()
+        upAxisNode = pm.createNode("dynUpAxis", n="{0}_scaffold_upAxis".format(prefix))
     for i in range(len(scaffLocators)-1):
         locName = scaffLocators[i].name()
         followOff = pm.createNode("transform", n=locName+"_follow_off", p=scaffLocators[i])
@@ -99,17 +132,21 @@ def buildScaffoldChain(prefix, scaffoldChainDict):
         mayautils.addAttributes(scaffLocators[i], locAttrs)
         scaffLocators[i].upAxisOffset.connect(orientOff.rotateX)
         followOffAim = pm.aimConstraint(scaffLocators[i+1], followOff, n=followOff.name()+"_aim", mo=0)
-        for dvValue, drvnKey in enumerate([(0,1,0), (0,-1,0), (0,0,1), (0,0,-1)]):
-            pm.setDrivenKeyframe(followOffAim.upVectorX, dv=dvValue, v=drvnKey[0], cd=scaffLocators[i].upAxis)
-            pm.setDrivenKeyframe(followOffAim.upVectorY, dv=dvValue, v=drvnKey[1], cd=scaffLocators[i].upAxis)
-            pm.setDrivenKeyframe(followOffAim.upVectorZ, dv=dvValue, v=drvnKey[2], cd=scaffLocators[i].upAxis)
+        if upAxisSolver:
+            scaffLocators[i].upAxis.connect(upAxisNode.upAxis[i])
+            upAxisNode.upVector[i].connect(followOffAim.upVector)
+        else:
+            for dvValue, drvnKey in enumerate([(0,1,0), (0,-1,0), (0,0,1), (0,0,-1)]):
+                pm.setDrivenKeyframe(followOffAim.upVectorX, dv=dvValue, v=drvnKey[0], cd=scaffLocators[i].upAxis)
+                pm.setDrivenKeyframe(followOffAim.upVectorY, dv=dvValue, v=drvnKey[1], cd=scaffLocators[i].upAxis)
+                pm.setDrivenKeyframe(followOffAim.upVectorZ, dv=dvValue, v=drvnKey[2], cd=scaffLocators[i].upAxis)
 
         pm.addAttr(scaffLocators[i], ln="upAxisObject", at="message")
         upVectorOff.message.connect(scaffLocators[i].upAxisObject)
 
 
     # create reference curve connecting locators
-    crv = pm.curve(n="{0}_scaffold_crv".format(prefix), d=1, p=[scaffoldChainDict[x] for x in scaffoldChainDict])
+    crv = pm.curve(n="{0}_scaffold_crv".format(prefix), d=1, p=positions)
     crv.setParent(crvGrp)
     pm.skinCluster(jntGrp.getChildren(),crv)
 
@@ -122,7 +159,11 @@ def getScaffoldLocs(scaffoldTop):
     return scaffoldTop.locators.get()
 
 def getScaffoldTop(prefix):
-    return pm.ls("{0}*.{1}".format(prefix, SCAFFOLD_TOP_TAG), o=1)
+    scaffoldTop = registry.getTop("scaffold", prefix)
+    return [scaffoldTop] if scaffoldTop else []
+
+def listScaffoldTops():
+    return registry.listTops("scaffold")
 
 def doesScaffoldExist(prefix):
     return True if getScaffoldTop(prefix) else False
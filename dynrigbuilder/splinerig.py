@@ -1,29 +1,53 @@
 __author__ = 'wuxiaoyu'
 
+import hashlib
+import json
+import os
 import pymel.core as pm
+import buildplan
 import mayautils
+import registry
 import rigutils
 import scaffold
 
-map(reload, [mayautils, scaffold, rigutils])
+map(reload, [buildplan, mayautils, registry, scaffold, rigutils])
 
 class SplineRig(object):
 
     scaffoldType = "spline"
-    scaffoldChain = {"start":[0,15,0], "end":[0,0,0]}
+    # default scaffold locator positions, from the start to the end of the chain
+    scaffoldChain = [[0,15,0], [0,0,0]]
     rigAttrs = [
         {"ln":"jointNum", "at": "long", "dv":20, "min":2},
         {"ln":"hasFK", "at": "bool", "dv":True},
         {"ln":"fkType", "at": "long", "dv":0, "min":0, "max":1},
         {"ln":"fkCtrlNum", "at": "long", "dv":5, "min":1},
+        {"ln":"fkSolver", "at": "long", "dv":0, "min":0, "max":1},
         {"ln":"hasIK", "at": "bool", "dv":True},
+        {"ln":"ikSolver", "at": "long", "dv":0, "min":0, "max":1},
         {"ln":"masterCtrlNum", "at": "long", "dv":5, "min":3},
         {"ln":"ibtSubCtrlNum", "at": "long", "dv":1, "min":0},
         {"ln":"preserveVolume", "at": "bool", "dv":True},
         {"ln":"preserveLength", "at": "bool", "dv":True},
-        {"ln":"hasDynamic", "at": "bool", "dv":True}
+        {"ln":"lengthSolver", "at": "long", "dv":0, "min":0, "max":1},
+        {"ln":"blendSolver", "at": "long", "dv":0, "min":0, "max":1},
+        {"ln":"hasDynamic", "at": "bool", "dv":True},
+        {"ln":"hairPoolSize", "at": "long", "dv":0, "min":0}
     ]
     RIG_TOP_TAG = "rigTop"
+    # hair pool of the rig, stored on the scaffold and the rig top so rebuilds keep it
+    HAIR_POOL_ATTR = {"ln":"hairPool", "dt":"string"}
+    # steps yielded by iterBuildRig, in build order
+    BUILD_STEPS = ["baseCtrl", "baseJnt", "ik", "fk", "ikfkBlend", "dynamic", "finalize"]
+    # rig attrs each subsystem is built from, on top of the chain positions
+    SUBSYSTEM_ATTRS = {
+        "base": ["jointNum"],
+        "ik": ["jointNum", "hasIK", "ikSolver", "masterCtrlNum", "ibtSubCtrlNum", "preserveVolume", "preserveLength",
+               "lengthSolver"],
+        "fk": ["jointNum", "hasFK", "fkType", "fkCtrlNum", "fkSolver"],
+        "ikfkBlend": ["jointNum", "blendSolver"],
+        "dynamic": ["jointNum", "hasDynamic", "hairPoolSize"],
+    }
 
     def __init__(self, prefix):
         super(SplineRig, self).__init__()
@@ -31,21 +55,61 @@ class SplineRig(object):
 
         for attr in self.rigAttrs:
             setattr(self, attr["ln"], attr["dv"])
-        self.startPos = self.scaffoldChain["start"]
-        self.endPos = self.scaffoldChain["end"]
+        self.startPos = self.scaffoldChain[0]
+        self.endPos = self.scaffoldChain[-1]
+        # positions of the inbetween scaffold locators, the chain is straight without them
+        self.midPositions = [list(x) for x in self.scaffoldChain[1:-1]]
         self.metaPos = self.startPos
+        # hair pool the dynamic curve is assigned to when hairPoolSize > 0
+        self.hairPool = "default"
+        # hair pool given to the build, wins over the one stored on the scaffold or the rig
+        self._hairPoolArg = None
 
     def _getAttrFromScaffold(self, scaffoldTop):
         if scaffold.getScaffoldType(scaffoldTop) != "spline":
             return
         for attr in self.rigAttrs:
+            # scaffolds built by older versions may miss newer rig attrs
+            if not pm.attributeQuery(attr["ln"], node=scaffoldTop, exists=1):
+                continue
             setattr(self, attr["ln"], pm.getAttr("{0}.{1}".format(scaffoldTop,
                                                                   attr["ln"])))
         scaffLocs = scaffold.getScaffoldLocs(scaffoldTop)
         self.startPos = scaffold.getLocPosition(scaffLocs[0])
         self.endPos = scaffold.getLocPosition(scaffLocs[-1])
+        self.midPositions = [scaffold.getLocPosition(x) for x in scaffLocs[1:-1]]
         self.metaPos = scaffold.getMetaPivotPosition(scaffoldTop)
 
+    def _resolveHairPool(self, scaffoldTop=None, rigTop=None):
+        """
+        Pick the hair pool of the build: the one given to the build, else the one stored
+        on the scaffold, else the one stored on the existing rig top, else self.hairPool.
+        A given hair pool is stored on the scaffold, so the next build from the UI keeps it.
+        :param scaffoldTop: `PyNode` scaffold top node
+        :param rigTop: `PyNode` rig top node of an existing rig
+        :return:
+        """
+        if self._hairPoolArg:
+            self.hairPool = self._hairPoolArg
+            if scaffoldTop:
+                mayautils.addAttributes(scaffoldTop, self.HAIR_POOL_ATTR)
+                pm.setAttr("{0}.{1}".format(scaffoldTop.name(), self.HAIR_POOL_ATTR["ln"]), self.hairPool)
+            return
+        for node in [scaffoldTop, rigTop]:
+            if node and pm.attributeQuery(self.HAIR_POOL_ATTR["ln"], node=node, exists=1):
+                hairPool = pm.getAttr("{0}.{1}".format(node.name(), self.HAIR_POOL_ATTR["ln"]))
+                if hairPool:
+                    self.hairPool = hairPool
+                    return
+
+    def _storeBuildInputs(self, hashes):
+        mayautils.addAttributes(self.globalCtrl, [{"ln":"buildHash", "dt":"string"}, self.HAIR_POOL_ATTR])
+        self.globalCtrl.buildHash.set(json.dumps(hashes, sort_keys=True))
+        pm.setAttr("{0}.{1}".format(self.globalCtrl.name(), self.HAIR_POOL_ATTR["ln"]), self.hairPool)
+
+    def _getChainPositions(self):
+        return [self.startPos] + list(self.midPositions) + [self.endPos]
+
     def _cleanUp(self):
         pass
 
@@ -54,9 +118,12 @@ class SplineRig(object):
         self.globalCtrl = mayautils.createCtrl("{0}_all_ctrl".format(self.prefix), "crossArrow", 1, "yellow")
         globalCtrlAttr = [
             {"ln":"globalScale", "at":"float", "dv":1, "k":1},
-            {"ln":self.RIG_TOP_TAG, "dt":"string"}
+            {"ln":self.RIG_TOP_TAG, "dt":"string"},
+            {"ln":"buildHash", "dt":"string"},
+            self.HAIR_POOL_ATTR
         ]
         mayautils.addAttributes(self.globalCtrl, globalCtrlAttr)
+        registry.registerTop("rig", self.prefix, self.globalCtrl)
 
         # create meta ctrl
         self.metaCtrl = mayautils.createCtrl("{0}_meta_ctrl".format(self.prefix), "fatCross", 1, "yellow", None, [0,0,90])
@@ -70,27 +137,218 @@ class SplineRig(object):
             pm.setAttr("{0}.s{1}".format(self.metaCtrl.name(), ch), cb=0, keyable=0, lock=1)
             pm.setAttr("{0}.s{1}".format(self.globalCtrl.name(), ch), cb=0, keyable=0, lock=1)
 
-    def buildRig(self, scaffoldTop, hairSystem=None):
+    def buildRig(self, scaffoldTop, hairSystem=None, backend="pymel", plan=None, hairPool=None):
+        """
+        Build the rig from the scaffold.
+        :param scaffoldTop: `PyNode` scaffold top node, use the class defaults if None
+        :param hairSystem: `PyNode` hair system to assign the dynamic curve to
+        :param backend: `string` "pymel" creates every node right away,
+                        "modifier" records the utility node networks and commits
+                        them with batched OpenMaya modifiers after each subsystem
+        :param plan: `BuildPlan` record into this plan instead, eg. a dryrun.DryRunPlan
+        :param hairPool: `string` hair pool the dynamic curve is assigned to when no hair system
+                         is given and the hairPoolSize rig attr is above 0, the hair pool stored
+                         on the scaffold or the rig if None, see _resolveHairPool()
+        :return:
+        """
+        self._hairPoolArg = hairPool
+        self._runBuild(self._buildRig, backend, plan, scaffoldTop, hairSystem)
+
+    def rebuildRig(self, scaffoldTop, hairSystem=None, backend="pymel", plan=None, hairPool=None):
+        """
+        Update an existing rig, only the subsystems whose inputs changed since the last
+        build are torn down and built again. The whole rig is rebuilt when the base
+        inputs (positions, joint number) changed or the rig has no build hashes.
+        :param scaffoldTop: `PyNode` scaffold top node, use the class defaults if None
+        :param hairSystem: `PyNode` hair system to assign the dynamic curve to
+        :param backend: `string` see buildRig()
+        :param plan: `BuildPlan` see buildRig()
+        :param hairPool: `string` see buildRig()
+        :return: `list` names of the rebuilt subsystems
+        """
+        self._hairPoolArg = hairPool
+        return self._runBuild(self._rebuildRig, backend, plan, scaffoldTop, hairSystem)
+
+    def iterBuildRig(self, scaffoldTop, hairSystem=None, backend="pymel", plan=None, hairPool=None):
+        """
+        Build the rig from the scaffold one step at a time, eg. in time slices from the UI.
+        Same result as buildRig(), the build plan is only active while a step runs.
+        :param scaffoldTop: `PyNode` scaffold top node, use the class defaults if None
+        :param hairSystem: `PyNode` hair system to assign the dynamic curve to
+        :param backend: `string` "pymel" only, the steps run inside an undo chunk of the UI and the
+                        modifier operations of the "modifier" backend are not on the undo queue
+        :param plan: `BuildPlan` see buildRig()
+        :param hairPool: `string` see buildRig()
+        :return: `generator` yields the name of every built step, see BUILD_STEPS
+        """
+        if backend == "modifier":
+            raise ValueError("iterBuildRig() can not be undone with the modifier backend, use buildRig().")
+        self._hairPoolArg = hairPool
+        steps = self._iterBuildSteps(scaffoldTop, hairSystem)
+        while True:
+            previousPlan = mayautils.setBuildPlan(plan)
+            try:
+                step = next(steps, None)
+            finally:
+                mayautils.flushBuildPlan()
+                mayautils.setBuildPlan(previousPlan)
+            if step is None:
+                return
+            yield step
+
+    def _runBuild(self, buildFunc, backend, plan, *args):
+        if plan is None and backend == "modifier":
+            plan = buildplan.BuildPlan()
+        previousPlan = mayautils.setBuildPlan(plan)
+        try:
+            return buildFunc(*args)
+        finally:
+            mayautils.flushBuildPlan()
+            mayautils.setBuildPlan(previousPlan)
+
+    def _subsystemHashes(self, hairSystem=None):
+        """
+        Hash the inputs of every subsystem.
+        :param hairSystem: `PyNode` hair system the dynamic curve is assigned to
+        :return: `dict` subsystem name: input hash
+        """
+        baseInputs = {
+            "startPos": [round(x, 5) for x in self.startPos],
+            "endPos": [round(x, 5) for x in self.endPos],
+            "metaPos": [round(x, 5) for x in self.metaPos],
+        }
+        if self.midPositions:
+            baseInputs["midPositions"] = [[round(x, 5) for x in pos] for pos in self.midPositions]
+        hashes = {}
+        for name, attrNames in self.SUBSYSTEM_ATTRS.items():
+            inputs = {"base": baseInputs}
+            for attrName in attrNames:
+                inputs[attrName] = getattr(self, attrName)
+            if name == "dynamic":
+                inputs["hairSystem"] = hairSystem.name() if hairSystem else None
+                inputs["hairPool"] = self.hairPool if self.hairPoolSize else None
+            hashes[name] = hashlib.md5(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+        return hashes
+
+    def _buildRig(self, scaffoldTop, hairSystem=None):
+        for _ in self._iterBuildSteps(scaffoldTop, hairSystem):
+            pass
+
+    def _iterBuildSteps(self, scaffoldTop, hairSystem=None):
         if scaffoldTop:
             self._getAttrFromScaffold(scaffoldTop)
+        self._resolveHairPool(scaffoldTop)
 
         # build base ctrls
+        mayautils.setBuildSubsystem("baseCtrl")
         self._buildBaseCtrls()
+        yield "baseCtrl"
 
         # build base joints
-        baseJnts = rigutils.buildJointChain(self.prefix,"base_jnt",self.startPos,self.endPos,self.jointNum)
+        mayautils.setBuildSubsystem("baseJnt")
+        baseJnts = rigutils.buildJointChainFromPoints(self.prefix, "base_jnt", self._getChainPositions(), self.jointNum)
         baseJntGrp = pm.group(baseJnts[0], n="{0}_base_grp".format(self.prefix))
         baseJntGrp.setParent(self.metaCtrl)
+        pm.dagPose(baseJnts, save=1, bindPose=0, n="{0}_base_restPose".format(self.prefix))
+        yield "baseJnt"
 
         # build ik/fk systems
         ikTop = None
         if self.hasIK:
+            mayautils.setBuildSubsystem("ik")
             ikTop = self._buildIKSystem()
+            mayautils.flushBuildPlan()
+        yield "ik"
 
         fkTop = None
         if self.hasFK:
+            mayautils.setBuildSubsystem("fk")
             fkTop = self._buildVariableFKSystem(baseJnts)
+            mayautils.flushBuildPlan()
+        yield "fk"
+
+        mayautils.setBuildSubsystem("ikfkBlend")
+        self._buildBlend(ikTop, fkTop, baseJnts)
+
+        # the dynamic curve is built on the blended base joints
+        mayautils.flushBuildPlan()
+        yield "ikfkBlend"
+
+        dynTop = None
+        # build dynamic system
+        if self.hasDynamic:
+            mayautils.setBuildSubsystem("dynamic")
+            dynTop = self._buildDynamic(baseJnts, hairSystem)
+        yield "dynamic"
+
+        # mark influence joints
+        mayautils.setBuildSubsystem("finalize")
+        self._markInfluenceJoints(baseJnts, dynTop)
+        self._storeBuildInputs(self._subsystemHashes(hairSystem))
+        yield "finalize"
+
+    def _rebuildRig(self, scaffoldTop, hairSystem=None):
+        if scaffoldTop:
+            self._getAttrFromScaffold(scaffoldTop)
 
+        rigTop = self.rigExists(self.prefix)
+        self._resolveHairPool(scaffoldTop, rigTop[0] if rigTop else None)
+        oldHashes = {}
+        if rigTop and pm.attributeQuery("buildHash", node=rigTop[0], exists=1) and rigTop[0].buildHash.get():
+            oldHashes = json.loads(rigTop[0].buildHash.get())
+        newHashes = self._subsystemHashes(hairSystem)
+        if not oldHashes or oldHashes.get("base") != newHashes["base"]:
+            if rigTop:
+                self.deleteRig(rigTop)
+            self._buildRig(None, hairSystem)
+            return list(self.SUBSYSTEM_ATTRS.keys())
+
+        changed = [x for x in self.SUBSYSTEM_ATTRS if oldHashes.get(x) != newHashes[x]]
+        if not changed:
+            return changed
+
+        self.globalCtrl = rigTop[0]
+        self.metaCtrl = pm.PyNode("{0}_meta_ctrl".format(self.prefix))
+        baseJntGrp = pm.PyNode("{0}_base_grp".format(self.prefix))
+        baseJnts = rigutils.getJointsInChain(pm.listRelatives(baseJntGrp, c=1, typ="joint")[0])
+        tops = {}
+        for name, suffix in [("ik", "ik_grp"), ("fk", "fk_grp"), ("dynamic", "dyn_grp")]:
+            topName = "{0}_{1}".format(self.prefix, suffix)
+            tops[name] = pm.PyNode(topName) if pm.objExists(topName) else None
+
+        # ik and fk both drive the base joints through the blend
+        if "ik" in changed or "fk" in changed or "ikfkBlend" in changed:
+            mayautils.setBuildSubsystem("ikfkBlend")
+            self._removeBlend(baseJnts)
+            for name, hasSystem, buildFunc in [("ik", self.hasIK, self._buildIKSystem),
+                                                ("fk", self.hasFK, lambda: self._buildVariableFKSystem(baseJnts))]:
+                if name not in changed:
+                    continue
+                mayautils.setBuildSubsystem(name)
+                if tops[name]:
+                    rigutils.deleteSystem(tops[name])
+                tops[name] = buildFunc() if hasSystem else None
+                mayautils.flushBuildPlan()
+            mayautils.setBuildSubsystem("ikfkBlend")
+            self._buildBlend(tops["ik"], tops["fk"], baseJnts)
+            mayautils.flushBuildPlan()
+
+        # the dynamic curve only follows the base joints, it is untouched by ik/fk changes
+        if "dynamic" in changed:
+            mayautils.setBuildSubsystem("dynamic")
+            if tops["dynamic"]:
+                rigutils.deleteSystem(tops["dynamic"])
+            for jnt in baseJnts:
+                if jnt.name().endswith("_inf"):
+                    jnt.rename(jnt.name()[:-len("_inf")])
+            tops["dynamic"] = self._buildDynamic(baseJnts, hairSystem) if self.hasDynamic else None
+
+        mayautils.setBuildSubsystem("finalize")
+        self._markInfluenceJoints(baseJnts, tops["dynamic"])
+        self._storeBuildInputs(newHashes)
+        return changed
+
+    def _buildBlend(self, ikTop, fkTop, baseJnts):
         if ikTop and fkTop:
             # build ikfk switch
             ikfkAttrs = [
@@ -98,84 +356,207 @@ class SplineRig(object):
                 {"ln":"ikfkSwitchRev", "at":"float", "dv":1, "min":0, "max":1}
             ]
             mayautils.addAttributes(self.globalCtrl, ikfkAttrs)
-            ikfkRev = pm.createNode("reverse", n="{0}_ikfk_rev".format(self.prefix))
-            self.globalCtrl.ikfkSwitch.connect(ikfkRev.inputX)
-            ikfkRev.outputX.connect(self.globalCtrl.ikfkSwitchRev)
+            ikfkRev = mayautils.createNode("reverse", "{0}_ikfk_rev".format(self.prefix))
+            mayautils.connectAttr(self.globalCtrl.ikfkSwitch, ikfkRev.inputX)
+            mayautils.connectAttr(ikfkRev.outputX, self.globalCtrl.ikfkSwitchRev)
 
             # connect ctrl visibility
             fkCtrls = fkTop.ctrl.get()
             ikCtrls = ikTop.ctrl.get()
             for ikCtrl in ikCtrls:
-                self.globalCtrl.ikfkSwitchRev.connect(ikCtrl.getShape().visibility)
+                self.globalCtrl.ikfkSwitchRev.connect(ikCtrl.getShape().visibility, f=1)
             for fkCtrl in fkCtrls:
-                self.globalCtrl.ikfkSwitch.connect(fkCtrl.getShape().visibility)
+                self.globalCtrl.ikfkSwitch.connect(fkCtrl.getShape().visibility, f=1)
 
             # joint blend
             fkJnts = fkTop.resultJnt.get()
             ikJnts = ikTop.resultJnt.get()
+            if self.blendSolver == 1:
+                self._buildBlendNode(fkJnts, ikJnts, baseJnts, self.globalCtrl.ikfkSwitch)
+                return
             for i in range(self.jointNum):
                 parCst = pm.parentConstraint(fkJnts[i], ikJnts[i], baseJnts[i], mo=0)
                 weightAttrs = pm.parentConstraint(parCst, q=1, wal=1)
                 self.globalCtrl.ikfkSwitch.connect(weightAttrs[0])
                 self.globalCtrl.ikfkSwitchRev.connect(weightAttrs[1])
-                scb = pm.createNode("blendColors", n="{0}_{1:0>2d}_s_cb".format(self.prefix, i))
-                fkJnts[i].scale.connect(scb.color1)
-                ikJnts[i].scale.connect(scb.color2)
-                scb.output.connect(baseJnts[i].scale)
-                self.globalCtrl.ikfkSwitch.connect(scb.blender)
+                scb = mayautils.createNode("blendColors", "{0}_{1:0>2d}_s_cb".format(self.prefix, i))
+                mayautils.connectAttr(fkJnts[i].scale, scb.color1)
+                mayautils.connectAttr(ikJnts[i].scale, scb.color2)
+                mayautils.connectAttr(scb.output, baseJnts[i].scale)
+                mayautils.connectAttr(self.globalCtrl.ikfkSwitch, scb.blender)
 
         elif ikTop or fkTop:
             retJnts = fkTop.resultJnt.get() if fkTop else ikTop.resultJnt.get()
+            if self.blendSolver == 1:
+                self._buildBlendNode(retJnts, retJnts, baseJnts)
+                return
             for i in range(self.jointNum):
                 pm.parentConstraint(retJnts[i], baseJnts[i], mo=0)
                 retJnts[i].scale.connect(baseJnts[i].scale)
 
-        dynTop = None
-        # build dynamic system
-        if self.hasDynamic:
-            dynAttrs = [
-                {"ln":"dynamicSwitch", "at":"bool", "dv":1, "k":1, "cb":1},
-                {"ln":"animationBlend", "at":"float", "dv":0, "k":1, "min":0, "max":1}
-            ]
-            mayautils.addAttributes(self.globalCtrl, dynAttrs)
-            dynTop = self._buildDynamicSystem(baseJnts, hairSystem)
+    def _buildBlendNode(self, jnts1, jnts2, baseJnts, blenderPlug=None):
+        """
+        Drive the base joints with a single dynJointBlend node instead of per joint constraints.
+        :param jnts1: `list` joints taken at blender 1, the fk result joints
+        :param jnts2: `list` joints taken at blender 0, the ik result joints
+        :param baseJnts: `list` base joints
+        :param blenderPlug: `PyNode` blend attribute, blender stays 0 if None
+        """
+        mayautils.loadNodePlugin()
+        blendNode = mayautils.createNode("dynJointBlend", "{0}_ikfk_jointBlend".format(self.prefix))
+        if blenderPlug:
+            mayautils.connectAttr(blenderPlug, blendNode.blender)
+        mayautils.connectAttr(baseJnts[0].parentMatrix[0], blendNode.parentMatrix)
+        for i in range(self.jointNum):
+            target = blendNode.target[i]
+            mayautils.connectAttr(jnts1[i].worldMatrix[0], target.input1Matrix)
+            mayautils.connectAttr(jnts2[i].worldMatrix[0], target.input2Matrix)
+            mayautils.connectAttr(jnts1[i].scale, target.input1Scale)
+            mayautils.connectAttr(jnts2[i].scale, target.input2Scale)
+            mayautils.connectAttr(baseJnts[i].jointOrient, target.jointOrient)
+            output = blendNode.output[i]
+            mayautils.connectAttr(output.outputTranslate, baseJnts[i].translate)
+            mayautils.connectAttr(output.outputRotate, baseJnts[i].rotate)
+            mayautils.connectAttr(output.outputScale, baseJnts[i].scale)
+
+    def _removeBlend(self, baseJnts):
+        """
+        Disconnect the base joints from the ik/fk result joints and put them back to the rest pose.
+        """
+        for jnt in baseJnts:
+            pm.delete(pm.listRelatives(jnt, c=1, typ="parentConstraint"))
+            for channel in [jnt.translate, jnt.rotate, jnt.scale]:
+                for src in channel.inputs(plugs=1):
+                    pm.disconnectAttr(src, channel)
+        blendNodes = pm.ls("{0}_??_s_cb".format(self.prefix), type="blendColors")
+        blendNodes += pm.ls("{0}_ikfk_rev".format(self.prefix), type="reverse")
+        blendNodes += pm.ls("{0}_ikfk_jointBlend".format(self.prefix))
+        if blendNodes:
+            pm.delete(blendNodes)
+        for jnt in baseJnts:
+            jnt.scale.set(1, 1, 1)
+        pm.dagPose("{0}_base_restPose".format(self.prefix), restore=1)
+
+    def _buildDynamic(self, baseJnts, hairSystem=None):
+        dynAttrs = [
+            {"ln":"dynamicSwitch", "at":"bool", "dv":1, "k":1, "cb":1},
+            {"ln":"animationBlend", "at":"float", "dv":0, "k":1, "min":0, "max":1}
+        ]
+        mayautils.addAttributes(self.globalCtrl, dynAttrs)
+        return self._buildDynamicSystem(baseJnts, hairSystem)
 
-        # mark influence joints
+    def _markInfluenceJoints(self, baseJnts, dynTop=None):
         infJnts = dynTop.resultJnt.get() if dynTop else baseJnts
         for i, jnt in enumerate(infJnts):
-            jnt.rename(jnt.name()+"_inf")
-
-
+            if not jnt.name().endswith("_inf"):
+                jnt.rename(jnt.name()+"_inf")
 
     def _buildDynamicSystem(self, joints, hairSystem=None):
-        return rigutils.buildDynamicSystem(self.prefix, joints, self.metaCtrl, hairSystem)
+        # hairPoolSize 0: own hair system and nucleus, >0: share at most hairPoolSize
+        # hair systems with the other rigs of the same hairPool
+        hairPool = self.hairPool if self.hairPoolSize > 0 else None
+        return rigutils.buildDynamicSystem(self.prefix, joints, self.metaCtrl, hairSystem,
+                                           hairPool, self.hairPoolSize)
 
     def _buildIKSystem(self):
+        # lengthSolver 0: rebuildCurve/curveInfo/detachCurve network, 1: dynCurveLength compute node
+        # ikSolver 0: aim joint chain with constraints, 1: dynSplineJoints compute node
         return rigutils.buildIKSystem(self.prefix, self.startPos, self.endPos,
                               self.masterCtrlNum, self.ibtSubCtrlNum,
                               self.jointNum, self.metaCtrl, self.preserveVolume,
-                              self.preserveLength, self.globalCtrl.globalScale)
+                              self.preserveLength, self.globalCtrl.globalScale,
+                              self.lengthSolver == 1, self.ikSolver == 1,
+                              self._getChainPositions())
 
     def _buildRegularFKSystem(self, joints):
         pass
 
     def _buildVariableFKSystem(self, joints):
+        # fkSolver 0: utility node network, 1: dynVariableFK compute node
         return rigutils.buildVariableFKSystem(joints, self.prefix,
-                                              self.fkCtrlNum, self.metaCtrl)
+                                              self.fkCtrlNum, self.metaCtrl,
+                                              self.fkSolver == 1)
 
     @classmethod
-    def buildScaffoldChain(rig, prefix):
-        scaffoldTop = scaffold.buildScaffoldChain(prefix, rig.scaffoldChain)
+    def buildScaffoldChain(rig, prefix, positions=None, upAxisSolver=0):
+        """
+        Build a scaffold to lay out the rig.
+        :param prefix: `string` rig prefix
+        :param positions: `list` ordered world positions of the scaffold locators, at least 2, scaffoldChain if None
+        :param upAxisSolver: `int` see scaffold.buildScaffoldChain()
+        :return: `PyNode` scaffold top node
+        """
+        scaffoldTop = scaffold.buildScaffoldChain(prefix, positions or rig.scaffoldChain, upAxisSolver)
 
         # add rig attrs to scaffold attributes
         scaffold.setScaffoldType(scaffoldTop, rig.scaffoldType)
-        mayautils.addAttributes(scaffoldTop, rig.rigAttrs)
+        mayautils.addAttributes(scaffoldTop, rig.rigAttrs + [rig.HAIR_POOL_ATTR])
         return scaffoldTop
 
     @classmethod
     def rigExists(rig, prefix):
-        return pm.ls("{0}*.{1}".format(prefix, rig.RIG_TOP_TAG), o=1)
+        rigTop = registry.getTop("rig", prefix)
+        return [rigTop] if rigTop else []
+
+    @staticmethod
+    def cacheDynamics(prefix, filePath, startFrame=None, endFrame=None):
+        """
+        Bake the dynamic curve of a rig to a cache file and play the rig back from it.
+        :param prefix: `string` rig prefix
+        :param filePath: `string` cache file path
+        :param startFrame: `int` first frame, the meta ctrl startFrame if None
+        :param endFrame: `int` last frame, the playback end if None
+        :return: `PyNode` dynCurveCache node
+        """
+        follicle = pm.PyNode("{0}_dyn_fol".format(prefix))
+        SplineRig.uncacheDynamics(prefix)
+        if startFrame is None:
+            startFrame = pm.PyNode("{0}_meta_ctrl".format(prefix)).startFrame.get()
+        if endFrame is None:
+            endFrame = pm.playbackOptions(q=1, max=1)
+        rigutils.bakeCurveCache(follicle, filePath, startFrame, endFrame)
+        return rigutils.attachCurveCache(follicle, filePath, "{0}_dyn_cache".format(prefix))
+
+    @staticmethod
+    def previewDynamics(prefixes, cacheDir, startFrame=None, endFrame=None, workerNum=None, **simSettings):
+        """
+        Simulate the dynamic curves of rigs with the NumPy strand simulator instead of nHair,
+        a fast preview played back through the curve cache like cacheDynamics().
+        :param prefixes: `list` rig prefixes, rigs of different hair systems are simulated in parallel
+        :param cacheDir: `string` folder of the {prefix}_preview.drcc cache files
+        :param startFrame: `int` first frame, the meta ctrl startFrame of the first rig if None
+        :param endFrame: `int` last frame, the playback end if None
+        :param workerNum: `int` number of simulation threads, cpu count if None
+        :param simSettings: strandsim.StrandBatch flags, eg. damping=0.1, substeps=4
+        :return: `list` dynCurveCache nodes
+        """
+        prefixes = prefixes if isinstance(prefixes, (list, tuple)) else [prefixes]
+        follicles = [pm.PyNode("{0}_dyn_fol".format(x)) for x in prefixes]
+        metaCtrls = [pm.PyNode("{0}_meta_ctrl".format(x)) for x in prefixes]
+        filePaths = [os.path.join(cacheDir, "{0}_preview.drcc".format(x)) for x in prefixes]
+        for prefix in prefixes:
+            SplineRig.uncacheDynamics(prefix)
+        if startFrame is None:
+            startFrame = metaCtrls[0].startFrame.get()
+        if endFrame is None:
+            endFrame = pm.playbackOptions(q=1, max=1)
+        rigutils.bakeStrandPreview(follicles, filePaths, startFrame, endFrame,
+                                   [x.animationAttract for x in metaCtrls], workerNum, **simSettings)
+        return [rigutils.attachCurveCache(x, y, "{0}_dyn_cache".format(z))
+                for x, y, z in zip(follicles, filePaths, prefixes)]
+
+    @staticmethod
+    def uncacheDynamics(prefix):
+        """
+        Drive the dynamic curve of a rig from the simulation again.
+        :param prefix: `string` rig prefix
+        :return:
+        """
+        follicle = pm.PyNode("{0}_dyn_fol".format(prefix)).getShape()
+        for cache in follicle.message.outputs(type="dynCurveCache"):
+            rigutils.detachCurveCache(cache)
 
     @staticmethod
     def deleteRig(rigTop):
-        pm.delete(rigTop)
\ No newline at end of file
+        for top in (rigTop if isinstance(rigTop, list) else [rigTop]):
+            rigutils.deleteSystem(top)
\ No newline at end of file
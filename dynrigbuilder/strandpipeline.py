@@ -0,0 +1,136 @@
+__author__ = 'wuxiaoyu'
+
+# Streaming stages for the strand simulation of long shots. Frames flow through a chain
+# of generators, a frame is the list of (cvNum, 3) cvs of every strand, eg.
+#   frames = strandsim.streamPartitions(startFrames, keys)
+#   frames = strandpipeline.bufferFrames(frames, 8)
+#   frames = strandpipeline.writeCaches(frames, writers)
+#   frames = strandpipeline.collectStats(frames, stats)
+#   strandpipeline.drain(frames)
+# Every stage holds the frame it works on, bufferFrames holds at most its size and the
+# cache writers at most one chunk, so memory use does not grow with the shot length.
+
+import threading
+from timeit import default_timer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+import nurbs
+
+_END = object()
+
+
+def bufferFrames(frames, size=4):
+    """
+    Compute the frames ahead on a thread while the next stages work, holding at most size frames.
+    Don't buffer frames read from Maya, the scene is only safe to query from the main thread.
+    :param frames: `iterable` frames
+    :param size: `int` maximum number of buffered frames
+    :return: `generator` frames
+    """
+    buffered = queue.Queue(maxsize=max(int(size), 1))
+    stopped = threading.Event()
+
+    def put(item):
+        # give up once the consumer stopped, the queue may be full for good
+        while not stopped.is_set():
+            try:
+                buffered.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for frame in frames:
+                if not put((frame, None)):
+                    return
+            put((_END, None))
+        except Exception as e:
+            put((_END, e))
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            frame, error = buffered.get()
+            if frame is _END:
+                if error is not None:
+                    raise error
+                return
+            yield frame
+    finally:
+        # the consumer stopped early, the producer gives up at its next put, a frame being
+        # computed is not waited for
+        stopped.set()
+        producer.join(0.5)
+
+
+def writeCaches(frames, writers):
+    """
+    Write every frame to curve cache files and pass it on, the writers flush in chunks.
+    :param frames: `iterable` frames
+    :param writers: `list` curvecache.CurveCacheWriter of every strand, closed when the frames run out
+    :return: `generator` frames
+    """
+    try:
+        for frame in frames:
+            for writer, cvs in zip(writers, frame):
+                writer.writeFrame(np.asarray(cvs).tolist())
+            yield frame
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+def solveJoints(frames, curves, jointLengths, upVector=(0.0, 1.0, 0.0)):
+    """
+    World matrices of the joints driven by every strand, like a spline ik chain keeping its joint
+    lengths along the simulated curve. Yields the joint matrices instead of the frames.
+    :param frames: `iterable` frames
+    :param curves: `list` (knots, degree) of every strand curve, see nurbs
+    :param jointLengths: `list` (jointNum-1,) rest joint lengths of every strand
+    :param upVector: `list` [x, y, z] world up vector of the joints
+    :return: `generator` list of (jointNum, 4, 4) matrices of every strand, per frame
+    """
+    jointArcLengths = [np.concatenate([[0.0], np.cumsum(x)]) for x in jointLengths]
+    for frame in frames:
+        yield [nurbs.aimMatrices(nurbs.pointsAtLengths(cvs, knots, degree, lengths), upVector)
+               for cvs, (knots, degree), lengths in zip(frame, curves, jointArcLengths)]
+
+
+def collectStats(frames, stats):
+    """
+    Measure the throughput of the stages before it and pass the frames on, stats is updated every frame.
+    :param frames: `iterable` frames
+    :param stats: `dict` filled with {"strandNum", "cvNum", "frameNum", "seconds", "cvsPerSecond"}
+    :return: `generator` frames
+    """
+    stats.update({"strandNum": 0, "cvNum": 0, "frameNum": 0, "seconds": 0.0, "cvsPerSecond": None})
+    startTime = default_timer()
+    for frame in frames:
+        stats["strandNum"] = len(frame)
+        stats["cvNum"] = sum(len(x) for x in frame)
+        stats["frameNum"] += 1
+        stats["seconds"] = default_timer() - startTime
+        if stats["seconds"]:
+            stats["cvsPerSecond"] = stats["cvNum"]*stats["frameNum"]/stats["seconds"]
+        yield frame
+
+
+def drain(frames):
+    """
+    Pull every frame through the stages.
+    :param frames: `iterable` frames
+    :return: `int` number of frames
+    """
+    frameNum = 0
+    for _ in frames:
+        frameNum += 1
+    return frameNum
@@ -0,0 +1,571 @@
+__author__ = 'wuxiaoyu'
+
+# NumPy stand-in for the nHair simulation of the dynamic curves, for fast previews in Maya
+# and for running the dynamic part of a rig where Maya is not available.
+#
+# Strands are the cvs of the dynamic curves, all strands of a simulator have the same cv
+# number and are stepped together as one (strandNum, cvNum, 3) array. Every substep:
+#   - Verlet integration with gravity and damping
+#   - attraction towards the animated start curve, like hairSystem.startCurveAttract
+#   - the root cv is locked to the start curve, like the follicle base
+#   - distance constraints keep the segment lengths of the rest curve
+#
+#   sim = strandsim.StrandSimulator(startCvs[0], attract=0.2)
+#   dynCvs = sim.simulate(startCvs)    # (frameNum, strandNum, cvNum, 3)
+#
+# StrandBatch steps strands of any cv number: all cvs of all strands are stored in
+# contiguous (totalCvNum, 3) arrays, strand i owns the cvs offsets[i]:offsets[i+1].
+# The distance constraints are solved on the even and the odd segments of the packed
+# array in turn, the segments of each half share no cv, so a substep is a few array
+# operations on strided views for the whole asset. Measure the throughput of a machine with:
+#   python strandsim.py --strands 2000 --cvs 8 24 --frames 48
+#
+# Strands of different rigs or hair systems are independent. simulatePartitions() keeps
+# the strands of a partition (eg. a rig or a hair system) together, spreads the partitions
+# over worker shards of about the same cv number and simulates every shard as one
+# StrandBatch on a thread pool. Large arrays release the GIL inside NumPy, so the shards
+# run in parallel, eg. 32 rigs on 8 threads:
+#   python strandsim.py --strands 2000 --cvs 8 24 --partitions 32 --workers 8
+
+import argparse
+import sys
+from collections import OrderedDict
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+import numpy as np
+
+DEFAULT_GRAVITY = (0.0, -9.8, 0.0)
+
+
+def segmentLengths(positions):
+    """
+    Length of every segment between two consecutive cvs.
+    :param positions: `array` (..., cvNum, 3) cv positions
+    :return: `array` (..., cvNum-1) lengths
+    """
+    return np.linalg.norm(np.diff(positions, axis=-2), axis=-1)
+
+
+def _perStrand(value, strandNum):
+    """
+    Broadcast a scalar or a per strand value to (strandNum, 1, 1).
+    """
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (strandNum,)).reshape(strandNum, 1, 1)
+
+
+class StrandSimulator(object):
+    """
+    Position based simulation of many strands with the same cv number.
+    """
+    def __init__(self, restPositions, gravity=DEFAULT_GRAVITY, damping=0.05, attract=0.0,
+                 iterations=8, substeps=2, fps=24.0):
+        """
+        :param restPositions: `array` (strandNum, cvNum, 3) start curve cvs at the start frame,
+                              (cvNum, 3) for a single strand. The segment lengths are kept.
+        :param gravity: `list` [x, y, z] gravity acceleration in units per second squared
+        :param damping: `float` velocity fraction lost every frame, between 0 and 1
+        :param attract: `float` or `array` (strandNum,) start curve attraction every frame, between 0 and 1,
+                        like the animationAttract attr of the meta ctrl
+        :param iterations: `int` number of distance constraint passes per substep
+        :param substeps: `int` number of substeps per frame
+        :param fps: `float` frames per second
+        """
+        restPositions = np.asarray(restPositions, dtype=np.float64)
+        self.singleStrand = restPositions.ndim == 2
+        restPositions = restPositions.reshape((-1,)+restPositions.shape[-2:])
+        if restPositions.shape[1] < 2:
+            raise ValueError("A strand needs at least 2 cvs.")
+        self.strandNum, self.cvNum = restPositions.shape[:2]
+        self.restLengths = segmentLengths(restPositions)
+        self.gravity = np.asarray(gravity, dtype=np.float64)
+        self.damping = damping
+        self.attract = attract
+        self.iterations = iterations
+        self.substeps = max(int(substeps), 1)
+        self.fps = float(fps)
+        self.reset(restPositions)
+
+    def reset(self, startPositions):
+        """
+        Put the strands at rest on the start curves, like the nucleus start frame.
+        :param startPositions: `array` (strandNum, cvNum, 3) start curve cvs
+        :return:
+        """
+        startPositions = np.asarray(startPositions, dtype=np.float64).reshape(self.strandNum, self.cvNum, 3)
+        self.positions = startPositions.copy()
+        self.previous = startPositions.copy()
+        self._start = startPositions.copy()
+
+    def _output(self):
+        return self.positions[0].copy() if self.singleStrand else self.positions.copy()
+
+    def _solveConstraints(self):
+        # Gauss-Seidel along the strands, every pass moves all strands at once.
+        # the root is locked, so the first segment moves its tip only
+        positions = self.positions
+        for _ in range(self.iterations):
+            for i in range(self.cvNum-1):
+                delta = positions[:, i+1] - positions[:, i]
+                length = np.linalg.norm(delta, axis=-1)
+                scale = np.divide(length - self.restLengths[:, i], length,
+                                  out=np.zeros_like(length), where=length > 1e-12)
+                correction = delta*scale[:, np.newaxis]
+                if i == 0:
+                    positions[:, 1] -= correction
+                else:
+                    positions[:, i] += 0.5*correction
+                    positions[:, i+1] -= 0.5*correction
+
+    def step(self, startPositions, attract=None):
+        """
+        Simulate one frame, the start curves move linearly from the last frame over the substeps.
+        :param startPositions: `array` (strandNum, cvNum, 3) start curve cvs of the frame
+        :param attract: `float` or `array` (strandNum,) start curve attraction of the frame, self.attract if None
+        :return: `array` (strandNum, cvNum, 3) simulated cvs, (cvNum, 3) for a single strand
+        """
+        startPositions = np.asarray(startPositions, dtype=np.float64).reshape(self.strandNum, self.cvNum, 3)
+        attract = np.clip(_perStrand(self.attract if attract is None else attract, self.strandNum), 0.0, 1.0)
+        # per substep rates giving the per frame damping and attraction
+        keep = (1.0 - min(max(self.damping, 0.0), 1.0))**(1.0/self.substeps)
+        attract = 1.0 - (1.0 - attract)**(1.0/self.substeps)
+        dt = 1.0/(self.fps*self.substeps)
+        gravityStep = self.gravity*dt*dt
+
+        for substep in range(self.substeps):
+            weight = (substep+1.0)/self.substeps
+            target = self._start + (startPositions - self._start)*weight
+            velocity = (self.positions - self.previous)*keep
+            self.previous = self.positions
+            self.positions = self.positions + velocity + gravityStep
+            self.positions += (target - self.positions)*attract
+            self.positions[:, 0] = target[:, 0]
+            self._solveConstraints()
+        self._start = startPositions.copy()
+        return self._output()
+
+    def simulate(self, startFrames, attract=None):
+        """
+        Simulate an animation of the start curves, the first frame is the start frame.
+        :param startFrames: `array` (frameNum, strandNum, cvNum, 3) start curve cvs frame after frame,
+                            (frameNum, cvNum, 3) for a single strand
+        :param attract: `float` or `array` (frameNum,) or (frameNum, strandNum) attraction per frame,
+                        self.attract if None
+        :return: `array` simulated cvs, the shape of startFrames
+        """
+        startFrames = np.asarray(startFrames, dtype=np.float64)
+        frameNum = len(startFrames)
+        if attract is None:
+            attract = _perStrand(self.attract, self.strandNum).reshape(1, self.strandNum)
+        else:
+            attract = np.asarray(attract, dtype=np.float64)
+            attract = attract.reshape((frameNum, -1) if attract.ndim else (1, 1))
+        attract = np.broadcast_to(attract, (frameNum, self.strandNum))
+        self.reset(startFrames[0])
+        result = np.empty(startFrames.shape)
+        result[0] = self._output()
+        for frame in range(1, frameNum):
+            result[frame] = self.step(startFrames[frame], attract[frame])
+        return result
+
+
+def packStrands(strands):
+    """
+    Concatenate strands of any cv number into one array.
+    :param strands: `list` (..., cvNum, 3) cvs of every strand, leading axes are batch axes (eg. frames)
+    :return: `tuple` (cvs (..., totalCvNum, 3), offsets (strandNum+1,))
+    """
+    strands = [np.asarray(x, dtype=np.float64) for x in strands]
+    offsets = np.concatenate([[0], np.cumsum([x.shape[-2] for x in strands])]).astype(np.int64)
+    return np.concatenate(strands, axis=-2), offsets
+
+
+def unpackStrands(cvs, offsets):
+    """
+    Split packed cvs back into strands.
+    :param cvs: `array` (..., totalCvNum, 3) packed cvs
+    :param offsets: `array` (strandNum+1,) first cv of every strand and the total cv number
+    :return: `list` (..., cvNum, 3) cvs of every strand
+    """
+    return np.split(cvs, offsets[1:-1], axis=-2)
+
+
+class StrandBatch(object):
+    """
+    Structure of arrays simulation of strands with any cv number. Same integration, attraction
+    and root lock as StrandSimulator, but the distance constraints are solved on the even and
+    the odd segments in turn instead of root to tip, so the cvs differ from StrandSimulator by
+    a fraction of a percent of the strand length (about 0.3% with the default 8 iterations).
+    """
+    def __init__(self, restStrands, gravity=DEFAULT_GRAVITY, damping=0.05, attract=0.0,
+                 iterations=8, substeps=2, fps=24.0):
+        """
+        :param restStrands: `list` (cvNum, 3) start curve cvs of every strand at the start frame
+        :param attract: `float` or `array` (strandNum,) start curve attraction every frame, between 0 and 1
+        :param gravity: see StrandSimulator
+        """
+        restPositions, self.offsets = packStrands(restStrands)
+        counts = np.diff(self.offsets)
+        if counts.min() < 2:
+            raise ValueError("A strand needs at least 2 cvs.")
+        self.strandNum = len(counts)
+        self.cvNum = int(self.offsets[-1])
+
+        # strands with an odd cv number get a locked padding cv at their tip, so every strand
+        # starts on an even cv and is solved the same way wherever it is packed
+        paddedCounts = counts + counts % 2
+        paddedOffsets = np.concatenate([[0], np.cumsum(paddedCounts)])
+        paddedNum = int(paddedOffsets[-1])
+        self._strandIndex = np.repeat(np.arange(self.strandNum), paddedCounts)
+        localIndex = np.arange(paddedNum) - paddedOffsets[:-1][self._strandIndex]
+        isCv = localIndex < counts[self._strandIndex]
+        self._cvIndex = np.flatnonzero(isCv)
+        # packed cv of every padded cv, the padding cvs repeat the tip
+        self._gather = np.minimum(localIndex, counts[self._strandIndex]-1) + self.offsets[:-1][self._strandIndex]
+        self._locked = np.concatenate([paddedOffsets[:-1], np.flatnonzero(~isCv)])
+
+        # segment k links cv k to cv k+1 of the padded array, segments leaving the last cv of a
+        # strand get no weight. the root is locked, its segment moves the second cv only
+        segmentNum = paddedNum - 1
+        valid = (localIndex < counts[self._strandIndex]-1)[:segmentNum]
+        startWeights = np.where(valid, 0.5, 0.0)
+        endWeights = np.where(valid, 0.5, 0.0)
+        startWeights[paddedOffsets[:-1]] = 0.0
+        endWeights[paddedOffsets[:-1]] = 1.0
+        restLengths = segmentLengths(restPositions[self._gather])
+        # even and odd segments share no cv, each half is solved with strided views
+        self._segmentSets = []
+        for parity in (0, 1):
+            startSlice = slice(parity, segmentNum, 2)
+            endSlice = slice(parity+1, paddedNum, 2)
+            self._segmentSets.append((startSlice, endSlice, restLengths[startSlice],
+                                      startWeights[startSlice, np.newaxis], endWeights[startSlice, np.newaxis]))
+
+        self.gravity = np.asarray(gravity, dtype=np.float64)
+        self.damping = damping
+        self.attract = attract
+        self.iterations = iterations
+        self.substeps = max(int(substeps), 1)
+        self.fps = float(fps)
+        self.stats = {}
+        self.reset(restPositions)
+
+    def reset(self, startPositions):
+        """
+        Put the strands at rest on the start curves.
+        :param startPositions: `array` (totalCvNum, 3) packed start curve cvs, see packStrands()
+        :return:
+        """
+        startPositions = np.asarray(startPositions, dtype=np.float64)[self._gather]
+        self.positions = startPositions.copy()
+        self.previous = startPositions.copy()
+        self._start = startPositions
+
+    def _output(self):
+        return self.positions[self._cvIndex]
+
+    def _solveConstraints(self):
+        positions = self.positions
+        for _ in range(self.iterations):
+            for startSlice, endSlice, restLengths, startWeights, endWeights in self._segmentSets:
+                delta = positions[endSlice] - positions[startSlice]
+                length = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+                scale = np.divide(length - restLengths, length, out=np.zeros_like(length), where=length > 1e-12)
+                delta *= scale[:, np.newaxis]
+                positions[startSlice] += startWeights*delta
+                positions[endSlice] -= endWeights*delta
+
+    def step(self, startPositions, attract=None):
+        """
+        Simulate one frame.
+        :param startPositions: `array` (totalCvNum, 3) packed start curve cvs of the frame
+        :param attract: `float` or `array` (strandNum,) start curve attraction of the frame, self.attract if None
+        :return: `array` (totalCvNum, 3) packed simulated cvs
+        """
+        startPositions = np.asarray(startPositions, dtype=np.float64)[self._gather]
+        attract = np.broadcast_to(np.asarray(self.attract if attract is None else attract, dtype=np.float64),
+                                  (self.strandNum,))
+        attract = 1.0 - (1.0 - np.clip(attract, 0.0, 1.0))**(1.0/self.substeps)
+        attract = attract[self._strandIndex][:, np.newaxis]
+        keep = (1.0 - min(max(self.damping, 0.0), 1.0))**(1.0/self.substeps)
+        dt = 1.0/(self.fps*self.substeps)
+        gravityStep = self.gravity*dt*dt
+
+        for substep in range(self.substeps):
+            weight = (substep+1.0)/self.substeps
+            target = self._start + (startPositions - self._start)*weight
+            velocity = (self.positions - self.previous)*keep
+            self.previous = self.positions
+            self.positions = self.positions + velocity + gravityStep
+            self.positions += (target - self.positions)*attract
+            self.positions[self._locked] = target[self._locked]
+            self._solveConstraints()
+        self._start = startPositions
+        return self._output()
+
+    def simulate(self, startFrames, attract=None):
+        """
+        Simulate an animation of the start curves, the first frame is the start frame.
+        The throughput is kept in self.stats, see iterSimulate() to stream long shots.
+        :param startFrames: `array` (frameNum, totalCvNum, 3) packed start curve cvs frame after frame
+        :param attract: `float` or `array` (frameNum,) or (frameNum, strandNum) attraction per frame,
+                        self.attract if None
+        :return: `array` (frameNum, totalCvNum, 3) packed simulated cvs
+        """
+        startFrames = np.asarray(startFrames, dtype=np.float64)
+        frameNum = len(startFrames)
+        if attract is None:
+            attract = np.broadcast_to(np.asarray(self.attract, dtype=np.float64), (self.strandNum,))[np.newaxis]
+        else:
+            attract = np.asarray(attract, dtype=np.float64)
+            attract = attract.reshape((frameNum, -1) if attract.ndim else (1, 1))
+        attract = np.broadcast_to(attract, (frameNum, self.strandNum))
+
+        result = np.empty(startFrames.shape)
+        for frame, cvs in enumerate(self.iterSimulate(startFrames, attract)):
+            result[frame] = cvs
+        return result
+
+    def iterSimulate(self, startFrames, attract=None):
+        """
+        Simulate the start curves frame by frame as they come, the first frame is the start frame.
+        Only the current frame is held, the throughput is kept in self.stats when the frames run out.
+        :param startFrames: `iterable` (totalCvNum, 3) packed start curve cvs of every frame, eg. a generator
+        :param attract: `iterable` float or (strandNum,) attraction of every frame, self.attract if None
+        :return: `generator` (totalCvNum, 3) packed simulated cvs of every frame
+        """
+        attracts = iter(attract) if attract is not None else None
+        frameNum = 0
+        startTime = default_timer()
+        for startPositions in startFrames:
+            frameAttract = next(attracts) if attracts is not None else None
+            if frameNum == 0:
+                self.reset(startPositions)
+                cvs = self._output()
+            else:
+                cvs = self.step(startPositions, frameAttract)
+            frameNum += 1
+            yield cvs
+        seconds = default_timer() - startTime
+        self.stats = {
+            "strandNum": self.strandNum,
+            "cvNum": self.cvNum,
+            "frameNum": frameNum,
+            "seconds": seconds,
+            "cvsPerSecond": self.cvNum*max(frameNum-1, 0)/seconds if seconds else None,
+        }
+
+
+def formatStats(stats):
+    """
+    One line throughput report of StrandBatch.stats.
+    :param stats: `dict` StrandBatch.stats
+    :return: `string`
+    """
+    line = "{0} strands, {1} cvs, {2} frames: {3:.3f}s, {4:.0f} strand cvs per second".format(
+        stats["strandNum"], stats["cvNum"], stats["frameNum"], stats["seconds"], stats["cvsPerSecond"] or 0)
+    if "workerNum" in stats:
+        line += " ({0} partitions, {1} shards on {2} threads)".format(
+            stats["partitionNum"], stats["shardNum"], stats["workerNum"])
+    return line
+
+
+def partitionStrands(keys):
+    """
+    Group the strands by partition key.
+    :param keys: `list` partition key of every strand, eg. the rig prefix or the hair system name
+    :return: `OrderedDict` key: strand indices, in the order of the first strand of every key
+    """
+    partitions = OrderedDict()
+    for i, key in enumerate(keys):
+        partitions.setdefault(key, []).append(i)
+    return partitions
+
+
+def shardPartitions(partitions, cvCounts, shardNum):
+    """
+    Split partitions into shards of about the same cv number, a partition is never split.
+    :param partitions: `list` strand index lists, see partitionStrands()
+    :param cvCounts: `list` cv number of every strand
+    :param shardNum: `int` number of shards
+    :return: `list` strand index lists, empty shards are dropped
+    """
+    cost = lambda partition: sum(cvCounts[i] for i in partition)
+    shards = [[] for _ in range(shardNum)]
+    loads = [0]*shardNum
+    for partition in sorted(partitions, key=cost, reverse=True):
+        i = loads.index(min(loads))
+        shards[i] += partition
+        loads[i] += cost(partition)
+    return [sorted(x) for x in shards if x]
+
+
+def mapShards(func, shards, workerNum=None):
+    """
+    Run a function on every shard on a thread pool, for the strand solver and the nurbs evaluators.
+    :param func: `function` called with one shard
+    :param shards: `list` shards
+    :param workerNum: `int` number of threads, cpu count if None, 1 runs the shards in this thread
+    :return: `list` results in shard order
+    """
+    workerNum = min(workerNum or cpu_count(), len(shards))
+    if workerNum <= 1:
+        return [func(x) for x in shards]
+    pool = ThreadPool(workerNum)
+    try:
+        return pool.map(func, shards)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def simulatePartitions(startFrames, keys=None, attract=None, workerNum=None, **simSettings):
+    """
+    Simulate strands of any cv number on a thread pool, the strands of a partition are
+    simulated on the same thread.
+    :param startFrames: `list` (frameNum, cvNum, 3) start curve cvs of every strand frame after frame
+    :param keys: `list` partition key of every strand, every strand is its own partition if None
+    :param attract: `float` or `array` (frameNum,) or (frameNum, strandNum) attraction per frame,
+                    StrandBatch attract flag if None
+    :param workerNum: `int` number of threads, cpu count if None
+    :param simSettings: StrandBatch flags
+    :return: `tuple` (simulated cvs (frameNum, cvNum, 3) of every strand,
+                      stats {"strandNum", "cvNum", "frameNum", "seconds", "cvsPerSecond",
+                             "partitionNum", "shardNum", "workerNum"})
+    """
+    startFrames = [np.asarray(x, dtype=np.float64) for x in startFrames]
+    if not startFrames:
+        return [], {"strandNum": 0, "cvNum": 0, "frameNum": 0, "seconds": 0.0, "cvsPerSecond": None,
+                    "partitionNum": 0, "shardNum": 0, "workerNum": 0}
+    frameNum = len(startFrames[0])
+    if attract is not None and np.ndim(attract) == 2:
+        attract = np.asarray(attract, dtype=np.float64)
+    keys = range(len(startFrames)) if keys is None else keys
+    partitions = list(partitionStrands(keys).values())
+    workerNum = workerNum or cpu_count()
+    shards = shardPartitions(partitions, [x.shape[1] for x in startFrames], workerNum)
+
+    def simulateShard(shard):
+        packedCvs, offsets = packStrands([startFrames[i] for i in shard])
+        batch = StrandBatch([startFrames[i][0] for i in shard], **simSettings)
+        shardAttract = attract[:, shard] if np.ndim(attract) == 2 else attract
+        return unpackStrands(batch.simulate(packedCvs, shardAttract), offsets)
+
+    startTime = default_timer()
+    shardResults = mapShards(simulateShard, shards, workerNum)
+    seconds = default_timer() - startTime
+    results = [None]*len(startFrames)
+    for shard, shardResult in zip(shards, shardResults):
+        for i, cvs in zip(shard, shardResult):
+            results[i] = cvs
+    cvNum = sum(x.shape[1] for x in startFrames)
+    return results, {
+        "strandNum": len(startFrames),
+        "cvNum": cvNum,
+        "frameNum": frameNum,
+        "seconds": seconds,
+        "cvsPerSecond": cvNum*max(frameNum-1, 0)/seconds if seconds else None,
+        "partitionNum": len(partitions),
+        "shardNum": len(shards),
+        "workerNum": min(workerNum, len(shards)),
+    }
+
+
+def streamPartitions(startFrames, keys=None, attract=None, workerNum=None, **simSettings):
+    """
+    Simulate strands of any cv number frame by frame as the frames come, the shards of
+    simulatePartitions() are stepped together on a thread pool every frame. Only the
+    current frame is held, so memory use does not depend on the shot length.
+    :param startFrames: `iterable` list of (cvNum, 3) start curve cvs of every strand, per frame
+    :param keys: `list` partition key of every strand, every strand is its own partition if None
+    :param attract: `iterable` float or (strandNum,) attraction of every frame, StrandBatch attract flag if None
+    :param workerNum: `int` number of threads, cpu count if None
+    :param simSettings: StrandBatch flags
+    :return: `generator` list of (cvNum, 3) simulated cvs of every strand, per frame
+    """
+    frames = iter(startFrames)
+    attracts = iter(attract) if attract is not None else None
+    try:
+        firstFrame = [np.asarray(x, dtype=np.float64) for x in next(frames)]
+    except StopIteration:
+        return
+    if not firstFrame:
+        # nothing to simulate, the frames still come out one by one
+        yield []
+        for _ in frames:
+            yield []
+        return
+    keys = range(len(firstFrame)) if keys is None else keys
+    partitions = list(partitionStrands(keys).values())
+    shards = shardPartitions(partitions, [len(x) for x in firstFrame], workerNum or cpu_count())
+    batches = [StrandBatch([firstFrame[i] for i in shard], **simSettings) for shard in shards]
+    offsets = [x.offsets for x in batches]
+    pool = ThreadPool(min(workerNum or cpu_count(), len(shards)))
+    try:
+        # the start frame is at rest
+        if attracts is not None:
+            next(attracts)
+        yield [x.copy() for x in firstFrame]
+        for frame in frames:
+            frameAttract = next(attracts) if attracts is not None else None
+            if frameAttract is not None:
+                frameAttract = np.broadcast_to(np.asarray(frameAttract, dtype=np.float64), (len(firstFrame),))
+
+            def stepShard(index):
+                shard = shards[index]
+                startPositions = packStrands([frame[i] for i in shard])[0]
+                return batches[index].step(startPositions, None if frameAttract is None else frameAttract[shard])
+
+            result = [None]*len(firstFrame)
+            for shard, shardOffsets, cvs in zip(shards, offsets, pool.map(stepShard, range(len(shards)))):
+                for i, strandCvs in zip(shard, unpackStrands(cvs, shardOffsets)):
+                    result[i] = strandCvs
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def benchmarkBatch(strandNum, minCvNum, maxCvNum=None, frameNum=48, seed=0, partitionNum=None, workerNum=1,
+                   **simSettings):
+    """
+    Simulate swaying strands of random cv numbers and measure the throughput.
+    :param strandNum: `int` number of strands
+    :param minCvNum: `int` minimum cv number of a strand
+    :param maxCvNum: `int` maximum cv number of a strand, minCvNum if None
+    :param frameNum: `int` number of simulated frames
+    :param seed: `int` random seed of the cv numbers and the strand roots
+    :param partitionNum: `int` number of partitions the strands are dealt to, like rigs, 1 if None
+    :param workerNum: `int` number of threads, see simulatePartitions()
+    :param simSettings: StrandBatch flags
+    :return: `dict` simulatePartitions() stats
+    """
+    random = np.random.RandomState(seed)
+    counts = random.randint(minCvNum, (maxCvNum or minCvNum)+1, strandNum)
+    roots = random.uniform(-10.0, 10.0, (strandNum, 3))
+    sway = np.sin(np.linspace(0.0, 2.0*np.pi, frameNum))[:, np.newaxis, np.newaxis]*[5.0, 0.0, 0.0]
+    startFrames = [root + np.outer(np.arange(count), [0.0, -1.0, 0.0]) + sway for root, count in zip(roots, counts)]
+    keys = [i % (partitionNum or 1) for i in range(strandNum)]
+    return simulatePartitions(startFrames, keys, workerNum=workerNum, **simSettings)[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the strand simulation throughput.")
+    parser.add_argument("--strands", type=int, default=1000, help="number of strands")
+    parser.add_argument("--cvs", type=int, nargs="+", default=[10], metavar="CVNUM",
+                        help="cv number of the strands, or the minimum and maximum cv number")
+    parser.add_argument("--frames", type=int, default=48, help="number of simulated frames")
+    parser.add_argument("--iterations", type=int, default=8, help="constraint passes per substep")
+    parser.add_argument("--substeps", type=int, default=2, help="substeps per frame")
+    parser.add_argument("--partitions", type=int, default=1, help="number of independent strand groups, like rigs")
+    parser.add_argument("--workers", type=int, default=1, help="number of threads, 0 for the cpu count")
+    args = parser.parse_args(argv)
+    stats = benchmarkBatch(args.strands, args.cvs[0], args.cvs[-1], args.frames, partitionNum=args.partitions,
+                           workerNum=args.workers or None, iterations=args.iterations, substeps=args.substeps)
+    print(formatStats(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
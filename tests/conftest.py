@@ -0,0 +1,9 @@
+__author__ = 'wuxiaoyu'
+
+import os
+import sys
+
+# the rig modules import each other as top level modules, like in maya
+_moduleDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dynrigbuilder")
+if _moduleDir not in sys.path:
+    sys.path.insert(0, _moduleDir)
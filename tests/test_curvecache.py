@@ -0,0 +1,48 @@
+__author__ = 'wuxiaoyu'
+
+import numpy as np
+import pytest
+
+import curvecache
+
+
+def _writeCache(filePath, frames, startFrame=10, chunkFrameNum=3):
+    knots = [0.0, 0.0, 0.0, 1.0, 2.0, 2.0, 2.0]
+    with curvecache.CurveCacheWriter(filePath, startFrame, len(frames[0]), 3, 0, knots, chunkFrameNum) as writer:
+        for cvs in frames:
+            writer.writeFrame(cvs)
+    return knots
+
+
+def test_roundTrip(tmp_path):
+    filePath = str(tmp_path/"strand.drcc")
+    random = np.random.RandomState(0)
+    frames = random.uniform(-10.0, 10.0, (8, 5, 3)).astype(np.float32)
+    knots = _writeCache(filePath, frames.tolist())
+
+    reader = curvecache.CurveCacheReader(filePath)
+    try:
+        assert (reader.startFrame, reader.endFrame, reader.frameNum) == (10, 17, 8)
+        assert (reader.cvNum, reader.degree, reader.form) == (5, 3, 0)
+        assert reader.knots == knots
+        for i, cvs in enumerate(frames):
+            np.testing.assert_array_equal(reader.readFrame(10+i), cvs)
+        # clamped out of the cached range, linear between frames
+        np.testing.assert_array_equal(reader.readFrame(0), frames[0])
+        np.testing.assert_array_equal(reader.readFrame(100), frames[-1])
+        np.testing.assert_allclose(reader.sample(12.25), frames[2]*0.75 + frames[3]*0.25, rtol=1e-6)
+    finally:
+        reader.close()
+
+
+def test_writerChecksCvNum(tmp_path):
+    with curvecache.CurveCacheWriter(str(tmp_path/"bad.drcc"), 1, 2, 1, 0, [0.0, 1.0]) as writer:
+        with pytest.raises(ValueError):
+            writer.writeFrame([(0.0, 0.0, 0.0)])
+
+
+def test_readerRejectsOtherFiles(tmp_path):
+    filePath = tmp_path/"other.drcc"
+    filePath.write_bytes(b"\0"*64)
+    with pytest.raises(ValueError):
+        curvecache.CurveCacheReader(str(filePath))
@@ -0,0 +1,22 @@
+__author__ = 'wuxiaoyu'
+
+import dryrun
+
+# node count of every subsystem of the default rig, update together with the build code
+# when a change to the node count is intended
+DEFAULT_SUBSYSTEM_NODES = {
+    "baseCtrl": 6,
+    "baseJnt": 22,
+    "dynamic": 39,
+    "finalize": 0,
+    "fk": 1204,
+    "ik": 362,
+    "ikfkBlend": 41,
+}
+
+
+def test_defaultBuildNodeCounts():
+    summary = dryrun.recordBuild("tail").summary()
+    subsystemNodes = dict((x, y["nodes"]) for x, y in summary["subsystems"].items())
+    assert subsystemNodes == DEFAULT_SUBSYSTEM_NODES
+    assert (summary["nodes"], summary["liveNodes"]) == (1674, 1661)
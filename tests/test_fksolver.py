@@ -0,0 +1,51 @@
+__author__ = 'wuxiaoyu'
+
+import numpy as np
+import pytest
+
+import fksolver
+import nodemath
+
+
+@pytest.fixture
+def loopVariableFK(monkeypatch):
+    # the plain python loop the node falls back to when numpy is missing
+    monkeypatch.setattr(nodemath, "fksolver", None)
+    return nodemath.computeVariableFK
+
+
+def _randomControls(random, ctrlNum):
+    return (random.uniform(0.0, 1.0, ctrlNum), random.uniform(0.0, 0.5, ctrlNum), random.uniform(0.0, 0.5, ctrlNum),
+            random.uniform(-90.0, 90.0, (ctrlNum, 3)), random.uniform(0.5, 2.0, (ctrlNum, 3)))
+
+
+def test_singleFrameMatchesLoop(loopVariableFK):
+    random = np.random.RandomState(0)
+    jointParams = np.linspace(0.0, 1.0, 17)
+    positions, rotFallOffs, scaleFallOffs, rotates, scales = _randomControls(random, 5)
+    # a falloff of 0 is clamped like the falloff attrs in maya
+    rotFallOffs[0] = scaleFallOffs[1] = 0.0
+    rotate, scale = fksolver.solveVariableFK(jointParams, positions, rotFallOffs, scaleFallOffs, rotates, scales)
+    assert np.isfinite(rotate).all() and np.isfinite(scale).all()
+
+    expected = loopVariableFK(jointParams.tolist(), list(zip(positions, rotFallOffs, scaleFallOffs,
+                                                             rotates.tolist(), scales.tolist())))
+    np.testing.assert_allclose(rotate, [x[0] for x in expected], atol=1e-9)
+    np.testing.assert_allclose(scale, [x[1] for x in expected], atol=1e-9)
+
+
+def test_batchMatchesLoop(loopVariableFK):
+    random = np.random.RandomState(1)
+    jointParams, frameControls = np.linspace(0.0, 1.0, 11), [_randomControls(random, 4) for _ in range(6)]
+    rotate, scale = fksolver.solveVariableFK(jointParams, *[np.array(x) for x in zip(*frameControls)])
+    assert rotate.shape == scale.shape == (6, 11, 3)
+    for frame, (positions, rotFallOffs, scaleFallOffs, rotates, scales) in enumerate(frameControls):
+        expected = loopVariableFK(jointParams.tolist(), list(zip(positions, rotFallOffs, scaleFallOffs,
+                                                                 rotates.tolist(), scales.tolist())))
+        np.testing.assert_allclose(rotate[frame], [x[0] for x in expected], atol=1e-9)
+        np.testing.assert_allclose(scale[frame], [x[1] for x in expected], atol=1e-9)
+
+
+def test_uncoveredJoints():
+    jointParams, ctrlPositions, fallOffs = fksolver.defaultLayout(11, 1, 0.25)
+    assert fksolver.uncoveredJoints(jointParams, ctrlPositions, fallOffs) == [0, 1, 2, 8, 9, 10]
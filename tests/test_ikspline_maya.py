@@ -0,0 +1,54 @@
+__author__ = 'wuxiaoyu'
+
+# nurbs.IKSplineChain against the ik joints of rigs built in maya, at rest and with the last
+# master ctrl pulled away, for every length preservation mode and for a curved chain.
+# Needs maya, skipped in a plain python, eg.
+#   mayapy -m pytest tests/test_ikspline_maya.py
+
+import pytest
+
+pm = pytest.importorskip("pymel.core")
+
+import numpy as np
+
+import nurbs
+import splinerig
+
+PREFIX = "ikChain"
+# rig attrs of every case, ik only
+RIG_CASES = [
+    {"preserveLength": 1},
+    {"preserveLength": 1, "lengthSolver": 1},
+    {"preserveLength": 1, "ikSolver": 1},
+    {"preserveLength": 0},
+]
+MID_POSITIONS = [[], [[3.0, 8.0, 0.0]]]
+# the rebuildCurve fits of maya and of nurbs.rebuildCurve are not the same fit
+TOLERANCE = 2e-2
+
+
+def _worldPositions(nodes):
+    return np.array([pm.xform(x, q=1, ws=1, t=1) for x in nodes])
+
+
+@pytest.mark.parametrize("midPositions", MID_POSITIONS)
+@pytest.mark.parametrize("rigAttrs", RIG_CASES)
+def test_ikChainMatchesRig(rigAttrs, midPositions):
+    pm.newFile(force=True)
+    rig = splinerig.SplineRig(PREFIX)
+    for attrName, value in dict(rigAttrs, hasFK=0, hasDynamic=0).items():
+        setattr(rig, attrName, value)
+    rig.midPositions = midPositions
+    rig.buildRig(None)
+    chain = nurbs.IKSplineChain(rig.startPos, rig.endPos, rig.masterCtrlNum, rig.ibtSubCtrlNum, rig.jointNum,
+                                rig.preserveLength, rig.lengthSolver, rig.ikSolver, rig._getChainPositions())
+
+    masterCtrls = [pm.PyNode("{0}_ik_master_{1:0>2d}_ctrl".format(PREFIX, i)) for i in range(rig.masterCtrlNum)]
+    ikJoints = [pm.PyNode("{0}_ik_ret_{1:0>2d}_jnt".format(PREFIX, i)) for i in range(rig.jointNum)]
+    np.testing.assert_allclose(chain.restMasterPositions, _worldPositions(masterCtrls), atol=1e-4)
+    np.testing.assert_allclose(chain.aimPositions(), _worldPositions(ikJoints), atol=TOLERANCE)
+
+    # stretch past the rest length
+    pm.move(masterCtrls[-1], [5.0, -5.0, 0.0], r=1, ws=1)
+    masterPositions = _worldPositions(masterCtrls)
+    np.testing.assert_allclose(chain.aimPositions(masterPositions), _worldPositions(ikJoints), atol=TOLERANCE)
@@ -0,0 +1,91 @@
+__author__ = 'wuxiaoyu'
+
+import numpy as np
+
+import dryrun
+import nurbs
+
+
+def _coxDeBoor(knots, degree, index, param):
+    # textbook recursion, the last span is closed so the end of the range evaluates
+    if degree == 0:
+        if knots[index] <= param < knots[index+1]:
+            return 1.0
+        lastSpan = knots[index] < knots[index+1] == knots[-1]
+        return 1.0 if lastSpan and param == knots[-1] else 0.0
+    value = 0.0
+    if knots[index+degree] != knots[index]:
+        value += (param-knots[index])/(knots[index+degree]-knots[index])*_coxDeBoor(knots, degree-1, index, param)
+    if knots[index+degree+1] != knots[index+1]:
+        value += ((knots[index+degree+1]-param)/(knots[index+degree+1]-knots[index+1])*
+                  _coxDeBoor(knots, degree-1, index+1, param))
+    return value
+
+
+def test_basisMatrixMatchesCoxDeBoor():
+    params = np.linspace(0.0, 1.0, 37)
+    knotVectors = [
+        (nurbs.clampedKnots(4, 3), 3),
+        (nurbs.clampedKnots(9, 3), 3),
+        (nurbs.clampedKnots(12, 7), 7),
+        (nurbs.clampedKnots(5, 1), 1),
+        # uneven and repeated inner knots
+        (np.array([0.0, 0.0, 0.0, 0.0, 0.1, 0.5, 0.5, 0.8, 1.0, 1.0, 1.0, 1.0]), 3),
+    ]
+    for knots, degree in knotVectors:
+        cvNum = len(knots) - degree - 1
+        expected = np.array([[_coxDeBoor(knots, degree, i, u) for i in range(cvNum)] for u in params])
+        np.testing.assert_allclose(nurbs.basisMatrix(knots, degree, params), expected, atol=1e-12)
+
+
+def test_basisMatrixPartitionOfUnity():
+    knots = nurbs.clampedKnots(10, 3)
+    basis = nurbs.basisMatrix(knots, 3, np.linspace(0.0, 1.0, 101))
+    np.testing.assert_allclose(basis.sum(axis=1), 1.0)
+    assert (basis >= 0.0).all()
+
+
+def _defaultChain(**rigAttrs):
+    attrs, scaffoldChain = dryrun.rigDefaults()
+    attrs.update(rigAttrs)
+    chain = nurbs.IKSplineChain(scaffoldChain[0], scaffoldChain[-1], attrs["masterCtrlNum"], attrs["ibtSubCtrlNum"],
+                                attrs["jointNum"], attrs["preserveLength"], attrs["lengthSolver"], attrs["ikSolver"])
+    return attrs, chain
+
+
+def _worldPositions(plan, names):
+    return np.array([list(plan.worldPosition(plan.resolveNode(x))) for x in names])
+
+
+def test_ikChainRestsOnRigJoints():
+    for rigAttrs in [{}, {"lengthSolver": 1}, {"ikSolver": 1}, {"preserveLength": 0}]:
+        attrs, chain = _defaultChain(**rigAttrs)
+        plan = dryrun.recordBuild("tail", rigAttrs)
+        ikJoints = _worldPositions(plan, ["tail_ik_ret_{0:0>2d}_jnt".format(i) for i in range(attrs["jointNum"])])
+        np.testing.assert_allclose(chain.aimPositions(), ikJoints, atol=1e-3)
+
+
+def test_ikChainFollowsPath():
+    attrs, scaffoldChain = dryrun.rigDefaults()
+    path = [scaffoldChain[0], [3.0, 8.0, 0.0], scaffoldChain[-1]]
+    chain = nurbs.IKSplineChain(path[0], path[-1], attrs["masterCtrlNum"], attrs["ibtSubCtrlNum"], attrs["jointNum"],
+                                pathPositions=path)
+    plan = dryrun.recordBuild("tail", midPositions=path[1:-1])
+    masterCtrls = _worldPositions(plan, ["tail_ik_master_{0:0>2d}_ctrl".format(i)
+                                         for i in range(attrs["masterCtrlNum"])])
+    np.testing.assert_allclose(chain.restMasterPositions, masterCtrls, atol=1e-6)
+
+
+def test_ikChainPreservesLength():
+    for rigAttrs in [{}, {"lengthSolver": 1}, {"ikSolver": 1}]:
+        chain = _defaultChain(**rigAttrs)[1]
+        stretched = chain.restMasterPositions*[1.0, 1.5, 1.0]
+        # clipped at the rest length, scaled with the rig, the whole curve when switched off
+        assert np.isclose(chain.jointLengths(chain.aimPositions(stretched)).sum(), chain.restLength, rtol=1e-3)
+        assert np.isclose(chain.jointLengths(chain.aimPositions(stretched, globalScale=1.2)).sum(),
+                          chain.restLength*1.2, rtol=1e-3)
+        assert np.isclose(chain.jointLengths(chain.aimPositions(stretched, preserveLength=False)).sum(),
+                          chain.restLength*1.5, rtol=1e-3)
+    chain = _defaultChain(preserveLength=0)[1]
+    stretched = chain.restMasterPositions*[1.0, 1.5, 1.0]
+    assert np.isclose(chain.jointLengths(chain.aimPositions(stretched)).sum(), chain.restLength*1.5, rtol=1e-3)
@@ -0,0 +1,67 @@
+__author__ = 'wuxiaoyu'
+
+# Per-frame evaluation of the custom solver nodes against the node networks they replace:
+# dynCurveLength vs rebuildCurve/curveInfo/detachCurve (lengthSolver), dynSplineJoints vs the
+# constrained aim chain (ikSolver) and dynJointBlend vs parentConstraint/blendColors (blendSolver).
+# Needs maya, skipped in a plain python, eg.
+#   mayapy -m pytest tests/test_solvers_maya.py -s
+# The evaluation times of both modes are printed, the test checks they give the same joints.
+
+import pytest
+
+pm = pytest.importorskip("pymel.core")
+
+import benchmark
+import rigutils
+import splinerig
+
+FRAME_NUM = 24
+# the swept solver attr and the rig attrs isolating the subsystem it evaluates
+SOLVER_CASES = [
+    ("lengthSolver", {"jointNum": 40, "hasFK": 0, "hasDynamic": 0}),
+    ("ikSolver", {"jointNum": 40, "hasFK": 0, "hasDynamic": 0}),
+    ("blendSolver", {"jointNum": 40, "hasDynamic": 0}),
+]
+
+
+def _evaluateRig(rigAttrs):
+    """
+    Build a rig, animate it and evaluate its base joints frame after frame.
+    :return: `tuple` (seconds per frame, `list` base joint world positions per frame)
+    """
+    pm.newFile(force=True)
+    rig = splinerig.SplineRig(benchmark.BENCH_PREFIX)
+    for attrName, value in rigAttrs.items():
+        setattr(rig, attrName, value)
+    rig.buildRig(None)
+    # stretch the ik curve past its rest length and switch from ik to fk on the way
+    lastMaster = pm.PyNode("{0}_ik_master_{1:0>2d}_ctrl".format(rig.prefix, rig.masterCtrlNum-1))
+    pm.setKeyframe(lastMaster, at="translateX", t=1, v=0)
+    pm.setKeyframe(lastMaster, at="translateX", t=FRAME_NUM, v=5)
+    if pm.attributeQuery("ikfkSwitch", node=rig.globalCtrl, exists=1):
+        pm.setKeyframe(rig.globalCtrl, at="ikfkSwitch", t=1, v=0)
+        pm.setKeyframe(rig.globalCtrl, at="ikfkSwitch", t=FRAME_NUM, v=1)
+    seconds = benchmark._timeEvaluation(rig, FRAME_NUM)
+
+    baseJntGrp = pm.PyNode("{0}_base_grp".format(rig.prefix))
+    baseJnts = rigutils.getJointsInChain(pm.listRelatives(baseJntGrp, c=1, typ="joint")[0])
+    positions = []
+    for frame in range(1, FRAME_NUM+1):
+        pm.currentTime(frame, update=True)
+        positions.append([jnt.getTranslation(space="world") for jnt in baseJnts])
+    return seconds, positions
+
+
+@pytest.mark.parametrize("solverAttr,rigAttrs", SOLVER_CASES)
+def test_solverMatchesNetwork(solverAttr, rigAttrs):
+    results = {}
+    for solver in (0, 1):
+        attrs = dict(rigAttrs)
+        attrs[solverAttr] = solver
+        results[solver] = _evaluateRig(attrs)
+    print("{0}: network {1:.6f}s/frame, node {2:.6f}s/frame".format(solverAttr, results[0][0], results[1][0]))
+
+    for networkFrame, nodeFrame in zip(results[0][1], results[1][1]):
+        for networkPos, nodePos in zip(networkFrame, nodeFrame):
+            # the rebuilt degree 7 curve is a fit of the sub curve, allow a small drift
+            assert (networkPos - nodePos).length() < 1e-2
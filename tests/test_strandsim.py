@@ -0,0 +1,84 @@
+__author__ = 'wuxiaoyu'
+
+import numpy as np
+
+import strandsim
+
+
+def _swayingStrands(counts, frameNum=24, seed=0):
+    """
+    Start curves hanging from roots swaying along x, per strand (frameNum, cvNum, 3).
+    """
+    random = np.random.RandomState(seed)
+    roots = random.uniform(-5.0, 5.0, (len(counts), 3))
+    sway = np.sin(np.linspace(0.0, 2.0*np.pi, frameNum))[:, np.newaxis, np.newaxis]*[3.0, 0.0, 0.0]
+    return [root + np.outer(np.arange(count), [0.0, -1.0, 0.0]) + sway for root, count in zip(roots, counts)]
+
+
+def test_segmentLengthsHeld():
+    startFrames = _swayingStrands([12, 12, 12])
+    restLengths = strandsim.segmentLengths(np.array([x[0] for x in startFrames]))
+    simulator = strandsim.StrandSimulator(np.array([x[0] for x in startFrames]), iterations=16, substeps=4)
+    result = simulator.simulate(np.stack(startFrames, axis=1))
+    lengths = strandsim.segmentLengths(result)
+    np.testing.assert_allclose(lengths, np.broadcast_to(restLengths, lengths.shape), rtol=0.02)
+
+    startFrames = _swayingStrands([5, 12, 9, 2])
+    results = strandsim.simulatePartitions(startFrames, workerNum=1, iterations=16, substeps=4)[0]
+    for frames, cvs in zip(startFrames, results):
+        lengths = strandsim.segmentLengths(cvs)
+        np.testing.assert_allclose(lengths, np.broadcast_to(strandsim.segmentLengths(frames[0]), lengths.shape), rtol=0.02)
+
+
+def test_fullAttractTracksStartCurve():
+    startFrames = _swayingStrands([6, 11, 3])
+    results = strandsim.simulatePartitions(startFrames, attract=1.0, workerNum=1)[0]
+    for frames, cvs in zip(startFrames, results):
+        np.testing.assert_allclose(cvs, frames, atol=1e-9)
+
+    simulator = strandsim.StrandSimulator(startFrames[0][0], attract=1.0)
+    np.testing.assert_allclose(simulator.simulate(startFrames[0]), startFrames[0], atol=1e-9)
+
+
+def test_shardingInvariance():
+    startFrames = _swayingStrands([4, 7, 7, 10, 3, 8, 5, 6], frameNum=12)
+    keys = ["a", "b", "a", "c", "d", "b", "e", "c"]
+    attract = np.linspace(0.0, 0.5, 12)
+    reference = strandsim.simulatePartitions(startFrames, keys, attract, workerNum=1)[0]
+    for workerNum in (2, 3, 8):
+        results, stats = strandsim.simulatePartitions(startFrames, keys, attract, workerNum=workerNum)
+        assert stats["partitionNum"] == 5
+        for expected, cvs in zip(reference, results):
+            np.testing.assert_allclose(cvs, expected, atol=1e-12)
+    # every strand alone gives the same result as the packed partitions
+    for frames, expected in zip(startFrames, reference):
+        alone = strandsim.simulatePartitions([frames], attract=attract, workerNum=1)[0][0]
+        np.testing.assert_allclose(alone, expected, atol=1e-12)
+
+    # streamed frame by frame on a thread pool
+    frames = [[x[frame] for x in startFrames] for frame in range(12)]
+    streamed = list(strandsim.streamPartitions(frames, keys, attract, workerNum=3))
+    for frame, strands in enumerate(streamed):
+        for i, cvs in enumerate(strands):
+            np.testing.assert_allclose(cvs, reference[i][frame], atol=1e-12)
+
+
+def test_noStrands():
+    results, stats = strandsim.simulatePartitions([])
+    assert results == [] and stats["strandNum"] == 0
+    assert list(strandsim.streamPartitions([[], [], []])) == [[], [], []]
+    assert list(strandsim.streamPartitions([])) == []
+
+
+def test_batchAgreesWithSimulator():
+    # the red/black constraint order of StrandBatch converges to the same strands as the
+    # root to tip order of StrandSimulator, within 0.5% of the strand length
+    startFrames = _swayingStrands([12, 12, 12, 12])
+    stacked = np.stack(startFrames, axis=1)
+    strandLength = strandsim.segmentLengths(stacked[0]).sum(axis=-1).max()
+    for iterations in (8, 16):
+        expected = strandsim.StrandSimulator(stacked[0], attract=0.1, iterations=iterations).simulate(stacked)
+        packedCvs, offsets = strandsim.packStrands(startFrames)
+        batch = strandsim.StrandBatch([x[0] for x in startFrames], attract=0.1, iterations=iterations)
+        result = np.stack(strandsim.unpackStrands(batch.simulate(packedCvs), offsets), axis=1)
+        assert np.linalg.norm(result - expected, axis=-1).max() < 0.005*strandLength